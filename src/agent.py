@@ -1,23 +1,156 @@
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-from agno.db.redis import RedisDb
-import os
-from src.tools import add_lead_to_nocodb
-from src.prompts import SYSTEM_PROMPT
-from src.config import AGENT_MODEL, AGENT_NAME, REDIS_URL
+"""
+Agent construction and session helpers.
+Agno and the model stack are imported on first use, not with this module: importing them takes
+about a second, and `preload_agent_stack()` lets the lifespan pay it in a worker thread at startup.
+"""
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, Optional
 
+from src.api.openai_client import get_openai_client
+from src.tools import add_lead_to_nocodb, buscar_modelos, buscar_roteiro
+from src.config import AGENT_MODEL, ENABLE_COMPACT_SESSIONS
+from src.redis_client import get_redis
+from src.tenants import current_tenant
 
-def get_agent(session_id: str = "default_session") -> Agent:
-    db = RedisDb(db_url=REDIS_URL, expire=300)
+if TYPE_CHECKING:
+    from agno.agent import Agent
+    from agno.db.redis import RedisDb
+
+# Provider-side prompt caching only hits on an identical request prefix.
+# The request is laid out as: tools -> static system message -> session history -> new input,
+# so everything before the history must be byte-for-byte stable across runs and sessions
+# (the static system message and cache key of each tenant are rendered once, see src/tenants.py).
+AGENT_TOOLS = (add_lead_to_nocodb, buscar_modelos, buscar_roteiro)
+TOOL_NAMES = tuple(tool.__name__ for tool in AGENT_TOOLS)
+SESSION_TTL_SECONDS = 300
+
+# Session storage of each tenant, shared by every agent built in this process (over the
+# process-wide Redis pool). The model uses the process-wide OpenAI client and its connection pool.
+_dbs: Dict[str, "RedisDb"] = {}
+_dbs_lock = threading.Lock()
+
+
+def preload_agent_stack() -> None:
+    """Import Agno, the OpenAI SDK and the session store, and build the OpenAI client."""
+    import agno.agent  # noqa: F401
+    import agno.models.openai  # noqa: F401
+    import src.session_store  # noqa: F401
+
+    get_openai_client()
+
+
+def _session_db() -> "RedisDb":
+    from agno.db.redis import RedisDb
+
+    from src.session_store import CompactRedisDb
+
+    tenant = current_tenant()
+    db = _dbs.get(tenant.id)
+    if db is None:
+        with _dbs_lock:
+            db = _dbs.get(tenant.id)
+            if db is None:
+                options = dict(redis_client=get_redis(), db_prefix=tenant.key("agno"), expire=SESSION_TTL_SECONDS)
+                if ENABLE_COMPACT_SESSIONS:
+                    db = CompactRedisDb(tenant.system_prompt + tenant.scripted_replies, **options)
+                else:
+                    db = RedisDb(**options)
+                _dbs[tenant.id] = db
+    return db
+
+
+def get_agent(
+    session_id: str = "default_session", model_id: Optional[str] = None, cache_session: bool = False
+) -> "Agent":
+    """
+    Build the agent for a conversation of the current tenant.
+    `model_id` overrides AGENT_MODEL (the overload controller switches to AGENT_SMALL_MODEL).
+    With `cache_session` the agent keeps the session in memory once read, for an owner worker
+    that reuses it on the next turn (see src/sharding.py).
+    """
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    tenant = current_tenant()
     return Agent(
-        model=OpenAIChat(id=AGENT_MODEL),
-        description=AGENT_NAME,
-        instructions=SYSTEM_PROMPT,
-        tools=[add_lead_to_nocodb],
-        db=db,
+        model=OpenAIChat(
+            id=model_id or AGENT_MODEL,
+            client=get_openai_client(),
+            extra_body={"prompt_cache_key": tenant.prompt_cache_key(TOOL_NAMES)},
+        ),
+        system_message=tenant.static_system_message,
+        tools=list(AGENT_TOOLS),
+        db=_session_db(),
         add_history_to_context=True,
         num_history_runs=10,
+        add_datetime_to_context=False,
         learning=False,
         markdown=False,
-        session_id=session_id
+        session_id=session_id,
+        cache_session=cache_session,
+    )
+
+
+class AgentRunError(RuntimeError):
+    """The agent run ended in error (Agno reports model failures in the output instead of raising)."""
+
+
+def raise_for_run_status(response):
+    """Return `response`, raising AgentRunError when Agno marked the run as failed."""
+    from agno.run.base import RunStatus
+
+    if getattr(response, "status", None) == RunStatus.error:
+        raise AgentRunError(getattr(response, "content", None) or "Agent run failed")
+    return response
+
+
+def session_has_history(session_id: str) -> bool:
+    """True when the conversation already has stored turns."""
+    from src.session_store import CompactRedisDb
+
+    db = _session_db()
+    if isinstance(db, CompactRedisDb):
+        return db.has_runs(session_id)
+    session = get_agent(session_id).get_session(session_id)
+    return bool(session and session.runs)
+
+
+def session_storage_bytes(session_id: str) -> Optional[int]:
+    """Bytes the conversation takes in Redis (compact storage only)."""
+    from src.session_store import CompactRedisDb
+
+    db = _session_db()
+    return db.session_bytes(session_id) if isinstance(db, CompactRedisDb) else None
+
+
+def record_synthetic_turn(session_id: str, user_text: str, reply_text: str, agent: Optional["Agent"] = None) -> None:
+    """
+    Store a turn answered without the model (canned reply) in the session history,
+    so the next agent run sees it like any other turn. `agent` is the conversation's agent when
+    the caller holds one (its in-memory session gets the turn too).
+    """
+    from agno.models.message import Message
+    from agno.run.agent import RunOutput
+    from agno.run.base import RunStatus
+    from agno.session.agent import AgentSession
+
+    agent = agent or get_agent(session_id)
+    agent.set_id()  # runs without an agent_id are dropped when the session is loaded
+    now = int(time.time())
+    session = agent.get_session(session_id) or AgentSession(
+        session_id=session_id, agent_id=agent.id, session_data={}, created_at=now
+    )
+    run = RunOutput(
+        run_id=str(uuid.uuid4()),
+        agent_id=agent.id,
+        session_id=session_id,
+        content=reply_text,
+        messages=[Message(role="user", content=user_text), Message(role="assistant", content=reply_text)],
+        status=RunStatus.completed,
+        created_at=now,
     )
+    session.upsert_run(run)
+    agent.save_session(session)
+    agent.db.upsert_run(run=run, session_id=session_id, run_index=len(session.runs) - 1)
@@ -1,17 +1,22 @@
 """
 Generate short audio replies and expose temporary files for Instagram attachment URL.
+The files live in AUDIO_REPLY_DIR, shared by the workers: Meta's fetch of the URL can reach any
+of them. The directory is created with the first reply; files older than AUDIO_REPLY_TTL_SECONDS
+are removed by whichever worker writes the next one.
 """
 import asyncio
 import logging
 import subprocess
-import tempfile
 import time
 import uuid
 from pathlib import Path
 from typing import Optional
 
-from src.api.openai_client import client
+from src.api.openai_client import get_openai_client
+from src.circuit_breaker import OPENAI, CircuitOpenError, get_circuit_breaker
+from src.metrics import ERRORS_TOTAL, TTS_SECONDS, timed
 from src.config import (
+    AUDIO_REPLY_DIR,
     AUDIO_REPLY_MODEL,
     AUDIO_REPLY_VOICE,
     MAX_AUDIO_REPLY_CHARS,
@@ -20,15 +25,20 @@ from src.config import (
 
 logger = logging.getLogger(__name__)
 
-AUDIO_REPLY_DIR = Path(tempfile.mkdtemp(prefix="vsimple_audio_replies_"))
 AUDIO_REPLY_TTL_SECONDS = 900
 
 
+def get_audio_reply_dir() -> Path:
+    """The shared audio reply directory (created if missing)."""
+    directory = Path(AUDIO_REPLY_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
 def _cleanup_expired_files() -> None:
     now = time.time()
-    AUDIO_REPLY_DIR.mkdir(parents=True, exist_ok=True)
     for pattern in ("*.mp3", "*.wav"):
-        for file in AUDIO_REPLY_DIR.glob(pattern):
+        for file in get_audio_reply_dir().glob(pattern):
             try:
                 if now - file.stat().st_mtime > AUDIO_REPLY_TTL_SECONDS:
                     file.unlink(missing_ok=True)
@@ -66,24 +76,26 @@ def _convert_to_wav(input_path: Path, output_path: Path) -> None:
     )
 
 
+@timed(TTS_SECONDS, in_flight="tts")
 def _synthesize_to_wav_file(text: str, output_path: Path) -> None:
     temp_mp3 = output_path.with_suffix(".mp3")
-    try:
-        with client.audio.speech.with_streaming_response.create(
-            model=AUDIO_REPLY_MODEL,
-            voice=AUDIO_REPLY_VOICE,
-            input=text,
-            response_format="mp3",
-        ) as response:
-            response.stream_to_file(str(temp_mp3))
-    except TypeError:
-        # Compatibility fallback for older OpenAI SDK versions.
-        with client.audio.speech.with_streaming_response.create(
-            model=AUDIO_REPLY_MODEL,
-            voice=AUDIO_REPLY_VOICE,
-            input=text,
-        ) as response:
-            response.stream_to_file(str(temp_mp3))
+    with get_circuit_breaker(OPENAI).guard():
+        try:
+            with get_openai_client().audio.speech.with_streaming_response.create(
+                model=AUDIO_REPLY_MODEL,
+                voice=AUDIO_REPLY_VOICE,
+                input=text,
+                response_format="mp3",
+            ) as response:
+                response.stream_to_file(str(temp_mp3))
+        except TypeError:
+            # Compatibility fallback for older OpenAI SDK versions.
+            with get_openai_client().audio.speech.with_streaming_response.create(
+                model=AUDIO_REPLY_MODEL,
+                voice=AUDIO_REPLY_VOICE,
+                input=text,
+            ) as response:
+                response.stream_to_file(str(temp_mp3))
     _convert_to_wav(temp_mp3, output_path)
     try:
         temp_mp3.unlink(missing_ok=True)
@@ -94,24 +106,27 @@ def _synthesize_to_wav_file(text: str, output_path: Path) -> None:
 async def create_audio_reply_url(text: str) -> Optional[str]:
     """
     Creates a WAV from text and returns a public URL for Instagram attachment.
-    Returns None if PUBLIC_BASE_URL is not configured or synthesis fails.
+    Returns None if PUBLIC_BASE_URL is not configured, synthesis fails or the OpenAI circuit is open.
     """
     if not PUBLIC_BASE_URL:
         return None
 
     _cleanup_expired_files()
-    AUDIO_REPLY_DIR.mkdir(parents=True, exist_ok=True)
 
     safe_text = _trim_for_five_seconds(text)
     if not safe_text:
         return None
 
     file_name = f"{uuid.uuid4().hex}.wav"
-    output_path = AUDIO_REPLY_DIR / file_name
+    output_path = get_audio_reply_dir() / file_name
 
     try:
         await asyncio.to_thread(_synthesize_to_wav_file, safe_text, output_path)
+    except CircuitOpenError:
+        logger.warning("Audio reply skipped: OpenAI circuit open")
+        return None
     except Exception as exc:
+        ERRORS_TOTAL.labels(stage="tts").inc()
         logger.error("Failed to synthesize audio reply: %s", exc, exc_info=True)
         return None
 
@@ -121,13 +136,13 @@ async def create_audio_reply_url(text: str) -> Optional[str]:
 
 def resolve_audio_file(file_name: str) -> Optional[Path]:
     """
-    Safely resolves a generated audio file from temp directory.
+    Safely resolves a generated audio file (written by any worker) from the shared directory.
     """
     if not file_name.endswith(".wav"):
         return None
     if "/" in file_name or ".." in file_name:
         return None
-    candidate = AUDIO_REPLY_DIR / file_name
+    candidate = Path(AUDIO_REPLY_DIR) / file_name
     if not candidate.exists():
         return None
     return candidate
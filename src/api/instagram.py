@@ -1,22 +1,77 @@
 """
 Instagram Graph API helper.
-Sends text messages back to users via the Instagram Messaging API.
+Sends text messages back to users via the Instagram Messaging API, with the access token of
+the current tenant (see src/tenants.py).
 """
 import httpx
 import logging
 import asyncio
-from src.config import INSTAGRAM_ACCESS_TOKEN, INSTAGRAM_API_VERSION
+from typing import List, Optional
+from src.config import INSTAGRAM_API_VERSION, INSTAGRAM_GRAPH_BASE_URL
+from src.circuit_breaker import GRAPH, CircuitOpenError, get_circuit_breaker
+from src.deadline import Deadline
 from src.interaction_blocker import get_blocker
+from src.metrics import ERRORS_TOTAL, GRAPH_SEND_SECONDS, RETRIES_TOTAL, timed
+from src.tenants import current_tenant
+from src.tracing import traced
 
 logger = logging.getLogger(__name__)
-GRAPH_INSTAGRAM_BASE_URL = "https://graph.instagram.com"
+GRAPH_INSTAGRAM_BASE_URL = INSTAGRAM_GRAPH_BASE_URL
+MIN_SEND_ATTEMPT_SECONDS = 5.0  # every send gets at least one attempt with this timeout, even past the deadline
 
 
 def _text_messages_url() -> str:
     return f"{GRAPH_INSTAGRAM_BASE_URL}/{INSTAGRAM_API_VERSION}/me/messages"
 
 
-async def send_message(recipient_id: str, text: str, retry_count: int = 2) -> dict:
+def _attempt_timeout(default: float, deadline: Optional[Deadline]) -> float:
+    if deadline is None:
+        return default
+    return deadline.timeout(default, floor=MIN_SEND_ATTEMPT_SECONDS)
+
+
+async def _post_to_graph(url: str, payload: dict, headers: dict, timeout: float) -> httpx.Response:
+    """POST through the Graph API circuit breaker (raises CircuitOpenError while it is open)."""
+    with get_circuit_breaker(GRAPH).guard():
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(url, json=payload, headers=headers)
+            response.raise_for_status()
+            return response
+
+
+async def _wait_before_retry(attempt: int, deadline: Optional[Deadline], recipient_id: str) -> bool:
+    """
+    Exponential backoff before the next attempt.
+    Returns False when the reply budget cannot cover the wait plus another attempt.
+    """
+    delay = 2 ** attempt
+    if deadline is not None and not deadline.has(delay + MIN_SEND_ATTEMPT_SECONDS):
+        deadline.record_overrun("graph_send", recipient_id)
+        return False
+    RETRIES_TOTAL.labels(operation="graph_send").inc()
+    await asyncio.sleep(delay)
+    return True
+
+
+def register_reply_echoes(recipient_id: str, texts: List[str]) -> asyncio.Task:
+    """
+    Expect the echoes of the messages about to be sent (one Redis round trip for every chunk of a
+    reply), in a worker thread while the first send goes out. Meta delivers an echo only after it
+    received the send, so the marker is in place first; await the task before the next send.
+    """
+    texts = [text[:1000] for text in texts]
+    return asyncio.create_task(asyncio.to_thread(get_blocker().register_agent_outbound_messages, recipient_id, texts))
+
+
+@traced("graph.send", sender_param="recipient_id")
+@timed(GRAPH_SEND_SECONDS, in_flight="graph_send", kind="text")
+async def send_message(
+    recipient_id: str,
+    text: str,
+    retry_count: int = 2,
+    deadline: Optional[Deadline] = None,
+    register_echo: bool = True,
+) -> dict:
     """
     Send a text message to an Instagram user via the Graph API.
     
@@ -24,6 +79,9 @@ async def send_message(recipient_id: str, text: str, retry_count: int = 2) -> di
         recipient_id: Instagram user ID
         text: Message text (truncated to 1000 chars)
         retry_count: Number of retries on failure (default: 2)
+        deadline: Reply budget; retries are skipped when it cannot cover them
+        register_echo: Expect the echo of this message (False when the caller registered it,
+            see register_reply_echoes)
     
     Returns:
         API response JSON
@@ -33,7 +91,7 @@ async def send_message(recipient_id: str, text: str, retry_count: int = 2) -> di
     """
     url = _text_messages_url()
     headers = {
-        "Authorization": f"Bearer {INSTAGRAM_ACCESS_TOKEN}",
+        "Authorization": f"Bearer {current_tenant().access_token}",
         "Content-Type": "application/json",
     }
     payload = {
@@ -43,21 +101,26 @@ async def send_message(recipient_id: str, text: str, retry_count: int = 2) -> di
 
     short_id = recipient_id[-6:]
     last_error = None
+    registration = register_reply_echoes(recipient_id, [payload["message"]["text"]]) if register_echo else None
     
     for attempt in range(1, retry_count + 1):
         try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                get_blocker().register_agent_outbound_message(recipient_id, payload["message"]["text"])
-                logger.info("[%s] Message sent successfully (attempt %d/%d)", short_id, attempt, retry_count)
-                return response.json()
-        
+            response = await _post_to_graph(url, payload, headers, _attempt_timeout(15.0, deadline))
+            logger.info("[%s] Message sent successfully (attempt %d/%d)", short_id, attempt, retry_count)
+            if registration is not None:
+                await registration
+            return response.json()
+
+        except CircuitOpenError:
+            # Graph API is down: fail fast instead of waiting out timeouts.
+            logger.warning("[%s] Graph API circuit open; message not sent", short_id)
+            raise
+
         except httpx.TimeoutException as e:
             last_error = f"Timeout: {str(e)}"
             logger.warning("[%s] Timeout sending message (attempt %d/%d): %s", short_id, attempt, retry_count, e)
-            if attempt < retry_count:
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            if attempt < retry_count and not await _wait_before_retry(attempt, deadline, recipient_id):
+                break
         
         except httpx.HTTPStatusError as e:
             last_error = f"HTTP {e.response.status_code}: {e.response.text}"
@@ -65,35 +128,40 @@ async def send_message(recipient_id: str, text: str, retry_count: int = 2) -> di
             
             # Don't retry on auth errors or permanent errors
             if e.response.status_code in (401, 403, 404):
+                ERRORS_TOTAL.labels(stage="graph_send").inc()
                 raise
             
-            if attempt < retry_count:
-                await asyncio.sleep(2 ** attempt)
+            if attempt < retry_count and not await _wait_before_retry(attempt, deadline, recipient_id):
+                break
         
         except Exception as e:
             last_error = str(e)
             logger.error("[%s] Error sending message (attempt %d/%d): %s", short_id, attempt, retry_count, e, exc_info=True)
-            if attempt < retry_count:
-                await asyncio.sleep(2 ** attempt)
+            if attempt < retry_count and not await _wait_before_retry(attempt, deadline, recipient_id):
+                break
     
-    # All retries failed
-    error_msg = f"Failed to send message after {retry_count} attempts: {last_error}"
+    # All retries failed (or no budget left to retry)
+    error_msg = f"Failed to send message after {attempt} attempts: {last_error}"
+    ERRORS_TOTAL.labels(stage="graph_send").inc()
     logger.error("[%s] %s", short_id, error_msg)
     raise RuntimeError(error_msg)
 
 
+@traced("graph.send_audio", sender_param="recipient_id")
+@timed(GRAPH_SEND_SECONDS, in_flight="graph_send", kind="audio")
 async def send_audio_message(
     recipient_id: str,
     audio_url: str,
     retry_count: int = 2,
     is_reusable: bool = False,
+    deadline: Optional[Deadline] = None,
 ) -> dict:
     """
     Send an audio attachment via public HTTPS URL using /me/messages.
     """
     messages_url = _text_messages_url()
     headers = {
-        "Authorization": f"Bearer {INSTAGRAM_ACCESS_TOKEN}",
+        "Authorization": f"Bearer {current_tenant().access_token}",
         "Content-Type": "application/json",
     }
     short_id = recipient_id[-6:]
@@ -114,11 +182,12 @@ async def send_audio_message(
                 },
             }
 
-            async with httpx.AsyncClient(timeout=25.0) as client:
-                send_response = await client.post(messages_url, json=payload, headers=headers)
-                send_response.raise_for_status()
-                logger.info("[%s] Audio message sent successfully (attempt %d/%d)", short_id, attempt, retry_count)
-                return send_response.json()
+            send_response = await _post_to_graph(messages_url, payload, headers, _attempt_timeout(25.0, deadline))
+            logger.info("[%s] Audio message sent successfully (attempt %d/%d)", short_id, attempt, retry_count)
+            return send_response.json()
+        except CircuitOpenError:
+            logger.warning("[%s] Graph API circuit open; audio not sent", short_id)
+            raise
         except httpx.HTTPStatusError as e:
             error_body = e.response.text
             last_error = f"HTTP {e.response.status_code}: {error_body}"
@@ -129,8 +198,8 @@ async def send_audio_message(
                 retry_count,
                 last_error,
             )
-            if attempt < retry_count:
-                await asyncio.sleep(2 ** attempt)
+            if attempt < retry_count and not await _wait_before_retry(attempt, deadline, recipient_id):
+                break
         except Exception as e:
             last_error = str(e)
             logger.warning(
@@ -140,9 +209,10 @@ async def send_audio_message(
                 retry_count,
                 e,
             )
-            if attempt < retry_count:
-                await asyncio.sleep(2 ** attempt)
+            if attempt < retry_count and not await _wait_before_retry(attempt, deadline, recipient_id):
+                break
 
-    error_msg = f"Failed to send audio after {retry_count} attempts: {last_error}"
+    error_msg = f"Failed to send audio after {attempt} attempts: {last_error}"
+    ERRORS_TOTAL.labels(stage="graph_send").inc()
     logger.error("[%s] %s", short_id, error_msg)
     raise RuntimeError(error_msg)
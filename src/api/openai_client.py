@@ -1,4 +1,36 @@
-from openai import OpenAI
+"""
+Shared OpenAI client, built on first use (importing the SDK takes most of a second).
+One client per process: its connection pool is reused by the agent, the scope classifier,
+transcription and TTS. Closed by `close_openai_client()` when the worker stops (src/app.py).
+"""
+import threading
+from typing import TYPE_CHECKING, Optional
+
 from src.config import OPENAI_API_KEY
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Global instance
+_client: Optional["OpenAI"] = None
+_lock = threading.Lock()
+
+
+def get_openai_client() -> "OpenAI":
+    """Get or create the process-wide OpenAI client (called from worker threads too)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+def close_openai_client() -> None:
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
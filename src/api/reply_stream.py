@@ -0,0 +1,149 @@
+"""
+Streaming agent replies.
+Consumes Agno's streamed run output and cuts it into Instagram messages at natural boundaries,
+so the first message can be sent before generation finishes.
+"""
+import asyncio
+import logging
+import re
+import threading
+from typing import AsyncIterator, List
+
+logger = logging.getLogger(__name__)
+
+INSTAGRAM_MESSAGE_LIMIT = 1000  # Instagram limit is 1000 chars per message
+
+_PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+_SENTENCE_BOUNDARY = re.compile(r"[.!?…](?=\s)|\n")
+_WORD_BOUNDARY = re.compile(r"\s")
+
+_STREAM_END = object()
+
+
+def _last_boundary(pattern: re.Pattern, text: str, min_pos: int, max_pos: int) -> int:
+    """Return the end offset of the last boundary match within [min_pos, max_pos], or -1."""
+    best = -1
+    for match in pattern.finditer(text, 0, max_pos):
+        if match.end() >= min_pos:
+            best = match.end()
+    return best
+
+
+class ReplyChunker:
+    """
+    Accumulates streamed text and releases complete messages.
+
+    A message is released at the last paragraph break once at least `min_chars` are buffered.
+    The very first message is also released at a sentence break, to shorten time-to-first-message.
+    Nothing released is ever longer than `max_chars`.
+    """
+
+    def __init__(self, min_chars: int = 80, max_chars: int = INSTAGRAM_MESSAGE_LIMIT):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a streamed delta and return the messages that are ready to send."""
+        self._buffer += delta or ""
+        ready: List[str] = []
+
+        while len(self._buffer) > self.max_chars:
+            cut = _last_boundary(_PARAGRAPH_BOUNDARY, self._buffer, 1, self.max_chars)
+            if cut < 0:
+                cut = _last_boundary(_SENTENCE_BOUNDARY, self._buffer, 1, self.max_chars)
+            if cut < 0:
+                cut = _last_boundary(_WORD_BOUNDARY, self._buffer, 1, self.max_chars)
+            if cut < 0:
+                cut = self.max_chars
+            self._release(cut, ready)
+
+        cut = _last_boundary(_PARAGRAPH_BOUNDARY, self._buffer, self.min_chars, len(self._buffer))
+        if cut < 0 and self._emitted == 0:
+            cut = _last_boundary(_SENTENCE_BOUNDARY, self._buffer, self.min_chars, len(self._buffer))
+        if cut > 0:
+            self._release(cut, ready)
+        return ready
+
+    def flush(self) -> List[str]:
+        """Release whatever is left at the end of the stream."""
+        ready: List[str] = []
+        while self._buffer:
+            self._release(min(len(self._buffer), self.max_chars), ready)
+        return ready
+
+    def _release(self, cut: int, ready: List[str]) -> None:
+        message = self._buffer[:cut].strip()
+        self._buffer = self._buffer[cut:].lstrip()
+        if message:
+            ready.append(message)
+            self._emitted += 1
+
+
+def split_reply(text: str, max_chars: int = INSTAGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Split a complete reply into messages within the Instagram limit."""
+    chunker = ReplyChunker(min_chars=max_chars, max_chars=max_chars)
+    return chunker.feed(text) + chunker.flush()
+
+
+async def stream_agent_run(agent, text: str) -> AsyncIterator[object]:
+    """
+    Run `agent.run(stream=True)` in a worker thread and yield its items on the event loop.
+    Yields content deltas (str) and, at the end, the final RunOutput.
+    A consumer that stops early (e.g. cancelled at the reply deadline) returns right away: the worker
+    thread stops at the next item the model yields and is not waited for, since a stalled model call
+    only returns on its own.
+    """
+    from agno.run.agent import RunContentEvent, RunOutput
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def _put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # the loop closed while the model call was stalled
+
+    def _produce() -> None:
+        run = None
+        try:
+            run = agent.run(text, stream=True, yield_run_output=True)
+            for item in run:
+                if stop.is_set():
+                    # Consumer gave up (e.g. reply deadline): stop pulling from the model stream.
+                    break
+                if isinstance(item, RunContentEvent):
+                    if isinstance(item.content, str) and item.content:
+                        _put(item.content)
+                elif isinstance(item, RunOutput):
+                    _put(item)
+        except BaseException as exc:
+            _put(exc)
+        finally:
+            if stop.is_set() and hasattr(run, "close"):
+                run.close()
+            _put(_STREAM_END)
+
+    producer = asyncio.create_task(asyncio.to_thread(_produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        if producer.done():
+            await producer
+        else:
+            producer.add_done_callback(_retrieve_exception)
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug("Abandoned agent stream ended with: %s", task.exception())
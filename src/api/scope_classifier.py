@@ -3,12 +3,19 @@ Classifier for deciding whether a user request is outside assistant business sco
 """
 import asyncio
 import logging
+from typing import Optional
 
-from src.api.openai_client import client
+from src.api.openai_client import get_openai_client
+from src.circuit_breaker import OPENAI, CircuitOpenError, get_circuit_breaker
+from src.deadline import Deadline
+from src.metrics import ERRORS_TOTAL, SCOPE_CLASSIFICATION_SECONDS, timed
+from src.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 CLASSIFIER_MODEL = "gpt-4o-mini"
+CLASSIFIER_TIMEOUT_SECONDS = 10.0
+MIN_CLASSIFIER_BUDGET_SECONDS = 5.0  # below this, skip classification and treat the message as in scope
 
 SCOPE_DESCRIPTION = (
     "Escopo permitido: atendimento da loja Shineray Rosario sobre motos/produtos, "
@@ -17,34 +24,49 @@ SCOPE_DESCRIPTION = (
 )
 
 
-def _classify_sync(text: str) -> bool:
-    completion = client.chat.completions.create(
-        model=CLASSIFIER_MODEL,
-        temperature=0,
-        max_tokens=5,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "Classifique a mensagem do usuario como IN_SCOPE ou OUT_OF_SCOPE. "
-                    f"{SCOPE_DESCRIPTION} "
-                    "Responda somente uma palavra: IN_SCOPE ou OUT_OF_SCOPE."
-                ),
-            },
-            {"role": "user", "content": text},
-        ],
-    )
+def _classify_sync(text: str, timeout: float = CLASSIFIER_TIMEOUT_SECONDS) -> bool:
+    with get_circuit_breaker(OPENAI).guard():
+        completion = get_openai_client().chat.completions.create(
+            model=CLASSIFIER_MODEL,
+            temperature=0,
+            max_tokens=5,
+            timeout=timeout,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Classifique a mensagem do usuario como IN_SCOPE ou OUT_OF_SCOPE. "
+                        f"{SCOPE_DESCRIPTION} "
+                        "Responda somente uma palavra: IN_SCOPE ou OUT_OF_SCOPE."
+                    ),
+                },
+                {"role": "user", "content": text},
+            ],
+        )
     result = (completion.choices[0].message.content or "").strip().upper()
     return result == "OUT_OF_SCOPE"
 
 
-async def is_out_of_scope(text: str) -> bool:
+@traced("scope.classify")
+@timed(SCOPE_CLASSIFICATION_SECONDS, in_flight="scope_classification")
+async def is_out_of_scope(text: str, deadline: Optional[Deadline] = None) -> bool:
     """
     Returns True when the message is outside business scope.
-    Defaults to False if classification fails.
+    Defaults to False if classification fails, the OpenAI circuit is open,
+    or the reply budget is too short to classify.
     """
+    timeout = CLASSIFIER_TIMEOUT_SECONDS
+    if deadline is not None:
+        if not deadline.has(MIN_CLASSIFIER_BUDGET_SECONDS):
+            deadline.record_overrun("scope_classification")
+            return False
+        timeout = deadline.timeout(CLASSIFIER_TIMEOUT_SECONDS)
     try:
-        return await asyncio.to_thread(_classify_sync, text)
+        return await asyncio.to_thread(_classify_sync, text, timeout)
+    except CircuitOpenError:
+        logger.info("Scope classification skipped (OpenAI circuit open), defaulting to IN_SCOPE")
+        return False
     except Exception as exc:
+        ERRORS_TOTAL.labels(stage="scope_classification").inc()
         logger.warning("Scope classification failed, defaulting to IN_SCOPE: %s", exc)
         return False
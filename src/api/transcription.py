@@ -10,12 +10,23 @@ import tempfile
 from typing import Optional
 
 import httpx
-from openai import BadRequestError
 
-from src.api.openai_client import client
+from src.api.openai_client import get_openai_client
+from src.api.voice_activity import trim_silence
+from src.circuit_breaker import OPENAI, CircuitOpenError, get_circuit_breaker
+from src.deadline import Deadline
+from src.metrics import (
+    AUDIO_TRIMMED_SECONDS,
+    RETRIES_TOTAL,
+    TRANSCRIBED_AUDIO_SECONDS,
+    TRANSCRIPTION_STAGE_SECONDS,
+    timed,
+)
+from src.tenants import current_tenant
+from src.tracing import traced
 from src.config import (
     AUDIO_TRANSCRIPTION_MODEL,
-    INSTAGRAM_ACCESS_TOKEN,
+    ENABLE_AUDIO_VAD,
     MAX_TRANSCRIPTION_AUDIO_MB,
     MAX_TRANSCRIPTION_AUDIO_SECONDS,
 )
@@ -23,6 +34,7 @@ from src.config import (
 logger = logging.getLogger(__name__)
 
 MAX_AUDIO_BYTES = MAX_TRANSCRIPTION_AUDIO_MB * 1024 * 1024
+MIN_FALLBACK_BUDGET_SECONDS = 10.0  # whisper-1 retry only when this much reply budget is left
 
 
 def _guess_suffix(content_type: str) -> str:
@@ -43,14 +55,18 @@ def _extract_transcription_text(result) -> str:
     return ""
 
 
-def _transcribe_audio_bytes(audio_bytes: bytes, suffix: str, model: str = AUDIO_TRANSCRIPTION_MODEL) -> str:
+def _transcribe_audio_bytes(
+    audio_bytes: bytes, suffix: str, model: str = AUDIO_TRANSCRIPTION_MODEL, timeout: Optional[float] = None
+) -> str:
+    options = {"timeout": timeout} if timeout is not None else {}
     with tempfile.NamedTemporaryFile(suffix=suffix, delete=True) as tmp:
         tmp.write(audio_bytes)
         tmp.flush()
-        with open(tmp.name, "rb") as audio_file:
-            result = client.audio.transcriptions.create(
+        with open(tmp.name, "rb") as audio_file, get_circuit_breaker(OPENAI).guard():
+            result = get_openai_client().audio.transcriptions.create(
                 model=model,
                 file=audio_file,
+                **options,
             )
     return _extract_transcription_text(result)
 
@@ -129,25 +145,38 @@ def _get_audio_duration_seconds(audio_bytes: bytes, suffix: str) -> Optional[flo
             pass
 
 
-async def transcribe_audio_from_url(audio_url: str, sender_id: str) -> Optional[str]:
+@traced("transcription", sender_param="sender_id")
+async def transcribe_audio_from_url(
+    audio_url: str, sender_id: str, deadline: Optional[Deadline] = None
+) -> Optional[str]:
     """
     Download an Instagram audio attachment URL and transcribe it with OpenAI.
     Returns None when download/transcription fails.
+    Network calls are bounded by the reply deadline; the whisper-1 fallback is skipped when it is short.
     """
+    with timed(TRANSCRIPTION_STAGE_SECONDS, in_flight="transcription", stage="total"):
+        return await _transcribe_audio_from_url(audio_url, sender_id, deadline or Deadline())
+
+
+async def _transcribe_audio_from_url(audio_url: str, sender_id: str, deadline: Deadline) -> Optional[str]:
+    from openai import BadRequestError  # loaded with the client, see src/api/openai_client.py
+
     short_id = sender_id[-6:] if sender_id else "unknown"
     headers = {}
-    if INSTAGRAM_ACCESS_TOKEN:
-        headers["Authorization"] = f"Bearer {INSTAGRAM_ACCESS_TOKEN}"
+    access_token = current_tenant().access_token
+    if access_token:
+        headers["Authorization"] = f"Bearer {access_token}"
 
     try:
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            response = await client.get(audio_url, headers=headers or None)
-            if response.status_code in (401, 403) and headers:
-                # Some attachment URLs are public signed links; retry without auth header.
-                response = await client.get(audio_url)
-            response.raise_for_status()
-            audio_bytes = response.content
-            content_type = response.headers.get("content-type", "")
+        with timed(TRANSCRIPTION_STAGE_SECONDS, stage="download"):
+            async with httpx.AsyncClient(timeout=deadline.timeout(30.0, floor=1.0), follow_redirects=True) as client:
+                response = await client.get(audio_url, headers=headers or None)
+                if response.status_code in (401, 403) and headers:
+                    # Some attachment URLs are public signed links; retry without auth header.
+                    response = await client.get(audio_url)
+                response.raise_for_status()
+                audio_bytes = response.content
+                content_type = response.headers.get("content-type", "")
     except Exception as exc:
         logger.error("[%s] Failed to download audio attachment: %s", short_id, exc)
         return None
@@ -163,7 +192,8 @@ async def transcribe_audio_from_url(audio_url: str, sender_id: str) -> Optional[
     suffix = _guess_suffix(content_type)
     wav_bytes = None
     try:
-        wav_bytes = await asyncio.to_thread(_convert_audio_to_wav, audio_bytes, suffix)
+        with timed(TRANSCRIPTION_STAGE_SECONDS, stage="ffmpeg"):
+            wav_bytes = await asyncio.to_thread(_convert_audio_to_wav, audio_bytes, suffix)
     except FileNotFoundError:
         logger.error("[%s] ffmpeg not found in container; trying direct transcription", short_id)
     except Exception as exc:
@@ -171,7 +201,20 @@ async def transcribe_audio_from_url(audio_url: str, sender_id: str) -> Optional[
 
     transcribe_bytes = wav_bytes if wav_bytes else audio_bytes
     transcribe_suffix = ".wav" if wav_bytes else suffix
-    duration_seconds = await asyncio.to_thread(_get_audio_duration_seconds, transcribe_bytes, transcribe_suffix)
+    duration_seconds = None
+    if wav_bytes and ENABLE_AUDIO_VAD:
+        # Silence is dropped before the duration limit and the upload (billed per audio second).
+        with timed(TRANSCRIPTION_STAGE_SECONDS, stage="vad"):
+            trimmed = await asyncio.to_thread(trim_silence, wav_bytes)
+        if trimmed is not None:
+            AUDIO_TRIMMED_SECONDS.observe(trimmed.trimmed_seconds)
+            logger.debug(
+                "[%s] Voice activity trim: %.1fs -> %.1fs", short_id, trimmed.original_seconds, trimmed.seconds
+            )
+            transcribe_bytes, duration_seconds = trimmed.wav, trimmed.seconds
+    if duration_seconds is None:
+        with timed(TRANSCRIPTION_STAGE_SECONDS, stage="probe"):
+            duration_seconds = await asyncio.to_thread(_get_audio_duration_seconds, transcribe_bytes, transcribe_suffix)
     if duration_seconds and duration_seconds > MAX_TRANSCRIPTION_AUDIO_SECONDS:
         logger.warning(
             "[%s] Audio too long for transcription (%.1fs > %ss)",
@@ -182,22 +225,43 @@ async def transcribe_audio_from_url(audio_url: str, sender_id: str) -> Optional[
         return None
 
     try:
-        transcription = await asyncio.to_thread(
-            _transcribe_audio_bytes, transcribe_bytes, transcribe_suffix, AUDIO_TRANSCRIPTION_MODEL
-        )
+        with timed(TRANSCRIPTION_STAGE_SECONDS, stage="api"):
+            transcription = await asyncio.to_thread(
+                _transcribe_audio_bytes,
+                transcribe_bytes,
+                transcribe_suffix,
+                AUDIO_TRANSCRIPTION_MODEL,
+                deadline.timeout(60.0, floor=1.0),
+            )
+        # Counted once the upload was accepted (a failed or rejected call is not billed).
+        if duration_seconds:
+            TRANSCRIBED_AUDIO_SECONDS.inc(duration_seconds)
         if transcription:
             return transcription
-        if AUDIO_TRANSCRIPTION_MODEL != "whisper-1":
-            logger.warning("[%s] Empty transcription with %s, trying whisper-1", short_id, AUDIO_TRANSCRIPTION_MODEL)
+        if AUDIO_TRANSCRIPTION_MODEL == "whisper-1":
+            return None
+        if not deadline.has(MIN_FALLBACK_BUDGET_SECONDS):
+            deadline.record_overrun("transcription_fallback", sender_id)
+            return None
+        logger.warning("[%s] Empty transcription with %s, trying whisper-1", short_id, AUDIO_TRANSCRIPTION_MODEL)
+        RETRIES_TOTAL.labels(operation="transcription_fallback").inc()
+        with timed(TRANSCRIPTION_STAGE_SECONDS, stage="api"):
             fallback = await asyncio.to_thread(
-                _transcribe_audio_bytes, transcribe_bytes, transcribe_suffix, "whisper-1"
+                _transcribe_audio_bytes,
+                transcribe_bytes,
+                transcribe_suffix,
+                "whisper-1",
+                deadline.timeout(60.0, floor=1.0),
             )
-            if fallback:
-                return fallback
-        return None
+        if duration_seconds:
+            TRANSCRIBED_AUDIO_SECONDS.inc(duration_seconds)
+        return fallback or None
     except BadRequestError as exc:
         logger.error("[%s] Audio transcription rejected: %s", short_id, exc)
         return None
+    except CircuitOpenError:
+        logger.warning("[%s] Audio transcription skipped: OpenAI circuit open", short_id)
+        return None
     except Exception as exc:
         logger.error("[%s] Audio transcription failed: %s", short_id, exc, exc_info=True)
         return None
@@ -0,0 +1,115 @@
+"""
+Energy-based voice activity trimming of the 16 kHz mono WAV sent for transcription.
+
+The audio is cut into 20 ms frames and a frame is speech when its RMS level reaches the threshold:
+the higher of AUDIO_VAD_MIN_DBFS and a level taken from the clip itself (about 10 dB over its noise
+floor, the quietest tenth of the frames, but never more than 20 dB under its loudest frame).
+Speech keeps PADDING_SECONDS of audio on each side, silence before the first word and after the
+last is dropped and longer pauses are shortened to AUDIO_VAD_MAX_PAUSE_SECONDS.
+
+Frame levels are summed over `array` slices with `map`/`sum` (C loops, about 60 ms for 45 s of audio).
+A clip where nothing reaches the threshold is left as is: the model decides whether it holds speech.
+"""
+import array
+import io
+import math
+import sys
+import wave
+from dataclasses import dataclass
+from operator import mul
+from typing import List, Optional, Tuple
+
+from src.config import AUDIO_VAD_MAX_PAUSE_SECONDS, AUDIO_VAD_MIN_DBFS
+
+FRAME_SECONDS = 0.02
+PADDING_SECONDS = 0.2
+NOISE_MARGIN = 3.0  # ~10 dB over the noise floor
+PEAK_FRACTION = 0.1  # the threshold stays at least 20 dB under the loudest frame
+FULL_SCALE = 32768
+
+
+@dataclass(frozen=True)
+class TrimResult:
+    wav: bytes
+    original_seconds: float
+    seconds: float
+
+    @property
+    def trimmed_seconds(self) -> float:
+        return self.original_seconds - self.seconds
+
+
+def _frame_levels(samples: array.array, frame: int) -> List[float]:
+    levels = []
+    for start in range(0, len(samples), frame):
+        chunk = samples[start:start + frame]
+        levels.append(math.sqrt(sum(map(mul, chunk, chunk)) / len(chunk)))
+    return levels
+
+
+def _speech_frames(levels: List[float], min_dbfs: float) -> List[bool]:
+    ordered = sorted(levels)
+    adaptive = min(ordered[len(ordered) // 10] * NOISE_MARGIN, ordered[-1] * PEAK_FRACTION)
+    threshold = max(FULL_SCALE * 10 ** (min_dbfs / 20), adaptive)
+    voiced = [level >= threshold for level in levels]
+
+    padding = round(PADDING_SECONDS / FRAME_SECONDS)
+    keep = [False] * len(voiced)
+    for index, is_voiced in enumerate(voiced):
+        if is_voiced:
+            for padded in range(max(0, index - padding), min(len(keep), index + padding + 1)):
+                keep[padded] = True
+    return keep
+
+
+def _kept_ranges(keep: List[bool], max_pause_frames: int) -> List[Tuple[int, int]]:
+    """[start, end) frame ranges: speech, plus the pauses between speech cut to `max_pause_frames`."""
+    ranges = []
+    index = 0
+    while index < len(keep):
+        end = index
+        while end < len(keep) and keep[end] == keep[index]:
+            end += 1
+        if keep[index]:
+            ranges.append((index, end))
+        elif ranges and end < len(keep):
+            ranges.append((index, min(end, index + max_pause_frames)))
+        index = end
+    return ranges
+
+
+def trim_silence(
+    wav_bytes: bytes, min_dbfs: float = AUDIO_VAD_MIN_DBFS, max_pause_seconds: float = AUDIO_VAD_MAX_PAUSE_SECONDS
+) -> Optional[TrimResult]:
+    """Trimmed copy of a mono 16-bit PCM WAV; None when the bytes are not one."""
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as source:
+            if source.getnchannels() != 1 or source.getsampwidth() != 2:
+                return None
+            rate = source.getframerate()
+            samples = array.array("h", source.readframes(source.getnframes()))
+    except (wave.Error, EOFError):
+        return None
+    if sys.byteorder == "big":
+        samples.byteswap()  # WAV samples are little-endian
+
+    original_seconds = len(samples) / rate
+    frame = max(1, int(rate * FRAME_SECONDS))
+    levels = _frame_levels(samples, frame)
+    keep = _speech_frames(levels, min_dbfs) if levels else []
+    if not any(keep):
+        return TrimResult(wav_bytes, original_seconds, original_seconds)
+
+    trimmed = array.array("h")
+    for start, end in _kept_ranges(keep, round(max_pause_seconds / FRAME_SECONDS)):
+        trimmed.extend(samples[start * frame:end * frame])
+    if sys.byteorder == "big":
+        trimmed.byteswap()
+
+    output = io.BytesIO()
+    with wave.open(output, "wb") as target:
+        target.setnchannels(1)
+        target.setsampwidth(2)
+        target.setframerate(rate)
+        target.writeframes(trimmed.tobytes())
+    return TrimResult(output.getvalue(), original_seconds, len(trimmed) / rate)
@@ -7,23 +7,71 @@ POST /webhook  –  Receive Instagram messaging events
 import asyncio
 import logging
 import time
-from fastapi import APIRouter, HTTPException, Query, Request, BackgroundTasks
+from typing import Optional
+from opentelemetry import trace
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import FileResponse
-from pydantic import ValidationError
-from src.config import ENABLE_INSTAGRAM_AUDIO_REPLY, INSTAGRAM_VERIFY_TOKEN, MAX_AGENT_INPUT_CHARS
-from src.agent import get_agent
-from src.api.instagram import send_audio_message, send_message
+from src.config import (
+    AGENT_MODEL,
+    AGENT_SMALL_MODEL,
+    BUFFER_SILENCE_SECONDS,
+    ENABLE_AGENT_STREAMING,
+    ENABLE_INSTAGRAM_AUDIO_REPLY,
+    ENABLE_MENU_STATE_MACHINE,
+    ENABLE_MODEL_ROUTER,
+    ENABLE_RESPONSE_CACHE,
+    ENABLE_SHARDING,
+    INSTAGRAM_VERIFY_TOKEN,
+    MAX_AGENT_INPUT_CHARS,
+    OVERLOAD_MAX_DEFER_SECONDS,
+    STREAM_MIN_CHUNK_CHARS,
+)
+from src.agent import get_agent, raise_for_run_status, record_synthetic_turn, session_has_history
+from src.circuit_breaker import OPENAI, CircuitOpenError, get_circuit_breaker
+from src.deadline import Deadline
+from src.lifecycle import get_lifecycle
+from src.overload import get_overload_controller
+from src.menu import get_menu_state_machine
+from src.response_cache import get_response_cache, is_cacheable
+from src.router import ROUTE_SMALL, ROUTE_TEMPLATE, RouteDecision, route_message
+from src.sharding import get_shard_router
+from src.tenants import current_tenant, get_tenant_registry, use_tenant
+from src.api.instagram import register_reply_echoes, send_audio_message, send_message
 from src.api.transcription import transcribe_audio_from_url
 from src.api.scope_classifier import is_out_of_scope
 from src.api.audio_reply import create_audio_reply_url, resolve_audio_file
-from src.models import WebhookMessage
+from src.models import validate_webhook_fields
 from src.interaction_blocker import get_blocker
 from src.api.message_buffer import MessageBuffer
+from src.api.reply_stream import ReplyChunker, split_reply, stream_agent_run
+from src.usage import get_usage_tracker
+from src.metrics import (
+    AGENT_RUN_SECONDS,
+    BATCH_MESSAGES,
+    BATCHES_TOTAL,
+    BLOCKS_TOTAL,
+    BUFFER_WAIT_SECONDS,
+    ECHOES_TOTAL,
+    ERRORS_TOTAL,
+    IN_FLIGHT,
+    MESSAGES_TOTAL,
+    OVERLOAD_SHED_TOTAL,
+    TIME_TO_FIRST_MESSAGE_SECONDS,
+    WEBHOOK_SECONDS,
+    timed,
+)
+from src.tracing import capture_context, start_span
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
 router = APIRouter()
 
+AGENT_SEND_RESERVE_SECONDS = 3.0  # budget kept back from the agent run for sending the reply
+MIN_AUDIO_REPLY_BUDGET_SECONDS = 8.0  # TTS + upload; below this the reply goes out as text
+AGENT_ERROR_TEXT = "Desculpe, encontrei um erro ao processar sua mensagem. Tente novamente mais tarde."
+AGENT_TIMEOUT_TEXT = "Desculpe a demora! Tive uma instabilidade agora. Pode mandar sua mensagem de novo?"
+AGENT_DEFERRED_TEXT = "Recebi sua mensagem! Estou com muitos atendimentos agora, respondo em instantes."
+DEFER_POLL_SECONDS = 2.0
+
 
 def _extract_audio_url(attachments) -> str:
     if not attachments:
@@ -75,11 +123,13 @@ async def get_audio_file(file_name: str):
 # --------------------------------------------------------------------------- #
 
 @router.post("/webhook")
-async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
+@timed(WEBHOOK_SECONDS, in_flight="webhook")
+async def receive_webhook(request: Request):
     """
     Receives all Instagram messaging events.
     Filters for 'messages' entries and processes them asynchronously.
-    Meta expects a 200 OK within 20s – we return immediately and process in background.
+    Meta expects a 200 OK within 20s – we return immediately and process in background
+    (tracked by src.lifecycle, so a shutdown drains them).
     """
     # Validate HMAC signature (reject if missing)
     signature = request.headers.get("X-Hub-Signature-256")
@@ -92,133 +142,230 @@ async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
     logger.debug("Webhook payload: %s", body)
 
-    blocker = get_blocker()
+    with start_span("webhook.receive", entries=len(body.get("entry", []))):
+        await _dispatch_webhook_entries(body)
+
+    return {"status": "received"}
 
+
+async def _dispatch_webhook_entries(body: dict) -> None:
+    tenants = get_tenant_registry()
     for entry in body.get("entry", []):
         entry_id: str = entry.get("id", "")
-        for messaging in entry.get("messaging", []):
-            sender_id: str = messaging.get("sender", {}).get("id", "")
-            recipient_id: str = messaging.get("recipient", {}).get("id", "")
-            message = messaging.get("message", {})
-            text: str = message.get("text", "")
-            attachments = message.get("attachments", [])
-            audio_url = _extract_audio_url(attachments)
-            is_echo_message = message.get("is_echo", False)
-            is_outgoing_message = bool(entry_id and sender_id == entry_id)
-
-            # Outgoing messages (from your Instagram business account) should never
-            # be processed by the agent as incoming user messages.
-            # For echo events, only block when it is NOT an echo of agent API send.
-            if is_echo_message or is_outgoing_message:
-                conversation_user_id = recipient_id if is_outgoing_message else sender_id
-                logger.info(
-                    "[OUTGOING] sender=%s recipient=%s echo=%s text=%s",
-                    sender_id[-6:] if sender_id else "",
-                    recipient_id[-6:] if recipient_id else "",
-                    is_echo_message,
-                    text[:80],
-                )
-                if is_echo_message and conversation_user_id and text:
-                    is_agent_echo = blocker.consume_agent_outbound_echo(conversation_user_id, text)
-                    if is_agent_echo:
-                        logger.info("[OUTGOING] Agent echo ignored for %s", conversation_user_id[-6:])
-                    else:
-                        logger.info("[OUTGOING] Manual interface interaction detected for %s", conversation_user_id[-6:])
-                        blocker.mark_user_interaction(conversation_user_id)
-                continue
+        # Everything started for this entry (echo bookkeeping, background handlers) runs as its page.
+        with use_tenant(tenants.resolve(entry_id)):
+            await _dispatch_entry(entry_id, entry)
 
-            if sender_id and text:
-                logger.info("[RECV] from=%s text=%s", sender_id[-6:], text[:80])
-                background_tasks.add_task(_handle_message, sender_id, text)
-            elif sender_id and audio_url:
-                logger.info("[RECV] from=%s audio_attachment=1", sender_id[-6:])
-                background_tasks.add_task(_handle_audio_message, sender_id, audio_url)
 
-    return {"status": "received"}
+async def _dispatch_entry(entry_id: str, entry: dict) -> None:
+    blocker = get_blocker()
+    received_at = time.time()
+
+    for messaging in entry.get("messaging", []):
+        sender_id: str = messaging.get("sender", {}).get("id", "")
+        recipient_id: str = messaging.get("recipient", {}).get("id", "")
+        message = messaging.get("message", {})
+        text: str = message.get("text", "")
+        attachments = message.get("attachments", [])
+        audio_url = _extract_audio_url(attachments)
+        is_echo_message = message.get("is_echo", False)
+        is_outgoing_message = bool(entry_id and sender_id == entry_id)
+
+        # Outgoing messages (from your Instagram business account) should never
+        # be processed by the agent as incoming user messages.
+        # For echo events, only block when it is NOT an echo of agent API send.
+        if is_echo_message or is_outgoing_message:
+            conversation_user_id = recipient_id if is_outgoing_message else sender_id
+            logger.info(
+                "[OUTGOING] sender=%s recipient=%s echo=%s text=%s",
+                sender_id[-6:] if sender_id else "",
+                recipient_id[-6:] if recipient_id else "",
+                is_echo_message,
+                text[:80],
+            )
+            if is_echo_message and conversation_user_id and text:
+                is_agent_echo = blocker.consume_agent_outbound_echo(conversation_user_id, text)
+                if is_agent_echo:
+                    ECHOES_TOTAL.labels(kind="agent").inc()
+                    logger.info("[OUTGOING] Agent echo ignored for %s", conversation_user_id[-6:])
+                else:
+                    ECHOES_TOTAL.labels(kind="manual").inc()
+                    logger.info("[OUTGOING] Manual interface interaction detected for %s", conversation_user_id[-6:])
+                    blocker.mark_user_interaction(conversation_user_id)
+            continue
+
+        if not sender_id or not (text or audio_url):
+            continue
+        if ENABLE_SHARDING and await _forward_to_owner(sender_id, text, audio_url, received_at):
+            continue
+        _start_handler(sender_id, text, audio_url, received_at)
 
 
-async def _handle_audio_message(sender_id: str, audio_url: str) -> None:
+def dispatch_forwarded(item: dict) -> None:
+    """Handle a message another worker forwarded to this one, the owner of its conversation."""
+    with use_tenant(get_tenant_registry().resolve(item.get("tenant", ""))):
+        _start_handler(item["sender_id"], item.get("text", ""), item.get("audio_url", ""), item.get("received_at"))
+
+
+async def _forward_to_owner(sender_id: str, text: str, audio_url: str, received_at: float) -> bool:
+    """Send the message to the worker owning the conversation (see src/sharding.py); False when it is this one."""
+    tenant = current_tenant()
+    item = {
+        "tenant": tenant.id, "sender_id": sender_id, "text": text, "audio_url": audio_url, "received_at": received_at,
+    }
+    try:
+        forwarded = await asyncio.to_thread(get_shard_router().route, tenant.key(sender_id), item)
+    except Exception as e:
+        logger.error("[SHARD] Failed to forward message of %s, handling it here: %s", sender_id[-6:], e)
+        return False
+    if forwarded:
+        logger.info("[SHARD] from=%s forwarded to the conversation owner", sender_id[-6:])
+    return forwarded
+
+
+def _start_handler(sender_id: str, text: str, audio_url: str, received_at: Optional[float] = None) -> None:
+    lifecycle = get_lifecycle()
+    deadline = Deadline(started_at=received_at)
+    if text:
+        MESSAGES_TOTAL.labels(kind="text").inc()
+        logger.info("[RECV] from=%s text=%s", sender_id[-6:], text[:80])
+        lifecycle.spawn(_handle_message(sender_id, text, capture_context(), deadline))
+    else:
+        MESSAGES_TOTAL.labels(kind="audio").inc()
+        logger.info("[RECV] from=%s audio_attachment=1", sender_id[-6:])
+        lifecycle.spawn(_handle_audio_message(sender_id, audio_url, capture_context(), deadline))
+
+
+async def _handle_audio_message(
+    sender_id: str, audio_url: str, trace_context=None, deadline: Optional[Deadline] = None
+) -> None:
+    with start_span("message.handle_audio", sender_id, parent=trace_context):
+        await _handle_audio_message_logic(sender_id, audio_url, deadline or Deadline())
+
+
+async def _handle_audio_message_logic(sender_id: str, audio_url: str, deadline: Deadline) -> None:
     short_id = sender_id[-6:]
-    transcription = await transcribe_audio_from_url(audio_url, sender_id)
+    transcription = await transcribe_audio_from_url(audio_url, sender_id, deadline)
     if not transcription:
+        ERRORS_TOTAL.labels(stage="transcription").inc()
         logger.warning("[%s] Could not transcribe audio attachment", short_id)
-        await send_message(sender_id, "Recebi seu audio, mas nao consegui transcrever agora. Pode enviar em texto?")
+        await send_message(
+            sender_id, "Recebi seu audio, mas nao consegui transcrever agora. Pode enviar em texto?", deadline=deadline
+        )
         return
 
     logger.info("[%s] Audio transcribed successfully (%d chars)", short_id, len(transcription))
-    if await is_out_of_scope(transcription):
+    overload = get_overload_controller()
+    if overload.skip_classifier():
+        OVERLOAD_SHED_TOTAL.labels(action="scope_classification").inc()
+    elif await is_out_of_scope(transcription, deadline):
         logger.info("[%s] Out-of-scope audio detected, generating agent reply in audio mode", short_id)
-        out_of_scope_text = await _generate_agent_reply_logic(sender_id, transcription)
+        out_of_scope_text = await _generate_agent_reply_logic(sender_id, transcription, deadline)
         if not out_of_scope_text:
             out_of_scope_text = (
                 "Entendi o que voce disse. Posso te ajudar com motos Shineray, pagamento e simulacao."
             )
-        if ENABLE_INSTAGRAM_AUDIO_REPLY:
+        if ENABLE_INSTAGRAM_AUDIO_REPLY and overload.skip_audio_reply():
+            OVERLOAD_SHED_TOTAL.labels(action="audio_reply").inc()
+            logger.info("[%s] Overloaded; sending text instead of audio reply", short_id)
+        elif ENABLE_INSTAGRAM_AUDIO_REPLY and not deadline.has(MIN_AUDIO_REPLY_BUDGET_SECONDS):
+            deadline.record_overrun("audio_reply", sender_id)
+        elif ENABLE_INSTAGRAM_AUDIO_REPLY:
             reply_audio_url = await create_audio_reply_url(out_of_scope_text)
             if reply_audio_url:
                 try:
-                    await send_audio_message(sender_id, reply_audio_url)
+                    await send_audio_message(sender_id, reply_audio_url, deadline=deadline)
                     return
                 except Exception as exc:
+                    ERRORS_TOTAL.labels(stage="audio_reply").inc()
                     logger.warning("[%s] Audio reply failed, falling back to text: %s", short_id, exc)
             else:
                 logger.warning("[%s] Could not build audio reply URL, falling back to text", short_id)
         else:
             logger.info("[%s] Instagram audio reply disabled; sending text fallback", short_id)
-        await send_message(sender_id, out_of_scope_text)
+        await send_message(sender_id, out_of_scope_text, deadline=deadline)
         return
 
-    await _handle_message(sender_id, transcription)
+    await _handle_message(sender_id, transcription, deadline=deadline)
 
 
-async def _handle_message(sender_id: str, text: str) -> None:
+async def _handle_message(sender_id: str, text: str, trace_context=None, deadline: Optional[Deadline] = None) -> None:
     """
     Buffer the incoming message and schedule processing if needed.
     """
+    with start_span("message.handle", sender_id, parent=trace_context) as span:
+        await _handle_message_logic(sender_id, text, span, deadline or Deadline())
+
+
+async def _handle_message_logic(sender_id: str, text: str, span, deadline: Deadline) -> None:
     short_id = sender_id[-6:]
     
     blocker = get_blocker()
     if blocker.is_blocked(sender_id):
+        BLOCKS_TOTAL.inc()
         remaining = blocker.get_remaining_block_time(sender_id)
         logger.info("[%s] Agent blocked - user still interacting (%.0f sec remaining)", 
                    short_id, remaining or 0)
+        span.set_attribute("blocked", True)
         return
 
     buffer = MessageBuffer()
     buffer.add_message(sender_id, text)
-    buffer.touch_timer(sender_id)
 
     logger.info("[%s] Message buffered. Attempting to acquire processing lock...", short_id)
     if buffer.acquire_processing_lock(sender_id):
         logger.info("[%s] Lock acquired. Starting buffer processor.", short_id)
-        await _process_buffered_messages(sender_id, buffer)
+        span.set_attribute("buffer.processor", True)
+        await _process_buffered_messages(sender_id, buffer, deadline)
     else:
         logger.info("[%s] Processor already running. Message will be picked up.", short_id)
+        span.set_attribute("buffer.processor", False)
 
 
-async def _process_buffered_messages(sender_id: str, buffer: MessageBuffer):
+@timed(BUFFER_WAIT_SECONDS)
+async def _wait_for_buffer_silence(sender_id: str, buffer: MessageBuffer) -> None:
     short_id = sender_id[-6:]
-    try:
-        while True:
+    lifecycle = get_lifecycle()
+    with start_span("buffer.wait", sender_id):
+        while not lifecycle.draining:
             last_time = buffer.get_last_message_time(sender_id)
             now = time.time()
             elapsed = now - last_time
-            remaining = 5.0 - elapsed
+            remaining = BUFFER_SILENCE_SECONDS - elapsed
 
             if remaining > 0:
                 logger.debug("[%s] Waiting for buffer silence (%.2fs remaining)", short_id, remaining)
-                await asyncio.sleep(remaining)
+                await lifecycle.sleep(remaining)
                 continue
             else:
                 break
 
+
+async def _process_buffered_messages(sender_id: str, buffer: MessageBuffer, deadline: Deadline):
+    with start_span("buffer.process", sender_id):
+        await _process_buffered_messages_logic(sender_id, buffer, deadline)
+
+
+async def _process_buffered_messages_logic(sender_id: str, buffer: MessageBuffer, deadline: Deadline):
+    short_id = sender_id[-6:]
+    in_flight = IN_FLIGHT.labels(stage="buffer_processor")
+    in_flight.inc()
+    lock_held = True
+    try:
+        wait_started = time.monotonic()
+        await _wait_for_buffer_silence(sender_id, buffer)
+        # The debounce window is deliberate latency, not work: it does not consume the reply budget.
+        deadline.extend(time.monotonic() - wait_started)
+
         messages = buffer.get_and_clear_messages(sender_id)
         if not messages:
             logger.warning("[%s] Buffer empty after wait loop?", short_id)
-            buffer.release_processing_lock(sender_id)
             return
 
         combined_text = "\n".join(messages)
+        trace.get_current_span().set_attribute("batch.size", len(messages))
+        BATCHES_TOTAL.inc()
+        BATCH_MESSAGES.observe(len(messages))
         logger.info("[%s] Processing batch of %d messages", short_id, len(messages))
 
         # Release lock before processing to prevent deadlocks,
@@ -235,74 +382,416 @@ async def _process_buffered_messages(sender_id: str, buffer: MessageBuffer):
         # This processor handles the old batch.
         # This is correct.
         buffer.release_processing_lock(sender_id)
+        lock_held = False
 
-        await _execute_agent_logic(sender_id, combined_text)
+        await _execute_agent_logic(sender_id, combined_text, deadline)
 
     except Exception as e:
+        ERRORS_TOTAL.labels(stage="buffer_processor").inc()
         logger.error("[%s] Error in buffer processor: %s", short_id, e)
-        buffer.release_processing_lock(sender_id)
+    finally:
+        # Also on cancellation (shutdown drain timeout): never leave the lock to its 60s TTL.
+        if lock_held:
+            buffer.release_processing_lock(sender_id)
+        in_flight.dec()
 
 
-async def _execute_agent_logic(sender_id: str, text: str) -> None:
+async def _execute_agent_logic(
+    sender_id: str, text: str, deadline: Optional[Deadline] = None, allow_defer: bool = True
+) -> None:
     """
     Process the (combined) message through the Agno agent and reply to the user.
     """
+    deadline = deadline or Deadline()
+    with start_span(
+        "agent.execute",
+        sender_id,
+        streaming=ENABLE_AGENT_STREAMING,
+        input_chars=len(text),
+        budget_remaining_s=round(deadline.remaining(), 2),
+    ):
+        await _execute_agent_logic_inner(sender_id, text, deadline, allow_defer)
+
+
+async def _execute_agent_logic_inner(sender_id: str, text: str, deadline: Deadline, allow_defer: bool) -> None:
     short_id = sender_id[-6:]
 
     blocker = get_blocker()
     if blocker.is_blocked(sender_id):
+        BLOCKS_TOTAL.inc()
         return
     
-    # Validate incoming message format
-    try:
-        WebhookMessage(sender_id=sender_id, text=text)
-    except ValidationError as e:
-        logger.error("[%s] Invalid message format: %s", short_id, e)
+    # Validate incoming message format (fast path, same rules as WebhookMessage)
+    validation_error = validate_webhook_fields(sender_id, text)
+    if validation_error:
+        logger.error("[%s] Invalid message format: %s", short_id, validation_error)
         return
 
-    reply_text = await _generate_agent_reply_logic(sender_id, text)
+    started_at = time.monotonic()
+    # Bare menu selections ("1", "menu") need no agent, so they are answered even when overloaded.
+    if ENABLE_MENU_STATE_MACHINE:
+        decision = await asyncio.to_thread(get_menu_state_machine().handle, sender_id, text)
+        if decision is not None:
+            trace.get_current_span().set_attribute("route", decision.reason)
+            await _send_canned_reply(sender_id, text, decision, started_at, deadline)
+            return
+
+    if allow_defer and get_overload_controller().should_defer():
+        await _defer_agent_run(sender_id, text, deadline)
+        return
+
+    model_id = None
+    is_first_turn = _first_turn_check(sender_id)
+    if ENABLE_MODEL_ROUTER:
+        decision = await asyncio.to_thread(route_message, text, is_first_turn, sender_id)
+        trace.get_current_span().set_attribute("route", decision.route)
+        if decision.route == ROUTE_TEMPLATE:
+            await _send_canned_reply(sender_id, text, decision, started_at, deadline)
+            return
+        if decision.route == ROUTE_SMALL:
+            model_id = AGENT_SMALL_MODEL
+
+    # First-turn replies do not depend on history: answer repeated opening questions from the cache.
+    cache_reply = ENABLE_RESPONSE_CACHE and is_cacheable(text) and await asyncio.to_thread(is_first_turn)
+    if cache_reply:
+        cached = await asyncio.to_thread(get_response_cache().lookup, text)
+        trace.get_current_span().set_attribute("response_cache.hit", cached is not None)
+        if cached:
+            decision = RouteDecision(ROUTE_TEMPLATE, "response_cache", reply=cached)
+            await _send_canned_reply(sender_id, text, decision, started_at, deadline)
+            return
+
+    if ENABLE_AGENT_STREAMING:
+        await _stream_agent_reply_logic(sender_id, text, started_at, deadline, model_id, cache_reply)
+        return
+
+    reply_text = await _generate_agent_reply_logic(sender_id, text, deadline, model_id, cache_reply)
 
     if reply_text:
         logger.info("[SEND] to=%s text=%s", short_id, reply_text[:80])
-        chunks = [reply_text[i:i+1000] for i in range(0, len(reply_text), 1000)]
-        for chunk in chunks:
-            await send_message(sender_id, chunk)
+        chunks = split_reply(reply_text)
+        registration = register_reply_echoes(sender_id, chunks)
+        for index, chunk in enumerate(chunks):
+            await send_message(sender_id, chunk, deadline=deadline, register_echo=False)
+            if index == 0:
+                _record_time_to_first_message(sender_id, started_at, streamed=False)
+        await registration
+        await _observe_menu(sender_id, reply_text)
+        _remember_turn(sender_id)
     else:
         logger.warning("[%s] Empty response from agent.", short_id)
 
 
-async def _generate_agent_reply_logic(sender_id: str, text: str) -> str:
+async def _defer_agent_run(sender_id: str, text: str, deadline: Deadline) -> None:
+    """Acknowledge now and run the agent once the service leaves DEFER mode."""
+    OVERLOAD_SHED_TOTAL.labels(action="deferred").inc()
+    logger.info("[%s] Overloaded; deferring agent run", sender_id[-6:])
+    await _notify_user(sender_id, deadline, AGENT_DEFERRED_TEXT)
+    get_lifecycle().spawn(_run_deferred(sender_id, text))
+
+
+async def _run_deferred(sender_id: str, text: str) -> None:
+    overload = get_overload_controller()
+    lifecycle = get_lifecycle()
+    waited = 0.0
+    # A draining worker runs it right away: the user was promised a reply.
+    while overload.should_defer() and waited < OVERLOAD_MAX_DEFER_SECONDS and not lifecycle.draining:
+        await lifecycle.sleep(DEFER_POLL_SECONDS)
+        waited += DEFER_POLL_SECONDS
+    # The user was already acknowledged: the deferred run gets a fresh budget and is never deferred again.
+    await _execute_agent_logic(sender_id, text, Deadline(), allow_defer=False)
+
+
+async def _send_canned_reply(
+    sender_id: str, text: str, decision: RouteDecision, started_at: float, deadline: Deadline
+) -> None:
+    """Send a routed template reply (no agent run) and record the turn in the session history."""
     short_id = sender_id[-6:]
+    reply = decision.reply
+    logger.info("[SEND] to=%s text=%s", short_id, reply[:80])
+    chunks = split_reply(reply)
+    registration = register_reply_echoes(sender_id, chunks)
+    for index, chunk in enumerate(chunks):
+        await send_message(sender_id, chunk, deadline=deadline, register_echo=False)
+        if index == 0:
+            _record_time_to_first_message(sender_id, started_at, streamed=False)
+    await registration
+    get_usage_tracker().record_canned_reply(sender_id, decision.reason)
+    if not decision.reason.startswith("menu"):
+        await _observe_menu(sender_id, reply)
+    agent = _take_agent(sender_id)
+    stored = False
     try:
-        bounded_text = text.strip()
-        if len(bounded_text) > MAX_AGENT_INPUT_CHARS:
-            bounded_text = bounded_text[:MAX_AGENT_INPUT_CHARS]
-            logger.info(
-                "[%s] Agent input truncated to %d chars for cost control",
-                short_id,
-                MAX_AGENT_INPUT_CHARS,
-            )
+        await asyncio.to_thread(record_synthetic_turn, sender_id, text, reply, agent)
+        stored = True
+    except Exception as exc:
+        logger.error("[%s] Failed to store canned reply in session history: %s", short_id, exc)
+        return
+    finally:
+        _return_agent(sender_id, agent if stored else None)
+    _remember_turn(sender_id)
+
 
-        agent = get_agent(session_id=sender_id)
+async def _observe_menu(sender_id: str, reply: str) -> None:
+    """Let the menu state machine know whether the reply just sent listed the options."""
+    if ENABLE_MENU_STATE_MACHINE:
+        await asyncio.to_thread(get_menu_state_machine().observe_reply, sender_id, reply)
+
+
+def _first_turn_check(sender_id: str):
+    """`is_first_turn` callable that reads the session at most once (shared by router and cache)."""
+    result = []
+
+    def _is_first_turn() -> bool:
+        if not result:
+            result.append(not _has_history(sender_id))
+        return result[0]
+
+    return _is_first_turn
+
+
+def _has_history(sender_id: str) -> bool:
+    """With sharding this worker owns the conversation, so a turn it handled spares the session read."""
+    if not ENABLE_SHARDING:
+        return session_has_history(sender_id)
+    shard = get_shard_router()
+    key = current_tenant().key(sender_id)
+    if shard.knows_history(key):
+        return True
+    has_history = session_has_history(sender_id)
+    if has_history:
+        shard.remember_turn(key)
+    return has_history
+
+
+def _remember_turn(sender_id: str) -> None:
+    if ENABLE_SHARDING:
+        get_shard_router().remember_turn(current_tenant().key(sender_id))
+
+
+async def _cache_agent_reply(sender_id: str, text: str, response) -> None:
+    """Store a first-turn agent reply, unless the run called tools (e.g. saved a lead)."""
+    reply = getattr(response, "content", None)
+    if not isinstance(reply, str) or not reply or getattr(response, "tools", None):
+        return
+    try:
+        await asyncio.to_thread(get_response_cache().store, text, reply)
+    except Exception as exc:
+        logger.error("[%s] Failed to store reply in response cache: %s", sender_id[-6:], exc)
+
+
+def _build_agent(sender_id: str, model_id: Optional[str] = None):
+    if model_id != AGENT_SMALL_MODEL and get_overload_controller().use_small_model():
+        OVERLOAD_SHED_TOTAL.labels(action="small_model").inc()
+        model_id = AGENT_SMALL_MODEL
+    return _take_agent(sender_id, model_id)
+
+
+def _take_agent(sender_id: str, model_id: Optional[str] = None):
+    """
+    The conversation's agent for one turn; hand it back with `_return_agent`.
+    With sharding this worker owns the conversation and reuses the agent of its last turn, whose
+    session is already in memory (a new one is built when there is none or the model differs).
+    """
+    if not ENABLE_SHARDING:
+        return get_agent(session_id=sender_id, model_id=model_id)
+    shard = get_shard_router()
+    key = current_tenant().key(sender_id)
+    agent = shard.take_agent(key)
+    if agent is not None and agent.model.id == (model_id or AGENT_MODEL):
+        return agent
+    try:
+        return get_agent(session_id=sender_id, model_id=model_id, cache_session=True)
+    except Exception:
+        shard.return_agent(key, None)
+        raise
+
+
+def _return_agent(sender_id: str, agent) -> None:
+    """End the turn: keep `agent` for the next one (None when the turn was not stored)."""
+    if ENABLE_SHARDING:
+        get_shard_router().return_agent(current_tenant().key(sender_id), agent)
+
+
+def _record_time_to_first_message(sender_id: str, started_at: float, streamed: bool) -> None:
+    elapsed = time.monotonic() - started_at
+    logger.info("[%s] Time to first message: %.2fs (streamed=%s)", sender_id[-6:], elapsed, streamed)
+    TIME_TO_FIRST_MESSAGE_SECONDS.labels(mode="streamed" if streamed else "buffered").observe(elapsed)
+    get_usage_tracker().record_first_message(sender_id, elapsed, streamed)
+
+
+def _bound_agent_input(sender_id: str, text: str) -> str:
+    bounded_text = text.strip()
+    if len(bounded_text) > MAX_AGENT_INPUT_CHARS:
+        bounded_text = bounded_text[:MAX_AGENT_INPUT_CHARS]
+        logger.info(
+            "[%s] Agent input truncated to %d chars for cost control",
+            sender_id[-6:],
+            MAX_AGENT_INPUT_CHARS,
+        )
+    return bounded_text
+
+
+async def _notify_user(sender_id: str, deadline: Optional[Deadline] = None, text: str = AGENT_ERROR_TEXT) -> None:
+    try:
+        await send_message(sender_id, text, deadline=deadline)
+    except Exception as notify_exc:
+        logger.error("[%s] Failed to send error message to user: %s", sender_id[-6:], notify_exc)
+
+
+async def _stream_agent_reply_logic(
+    sender_id: str,
+    text: str,
+    started_at: float,
+    deadline: Deadline,
+    model_id: Optional[str] = None,
+    cache_reply: bool = False,
+) -> None:
+    """
+    Stream the agent run and send each message as soon as a sentence/paragraph boundary is reached.
+    The stream is abandoned when the reply budget (minus the send reserve) runs out.
+
+    The run (agent slot, agent timeout, OpenAI breaker) is a task that queues the finished messages;
+    they are sent from here, so a slow or failing Graph send neither holds the slot nor counts
+    against the OpenAI circuit.
+    """
+    short_id = sender_id[-6:]
+    chunker = ReplyChunker(min_chars=STREAM_MIN_CHUNK_CHARS)
+    ready: asyncio.Queue = asyncio.Queue()  # messages to send; None once the run ended
+    sent = []
+    final_output = None
+
+    async def _send(chunks) -> None:
+        if not chunks:
+            return
+        registration = register_reply_echoes(sender_id, chunks)
+        for chunk in chunks:
+            logger.info("[SEND] to=%s text=%s", short_id, chunk[:80])
+            await send_message(sender_id, chunk, deadline=deadline, register_echo=False)
+            sent.append(chunk)
+            if len(sent) == 1:
+                _record_time_to_first_message(sender_id, started_at, streamed=True)
+        await registration
+
+    async def _run() -> None:
+        nonlocal final_output
+        agent = None
+        try:
+            agent = _build_agent(sender_id, model_id)
+            with timed(AGENT_RUN_SECONDS, in_flight="agent", mode="streamed"), start_span("agent.run", sender_id):
+                async with (
+                    asyncio.timeout(max(0.0, deadline.remaining() - AGENT_SEND_RESERVE_SECONDS)),
+                    get_overload_controller().agent_slot(),
+                ):
+                    with get_circuit_breaker(OPENAI).guard():
+                        async for item in stream_agent_run(agent, _bound_agent_input(sender_id, text)):
+                            if isinstance(item, str):
+                                for chunk in chunker.feed(item):
+                                    ready.put_nowait(chunk)
+                            else:
+                                get_usage_tracker().record_run(sender_id, getattr(item, "metrics", None))
+                                final_output = raise_for_run_status(item)
+            for chunk in chunker.flush():
+                ready.put_nowait(chunk)
+        finally:
+            if agent is not None:
+                _return_agent(sender_id, agent if final_output is not None else None)
+            ready.put_nowait(None)
+
+    run = asyncio.create_task(_run())
+    try:
+        finished = False
+        while not finished:
+            chunks = [await ready.get()]
+            while not ready.empty():
+                chunks.append(ready.get_nowait())
+            finished = chunks[-1] is None
+            await _send([chunk for chunk in chunks if chunk is not None])
+    except Exception as exc:
+        logger.error("[%s] Failed to send streamed reply: %s", short_id, exc)
+        return
+    finally:
+        if not run.done():
+            run.cancel()
+
+    try:
+        await run
+    except TimeoutError:
+        deadline.record_overrun("agent", sender_id)
+        if not sent:
+            await _notify_user(sender_id, deadline, AGENT_TIMEOUT_TEXT)
+        return
+    except CircuitOpenError:
+        logger.warning("[%s] Agent run skipped: OpenAI circuit open", short_id)
+        if not sent:
+            await _notify_user(sender_id, deadline, AGENT_TIMEOUT_TEXT)
+        return
+    except Exception as exc:
+        ERRORS_TOTAL.labels(stage="agent").inc()
+        logger.error("[%s] Error streaming agent reply: %s", short_id, exc, exc_info=True)
+        if not sent:
+            await _notify_user(sender_id, deadline)
+        return
+
+    if not sent:
+        logger.warning("[%s] Empty response from agent.", short_id)
+        return
+    await _observe_menu(sender_id, "\n\n".join(sent))
+    _remember_turn(sender_id)
+    if cache_reply and final_output is not None:
+        await _cache_agent_reply(sender_id, text, final_output)
+
+
+async def _generate_agent_reply_logic(
+    sender_id: str,
+    text: str,
+    deadline: Optional[Deadline] = None,
+    model_id: Optional[str] = None,
+    cache_reply: bool = False,
+) -> str:
+    short_id = sender_id[-6:]
+    deadline = deadline or Deadline()
+    agent = response = None
+    try:
+        bounded_text = _bound_agent_input(sender_id, text)
+
+        agent = _build_agent(sender_id, model_id)
 
         def _run_agent():
-            return agent.run(bounded_text)
+            with get_circuit_breaker(OPENAI).guard():
+                return raise_for_run_status(agent.run(bounded_text))
 
-        response = await asyncio.to_thread(_run_agent)
+        # The worker thread cannot be interrupted; past the budget its result is discarded
+        # (its agent slot is only freed when the thread finishes).
+        agent_budget = max(0.0, deadline.remaining() - AGENT_SEND_RESERVE_SECONDS)
+        with timed(AGENT_RUN_SECONDS, in_flight="agent", mode="single"), start_span("agent.run", sender_id):
+            response = await get_overload_controller().run_in_thread(_run_agent, timeout=agent_budget)
 
         reply_text = ""
         if response is not None:
+            get_usage_tracker().record_run(sender_id, getattr(response, "metrics", None))
             if hasattr(response, "content") and response.content:
                 reply_text = response.content
             elif isinstance(response, str):
                 reply_text = response
+            if cache_reply and reply_text:
+                await _cache_agent_reply(sender_id, text, response)
         return reply_text or ""
 
+    except TimeoutError:
+        deadline.record_overrun("agent", sender_id)
+        await _notify_user(sender_id, deadline, AGENT_TIMEOUT_TEXT)
+        return ""
+    except CircuitOpenError:
+        logger.warning("[%s] Agent run skipped: OpenAI circuit open", short_id)
+        await _notify_user(sender_id, deadline, AGENT_TIMEOUT_TEXT)
+        return ""
     except Exception as exc:
+        ERRORS_TOTAL.labels(stage="agent").inc()
         logger.error("[%s] Error handling message: %s", short_id, exc, exc_info=True)
         # Try to notify user of error
-        try:
-            await send_message(sender_id, "Desculpe, encontrei um erro ao processar sua mensagem. Tente novamente mais tarde.")
-        except Exception as notify_exc:
-            logger.error("[%s] Failed to send error message to user: %s", short_id, notify_exc)
+        await _notify_user(sender_id, deadline)
         return ""
+    finally:
+        if agent is not None:
+            _return_agent(sender_id, agent if response is not None else None)
@@ -2,18 +2,118 @@ import sys
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
-from fastapi import FastAPI
-from src.api.webhook import router as webhook_router
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from src.agent import preload_agent_stack, session_storage_bytes
+from src.api.openai_client import close_openai_client
+from src.api.webhook import dispatch_forwarded, router as webhook_router
+from src.config import ENABLE_SHARDING, SHUTDOWN_DRAIN_SECONDS, validate_env_vars
+from src.health import STATUS_NOT_READY, get_health_monitor
+from src.lead_sink import stop_lead_sink
+from src.lifecycle import get_lifecycle
+from src.logging_config import configure_logging, stop_logging
+from src.metrics import mark_process_dead, render_metrics
+from src.sharding import get_shard_router
+from src.tenants import get_tenant_registry, use_tenant
+from src.tracing import configure_tracing, get_recent_traces
+from src.usage import get_usage_tracker
+
+logger = logging.getLogger(__name__)
+
+
+async def _preload_agent_stack() -> None:
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(preload_agent_stack)
+        logger.info("[STARTUP] Agent stack loaded in %.2fs", time.perf_counter() - started)
+    except Exception as e:
+        logger.error("[STARTUP] Failed to preload the agent stack: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    validate_env_vars()
+    configure_tracing()
+    # Agno and the OpenAI SDK load in the background: the worker takes traffic meanwhile and a
+    # message arriving first waits on the import lock.
+    preload = asyncio.create_task(_preload_agent_stack())
+    lifecycle = get_lifecycle()
+    lifecycle.install_signal_handler()
+    monitor = get_health_monitor()
+    await monitor.refresh()
+    monitor.start()
+    if ENABLE_SHARDING:
+        await get_shard_router().start(dispatch_forwarded)
+    yield
+    await monitor.stop()
+    if ENABLE_SHARDING:
+        # Leave the ring first so peers stop forwarding here; queued forwards go to the new owners.
+        await get_shard_router().stop()
+    # Runs after the server stopped accepting connections: finish (or cancel) buffered replies,
+    # then flush the lead queue.
+    await lifecycle.drain(SHUTDOWN_DRAIN_SECONDS)
+    await asyncio.to_thread(stop_lead_sink)
+    await preload
+    await asyncio.to_thread(close_openai_client)
+    mark_process_dead()
+    logger.info("[SHUTDOWN] Worker stopped")
+    stop_logging()
+
 
 app = FastAPI(
     title="Agente Instagram",
     description="Webhook receiver for Instagram messages via Meta Graph API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(webhook_router)
 
 
 @app.get("/health")
+@app.get("/health/live")
 async def health():
+    """Liveness: the worker's event loop answers."""
     return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def ready():
+    """Readiness from the cached dependency checks (see src/health.py); 503 when not ready."""
+    report = get_health_monitor().readiness()
+    return JSONResponse(status_code=503 if report["status"] == STATUS_NOT_READY else 200, content=report)
+
+
+@app.get("/usage")
+async def usage(session_id: Optional[str] = None, tenant: str = ""):
+    """
+    Token usage report of one tenant (Instagram account id; default: the single-account setup):
+    aggregate, or for a single conversation when session_id is given.
+    """
+    with use_tenant(get_tenant_registry().resolve(tenant)):
+        report = get_usage_tracker().get_report(session_id)
+        if session_id:
+            try:
+                report["session_storage_bytes"] = await asyncio.to_thread(session_storage_bytes, session_id)
+            except Exception as e:
+                logger.error("Error reading session storage size: %s", e)
+        return report
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
+@app.get("/traces/recent")
+async def recent_traces(limit: int = 20):
+    """Most recent traces kept by the in-process span exporter."""
+    return {"traces": get_recent_traces(limit)}
@@ -0,0 +1,246 @@
+"""
+Product catalog: models and prices from a JSON data file (CATALOG_PATH), kept out of the prompt.
+
+The file is parsed once into an in-memory index and reloaded when its modification time
+changes (checked at most every CATALOG_RELOAD_SECONDS), so price updates need no restart.
+Each tenant may have its own file (see src/tenants.py); tenants sharing a file share its index.
+
+Name lookups split the normalized query into letter and digit runs ("jet50s" -> jet, 50, s) and
+resolve each one against the names and aliases of the models:
+
+    exact      inverted index token -> models ("shi efi")          O(1) per token
+    prefix     sorted vocabulary + bisect ("denv")                 O(log n) per token
+    typo       difflib close match over the vocabulary ("phenix")  only when the above miss
+
+The models matching the most tokens win. A number in the query must match exactly
+("jet 125" never returns the JET 50s; "shi 175" returns both SHI 175 versions).
+"""
+import bisect
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.config import CATALOG_PATH, CATALOG_RELOAD_SECONDS
+from src.tenants import current_tenant
+from src.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+MIN_PREFIX_CHARS = 3
+TYPO_CUTOFF = 0.8
+
+
+@dataclass(frozen=True)
+class CatalogModel:
+    name: str
+    category: str
+    price: float
+    note: str = ""
+    aliases: Tuple[str, ...] = ()
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.name} ({self.note})" if self.note else self.name
+
+
+@dataclass(frozen=True)
+class CatalogCategory:
+    id: str
+    title: str
+    aliases: Tuple[str, ...] = ()
+
+
+def format_price(price: float) -> str:
+    """12999.0 -> 'R$ 12.999,00'"""
+    return "R$ " + f"{price:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def format_models(models) -> List[str]:
+    """One '* NAME – R$ price' line per model (the price list layout of the script)."""
+    return [f"* {model.display_name} – {format_price(model.price)}" for model in models]
+
+
+def format_listing(index: "CatalogIndex", category_id: Optional[str] = None) -> str:
+    """Price list grouped by category (only `category_id` when given)."""
+    blocks = []
+    for category in index.categories:
+        if category_id and category.id != category_id:
+            continue
+        blocks.append("\n".join([category.title, *format_models(index.by_category(category.id))]))
+    return "\n\n".join(blocks)
+
+
+def _tokens(text: str) -> List[str]:
+    """Letter and digit runs of the normalized text ("jet50s" -> jet, 50, s)."""
+    return _TOKEN.findall(normalize_text(text))
+
+
+def _mention_pattern(name: str) -> re.Pattern:
+    """
+    Pattern for a model mentioned in free text: brand word plus the leading digits of the
+    version when there is one ("jet 50", "shi 175"), with optional spaces ("pt 1", "jet50").
+    """
+    words = normalize_text(name).split()
+    key = words[0]
+    if len(words) > 1 and words[1][0].isdigit():
+        key += " " + re.match(r"\d+", words[1]).group()
+    return re.compile(r"\b" + r"\s*".join(_TOKEN.findall(key)) + r"(?!\d)")
+
+
+@dataclass
+class CatalogIndex:
+    """Immutable snapshot of one catalog file."""
+
+    models: Tuple[CatalogModel, ...]
+    categories: Tuple[CatalogCategory, ...]
+    version: str
+    _postings: Dict[str, Set[int]] = field(default_factory=dict)
+    _words: List[str] = field(default_factory=list)
+    _category_aliases: Dict[str, str] = field(default_factory=dict)
+    _mentions: List[Tuple[CatalogModel, List[re.Pattern]]] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict, version: str = "") -> "CatalogIndex":
+        categories = tuple(
+            CatalogCategory(item["id"], item["titulo"], tuple(item.get("apelidos", ())))
+            for item in data.get("categorias", ())
+        )
+        models = tuple(
+            CatalogModel(
+                name=item["nome"],
+                category=item["categoria"],
+                price=float(item["preco"]),
+                note=item.get("observacao", ""),
+                aliases=tuple(item.get("apelidos", ())),
+            )
+            for item in data.get("modelos", ())
+        )
+        index = cls(models, categories, version)
+        postings = defaultdict(set)
+        for position, model in enumerate(models):
+            for label in (model.name, *model.aliases):
+                for token in _tokens(label):
+                    postings[token].add(position)
+            index._mentions.append((model, [_mention_pattern(label) for label in (model.name, *model.aliases)]))
+        index._postings = dict(postings)
+        index._words = sorted(token for token in postings if not token.isdigit())
+        for category in categories:
+            for alias in (category.id, *category.aliases):
+                index._category_aliases[normalize_text(alias)] = category.id
+        return index
+
+    # ------------------------------------------------------------------ #
+    # Queries                                                              #
+    # ------------------------------------------------------------------ #
+
+    def by_category(self, category_id: str) -> List[CatalogModel]:
+        return [model for model in self.models if model.category == category_id]
+
+    def find_category(self, query: str) -> Optional[str]:
+        normalized = normalize_text(query)
+        if normalized in self._category_aliases:
+            return self._category_aliases[normalized]
+        return next((self._category_aliases[word] for word in normalized.split() if word in self._category_aliases), None)
+
+    def _expand(self, token: str) -> Set[int]:
+        """Models matching one query token: exact, then prefix, then close spelling."""
+        if token in self._postings:
+            return self._postings[token]
+        if token.isdigit():
+            return set()
+        if len(token) >= MIN_PREFIX_CHARS:
+            start = bisect.bisect_left(self._words, token)
+            hits: Set[int] = set()
+            for word in self._words[start:]:
+                if not word.startswith(token):
+                    break
+                hits |= self._postings[word]
+            if hits:
+                return hits
+            close = difflib.get_close_matches(token, self._words, n=2, cutoff=TYPO_CUTOFF)
+            return set().union(*(self._postings[word] for word in close)) if close else set()
+        return set()
+
+    def search(self, query: str) -> List[CatalogModel]:
+        """Best matching models for a model name or fragment (empty when nothing matches)."""
+        scores: Dict[int, int] = defaultdict(int)
+        numbers = []
+        for token in _tokens(query):
+            hits = self._expand(token)
+            if token.isdigit():
+                numbers.append(hits)
+            for position in hits:
+                scores[position] += 1
+        # Every number given must belong to the model ("jet 125" is not the JET 50s).
+        candidates = set(scores)
+        for hits in numbers:
+            candidates &= hits
+        if not candidates:
+            return []
+        best = max(scores[position] for position in candidates)
+        return [self.models[position] for position in sorted(candidates) if scores[position] == best]
+
+    def mentioned(self, normalized_text: str) -> List[str]:
+        """Names of the models mentioned anywhere in an already normalized message."""
+        return [model.name for model, patterns in self._mentions if any(p.search(normalized_text) for p in patterns)]
+
+
+class Catalog:
+    """Loads CATALOG_PATH and swaps in a new CatalogIndex when the file changes."""
+
+    def __init__(self, path: str = CATALOG_PATH, reload_seconds: float = CATALOG_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._index = self._load()
+
+    def _load(self) -> CatalogIndex:
+        with open(self.path, "rb") as handle:
+            raw = handle.read()
+        self._mtime = os.path.getmtime(self.path)
+        index = CatalogIndex.from_dict(json.loads(raw), hashlib.sha256(raw).hexdigest()[:12])
+        logger.info("[CATALOG] Loaded %d models from %s (version %s)", len(index.models), self.path, index.version)
+        return index
+
+    @property
+    def index(self) -> CatalogIndex:
+        """Current index, reloaded first when the file changed."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_seconds:
+            self._checked_at = now
+            try:
+                if os.path.getmtime(self.path) != self._mtime:
+                    with self._lock:
+                        self._index = self._load()
+            except Exception as e:
+                # A broken edit keeps the last good catalog.
+                logger.error("[CATALOG] Reload of %s failed, keeping version %s: %s", self.path, self._index.version, e)
+        return self._index
+
+
+# Global instances, by file
+_catalogs: Dict[str, Catalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogIndex:
+    """Current catalog index of the current tenant (loads its file on first use)."""
+    path = current_tenant().catalog_path
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(path)
+            if catalog is None:
+                catalog = _catalogs[path] = Catalog(path)
+    return catalog.index
@@ -0,0 +1,202 @@
+"""
+Circuit breakers for upstream dependencies (OpenAI, Graph API, NocoDB).
+
+State lives in Redis so every replica sees the same circuit:
+
+    circuit:{name}        hash: state (closed | open | half_open), failures, opened_at
+    circuit:{name}:probe  NX lock held by the single call allowed through while half-open
+
+CLOSED counts consecutive outage-like failures; at CIRCUIT_FAILURE_THRESHOLD the circuit
+OPENS and calls fail fast with CircuitOpenError. After CIRCUIT_RECOVERY_SECONDS one probe
+call is let through (HALF_OPEN): success closes the circuit, failure re-opens it.
+Client errors (4xx other than 429) never trip a breaker. If Redis is unreachable the
+breaker lets calls through.
+
+    with get_circuit_breaker(OPENAI).guard():
+        ...
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from src.config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RECOVERY_SECONDS
+from src.metrics import CIRCUIT_REJECTIONS_TOTAL, CIRCUIT_STATE, CIRCUIT_TRANSITIONS_TOTAL
+from src.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Dependencies
+OPENAI = "openai"
+GRAPH = "graph"
+NOCODB = "nocodb"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_KEY_PREFIX = "circuit:"
+
+
+class CircuitOpenError(RuntimeError):
+    """The dependency's circuit is open: the call was not attempted."""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuit for {name} is open")
+        self.name = name
+
+
+def counts_as_failure(exc: BaseException) -> bool:
+    """Outage-like errors: timeouts, connection errors, 429 and 5xx responses."""
+    if not isinstance(exc, Exception):
+        return False  # cancellation, shutdown
+    if isinstance(exc, CircuitOpenError):
+        return False  # another dependency's circuit (e.g. a nested call): not this one's failure
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None:
+        return True
+    return status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one dependency, shared through Redis."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        recovery_seconds: float = CIRCUIT_RECOVERY_SECONDS,
+        redis_client=None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._clock = clock
+        self._key = f"{CIRCUIT_KEY_PREFIX}{name}"
+        self._probe_key = f"{self._key}:probe"
+        if redis_client is None:
+            try:
+                redis_client = get_redis()
+            except Exception as e:
+                logger.warning("CircuitBreaker(%s): Failed to get Redis client, breaker disabled: %s", name, e)
+        self.redis_client = redis_client
+
+    def state(self) -> str:
+        """Current state as stored in Redis (CLOSED when unknown)."""
+        return self._read()[0]
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected without a probe being due."""
+        state, _, opened_at = self._read()
+        return state == OPEN and self._clock() - opened_at < self.recovery_seconds
+
+    @contextmanager
+    def guard(self):
+        """
+        Run the block as a call to the dependency.
+        Raises CircuitOpenError (without running the block) while the circuit is open.
+        """
+        probe, failures = self._before_call()
+        try:
+            yield
+        except BaseException as exc:
+            if counts_as_failure(exc):
+                self._record_failure(probe)
+            elif probe:
+                self._release_probe()
+            raise
+        else:
+            if probe or failures:
+                self._record_success()
+
+    # ------------------------------------------------------------------ #
+    # Redis state                                                          #
+    # ------------------------------------------------------------------ #
+
+    def _read(self):
+        if not self.redis_client:
+            return CLOSED, 0, 0.0
+        try:
+            state, failures, opened_at = self.redis_client.hmget(self._key, ["state", "failures", "opened_at"])
+        except Exception as e:
+            logger.error("CircuitBreaker(%s): state read failed, allowing call: %s", self.name, e)
+            return CLOSED, 0, 0.0
+        state = state or CLOSED
+        CIRCUIT_STATE.labels(dependency=self.name).set(_STATE_CODES.get(state, 0))
+        return state, int(failures or 0), float(opened_at or 0)
+
+    def _before_call(self):
+        state, failures, opened_at = self._read()
+        if state == CLOSED:
+            return False, failures
+        if state == OPEN and self._clock() - opened_at < self.recovery_seconds:
+            self._reject()
+        # Recovery time elapsed (or a half-open probe's lock expired): one caller probes.
+        if not self._try_redis(
+            lambda: self.redis_client.set(self._probe_key, "1", nx=True, ex=max(1, int(self.recovery_seconds)))
+        ):
+            self._reject()
+        if state == OPEN:
+            self._transition(HALF_OPEN)
+        return True, failures
+
+    def _reject(self) -> None:
+        CIRCUIT_REJECTIONS_TOTAL.labels(dependency=self.name).inc()
+        raise CircuitOpenError(self.name)
+
+    def _record_failure(self, probe: bool) -> None:
+        if probe:
+            self._transition(OPEN, failures=self.failure_threshold)
+            self._release_probe()
+            return
+        failures = self._try_redis(lambda: self.redis_client.hincrby(self._key, "failures", 1))
+        if failures and failures >= self.failure_threshold and self.state() == CLOSED:
+            self._transition(OPEN, failures=failures)
+
+    def _record_success(self) -> None:
+        if self.state() != CLOSED:
+            self._transition(CLOSED, failures=0)
+            self._release_probe()
+        else:
+            self._try_redis(lambda: self.redis_client.hset(self._key, "failures", 0))
+
+    def _release_probe(self) -> None:
+        self._try_redis(lambda: self.redis_client.delete(self._probe_key))
+
+    def _transition(self, state: str, failures: Optional[int] = None) -> None:
+        mapping = {"state": state}
+        if state == OPEN:
+            mapping["opened_at"] = self._clock()
+        if failures is not None:
+            mapping["failures"] = failures
+        self._try_redis(lambda: self.redis_client.hset(self._key, mapping=mapping))
+        CIRCUIT_TRANSITIONS_TOTAL.labels(dependency=self.name, to_state=state).inc()
+        CIRCUIT_STATE.labels(dependency=self.name).set(_STATE_CODES[state])
+        log = logger.warning if state == OPEN else logger.info
+        log("[CIRCUIT] %s -> %s", self.name, state)
+
+    def _try_redis(self, operation):
+        if not self.redis_client:
+            return True
+        try:
+            return operation()
+        except Exception as e:
+            logger.error("CircuitBreaker(%s): Redis error: %s", self.name, e)
+            return True
+
+
+# Global instances, one per dependency
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get or create the global CircuitBreaker for a dependency."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
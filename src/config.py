@@ -6,8 +6,9 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Validate required environment variables
-def _validate_env_vars():
+# Validate required environment variables (at worker startup, see src/app.py: importing this
+# module has no side effects beyond reading the environment)
+def validate_env_vars():
     """Validate that required environment variables are set."""
     required_vars = ["OPENAI_API_KEY"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
@@ -27,31 +28,108 @@ def _validate_env_vars():
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 NOCODB_API_TOKEN = (os.getenv("NOCODB_API_TOKEN") or "").strip()
 NOCODB_TABLE_URL = os.getenv("NOCODB_TABLE_URL", "")
+LEAD_WRITE_BEHIND = os.getenv("LEAD_WRITE_BEHIND", "false").lower() == "true"
+LEAD_BATCH_SIZE = int(os.getenv("LEAD_BATCH_SIZE", "20"))
+LEAD_FLUSH_INTERVAL_SECONDS = float(os.getenv("LEAD_FLUSH_INTERVAL_SECONDS", "2"))
+LEAD_MAX_ATTEMPTS = int(os.getenv("LEAD_MAX_ATTEMPTS", "8"))
 
 # Instagram / Meta Graph API
 INSTAGRAM_VERIFY_TOKEN = (os.getenv("INSTAGRAM_VERIFY_TOKEN") or "").strip()
 INSTAGRAM_ACCESS_TOKEN = (os.getenv("INSTAGRAM_ACCESS_TOKEN") or "").strip()
 INSTAGRAM_API_VERSION = os.getenv("INSTAGRAM_API_VERSION", "v25.0")
+INSTAGRAM_GRAPH_BASE_URL = os.getenv("INSTAGRAM_GRAPH_BASE_URL", "https://graph.instagram.com").rstrip("/")
+# Several pages in one deployment: JSON list of accounts with their own token, prompt, catalog and
+# NocoDB table (see src/tenants.py); empty serves only the account configured above
+TENANTS_PATH = os.getenv("TENANTS_PATH", "")
 
 # Agent configs
 AGENT_MODEL = os.getenv("AGENT_MODEL", "gpt-4o-mini")
 AGENT_NAME = os.getenv("AGENT_NAME", "Assistente_Instagram")
+AGENT_SMALL_MODEL = os.getenv("AGENT_SMALL_MODEL", "gpt-4.1-nano")
 AUDIO_TRANSCRIPTION_MODEL = os.getenv("AUDIO_TRANSCRIPTION_MODEL", "gpt-4o-mini-transcribe")
 AUDIO_REPLY_MODEL = os.getenv("AUDIO_REPLY_MODEL", "gpt-4o-mini-tts")
 AUDIO_REPLY_VOICE = os.getenv("AUDIO_REPLY_VOICE", "alloy")
 PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "")
+# Audio replies are fetched by Meta from any worker: every worker of a host (and every replica, through a
+# shared volume) writes them to and serves them from this directory
+AUDIO_REPLY_DIR = os.getenv("AUDIO_REPLY_DIR", "/tmp/vsimple_audio_replies")
 ENABLE_INSTAGRAM_AUDIO_REPLY = os.getenv("ENABLE_INSTAGRAM_AUDIO_REPLY", "false").lower() == "true"
 MAX_TRANSCRIPTION_AUDIO_MB = int(os.getenv("MAX_TRANSCRIPTION_AUDIO_MB", "10"))
 MAX_TRANSCRIPTION_AUDIO_SECONDS = int(os.getenv("MAX_TRANSCRIPTION_AUDIO_SECONDS", "45"))
+# Silence trimming before transcription (src/api/voice_activity.py); the duration limit applies to the trimmed audio
+ENABLE_AUDIO_VAD = os.getenv("ENABLE_AUDIO_VAD", "true").lower() == "true"
+AUDIO_VAD_MIN_DBFS = float(os.getenv("AUDIO_VAD_MIN_DBFS", "-45"))
+AUDIO_VAD_MAX_PAUSE_SECONDS = float(os.getenv("AUDIO_VAD_MAX_PAUSE_SECONDS", "0.5"))
 MAX_AGENT_INPUT_CHARS = int(os.getenv("MAX_AGENT_INPUT_CHARS", "700"))
+BUFFER_SILENCE_SECONDS = float(os.getenv("BUFFER_SILENCE_SECONDS", "5"))
+REPLY_DEADLINE_SECONDS = float(os.getenv("REPLY_DEADLINE_SECONDS", "45"))
 MAX_AUDIO_REPLY_CHARS = int(os.getenv("MAX_AUDIO_REPLY_CHARS", "85"))
+ENABLE_AGENT_STREAMING = os.getenv("ENABLE_AGENT_STREAMING", "false").lower() == "true"
+STREAM_MIN_CHUNK_CHARS = int(os.getenv("STREAM_MIN_CHUNK_CHARS", "80"))
+
+# Prompt caching / token accounting (USD per 1M tokens, defaults for gpt-4o-mini)
+AGENT_PROMPT_CACHE_KEY = os.getenv("AGENT_PROMPT_CACHE_KEY", "")
+AGENT_INPUT_PRICE_PER_MTOK = float(os.getenv("AGENT_INPUT_PRICE_PER_MTOK", "0.15"))
+AGENT_CACHED_INPUT_PRICE_PER_MTOK = float(os.getenv("AGENT_CACHED_INPUT_PRICE_PER_MTOK", "0.075"))
+AGENT_OUTPUT_PRICE_PER_MTOK = float(os.getenv("AGENT_OUTPUT_PRICE_PER_MTOK", "0.60"))
+
+# Overload control: agent run slots and degraded-mode thresholds
+# (load score thresholds for: no audio reply, no scope classifier, small model, defer)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "16"))
+OVERLOAD_THRESHOLDS = tuple(float(v) for v in os.getenv("OVERLOAD_THRESHOLDS", "0.75,1.0,1.5,2.0").split(","))
+OVERLOAD_QUEUE_WAIT_SECONDS = float(os.getenv("OVERLOAD_QUEUE_WAIT_SECONDS", "5"))
+OVERLOAD_RECOVERY_RATIO = float(os.getenv("OVERLOAD_RECOVERY_RATIO", "0.8"))
+OVERLOAD_MIN_DWELL_SECONDS = float(os.getenv("OVERLOAD_MIN_DWELL_SECONDS", "10"))
+OVERLOAD_MAX_DEFER_SECONDS = float(os.getenv("OVERLOAD_MAX_DEFER_SECONDS", "120"))
+
+# Model routing: canned template, AGENT_SMALL_MODEL or AGENT_MODEL per turn (see src/router.py)
+ENABLE_MODEL_ROUTER = os.getenv("ENABLE_MODEL_ROUTER", "true").lower() == "true"
+ROUTER_SMALL_MAX_WORDS = int(os.getenv("ROUTER_SMALL_MAX_WORDS", "12"))
+ENABLE_FAQ_REPLIES = os.getenv("ENABLE_FAQ_REPLIES", "true").lower() == "true"
+
+# Numbered menu answered without the agent (see src/menu.py); state TTL matches the agent session
+ENABLE_MENU_STATE_MACHINE = os.getenv("ENABLE_MENU_STATE_MACHINE", "true").lower() == "true"
+MENU_STATE_TTL_SECONDS = int(os.getenv("MENU_STATE_TTL_SECONDS", "300"))
+
+# Product catalog (models and prices) served by the buscar_modelos tool, reloaded when the file changes
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join(os.path.dirname(__file__), "data", "catalog.json"))
+CATALOG_RELOAD_SECONDS = float(os.getenv("CATALOG_RELOAD_SECONDS", "5"))
+
+# Agent sessions stored compressed, without per-run system message copies (see src/session_store.py)
+ENABLE_COMPACT_SESSIONS = os.getenv("ENABLE_COMPACT_SESSIONS", "true").lower() == "true"
+
+# Semantic response cache for first-turn messages (see src/response_cache.py)
+ENABLE_RESPONSE_CACHE = os.getenv("ENABLE_RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+
+# Circuit breakers (OpenAI, Graph API, NocoDB), state shared through Redis
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RECOVERY_SECONDS = float(os.getenv("CIRCUIT_RECOVERY_SECONDS", "30"))
+
+# Per-sender state (buffer, lock, human block, echo markers) also honours the previous per-purpose
+# keys; turn off once no worker of the previous layout ran in the last 5 minutes
+CONVERSATION_STATE_LEGACY_READS = os.getenv("CONVERSATION_STATE_LEGACY_READS", "true").lower() == "true"
+
+# Conversation sharding across workers/replicas (see src/sharding.py)
+ENABLE_SHARDING = os.getenv("ENABLE_SHARDING", "false").lower() == "true"
+SHARD_HEARTBEAT_SECONDS = float(os.getenv("SHARD_HEARTBEAT_SECONDS", "5"))
+SHARD_MEMBER_TTL_SECONDS = float(os.getenv("SHARD_MEMBER_TTL_SECONDS", "15"))
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+SHARD_SESSION_CACHE_SIZE = int(os.getenv("SHARD_SESSION_CACHE_SIZE", "500"))  # conversations kept in memory per worker
+
+# Logging (see src/logging_config.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
 
 # Infra
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
-
-# Validate on import
-try:
-    _validate_env_vars()
-except RuntimeError as e:
-    logger.error("Configuration error: %s", e)
-    raise
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "memory").lower()  # memory | otlp | none
+TRACING_MAX_SPANS = int(os.getenv("TRACING_MAX_SPANS", "2000"))
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "10"))
+HEALTH_REDIS_MAX_LATENCY_MS = float(os.getenv("HEALTH_REDIS_MAX_LATENCY_MS", "250"))
+HEALTH_MAX_LEAD_BACKLOG = int(os.getenv("HEALTH_MAX_LEAD_BACKLOG", "100"))
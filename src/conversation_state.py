@@ -0,0 +1,277 @@
+"""
+Per-sender conversation state in two Redis keys (tenant namespace).
+
+    conv:{sender_id}            hash
+        last_seen               time of the last incoming message (buffer debounce)
+        processing              buffer processor lock, held until this deadline
+        blocked_until           a human is answering: agent blocked until this deadline
+        echo:{digest}[:{n}]     agent message sent, its echo is expected until this deadline
+                                (n >= 2 for the further copies of a text sent again meanwhile)
+    conv:{sender_id}:buffer     list of messages waiting for buffer silence
+
+Deadlines are epoch seconds and are checked on read. Every write refreshes the TTL of the keys to
+STATE_TTL_SECONDS (the longest field lifetime), so they live as long as their newest field. On Redis
+7.4+ each deadline field also gets its own expiry (HPEXPIREAT); elsewhere the write drops the
+expired fields of the hash. `snapshot` reads the whole state in one round trip.
+
+Echo markers: every chunk of a reply is registered in one script call, an echo consumes one
+marker of its text (chunks may echo in any order, and the same text sent twice is expected
+twice), and a sender keeps at most MAX_PENDING_ECHOES of them (the oldest are dropped first).
+
+Migration: this replaces `chat:buffer:*`, `chat:last_seen:*`, `chat:processing:*`,
+`user_interaction_lock:*` and `agent_outbound_echo:*`. While CONVERSATION_STATE_LEGACY_READS is on,
+a block, processing lock, buffered message or echo marker left in those keys by a worker running
+the previous layout is still honoured; they expire within 5 minutes of the last old worker, after
+which the setting can be turned off.
+"""
+import hashlib
+import logging
+import time
+from typing import List, Optional
+
+from src.config import CONVERSATION_STATE_LEGACY_READS
+from src.redis_client import get_redis
+from src.tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY_PREFIX = "conv:"
+BUFFER_KEY_SUFFIX = ":buffer"
+STATE_TTL_SECONDS = 300
+PROCESSING_LOCK_SECONDS = 60  # safety TTL so a crashed processor never keeps the lock
+INTERACTION_BLOCK_SECONDS = 300
+ECHO_MARKER_SECONDS = 120  # the echo arrives quickly after the send
+MAX_PENDING_ECHOES = 32
+
+FIELD_LAST_SEEN = "last_seen"
+FIELD_PROCESSING = "processing"
+FIELD_BLOCKED_UNTIL = "blocked_until"
+ECHO_FIELD_PREFIX = "echo:"
+
+# Legacy per-purpose keys (see module docstring)
+LEGACY_BUFFER_PREFIX = "chat:buffer:"
+LEGACY_PROCESSING_PREFIX = "chat:processing:"
+LEGACY_INTERACTION_LOCK_PREFIX = "user_interaction_lock:"
+LEGACY_ECHO_PREFIX = "agent_outbound_echo:"
+
+# KEYS[1] state hash, KEYS[2] optional legacy key that also holds the field
+# ARGV field, deadline, now, key ttl, "1" to only set when the field is free
+_SET_DEADLINE = """
+local now = tonumber(ARGV[3])
+if ARGV[5] == '1' then
+  if tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0') > now then return 0 end
+  if KEYS[2] and redis.call('EXISTS', KEYS[2]) == 1 then return 0 end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+local expiry = redis.pcall('HPEXPIREAT', KEYS[1], math.floor(tonumber(ARGV[2]) * 1000), 'FIELDS', 1, ARGV[1])
+if type(expiry) == 'table' and expiry.err then
+  local fields = redis.call('HGETALL', KEYS[1])
+  for i = 1, #fields, 2 do
+    if fields[i] ~= 'last_seen' and tonumber(fields[i + 1]) <= now then
+      redis.call('HDEL', KEYS[1], fields[i])
+    end
+  end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+# KEYS[1] state hash
+# ARGV now, deadline, key ttl, max pending echoes, digest...
+_EXPECT_ECHOES = """
+local now = tonumber(ARGV[1])
+local fields = redis.call('HGETALL', KEYS[1])
+local live, echoes = {}, {}
+for i = 1, #fields, 2 do
+  if string.sub(fields[i], 1, 5) == 'echo:' then
+    if tonumber(fields[i + 1]) <= now then
+      redis.call('HDEL', KEYS[1], fields[i])
+    else
+      live[fields[i]] = true
+      table.insert(echoes, {fields[i], tonumber(fields[i + 1])})
+    end
+  end
+end
+for i = 5, #ARGV do
+  local field, n = 'echo:' .. ARGV[i], 1
+  while live[field] do
+    n = n + 1
+    field = 'echo:' .. ARGV[i] .. ':' .. n
+  end
+  redis.call('HSET', KEYS[1], field, ARGV[2])
+  redis.pcall('HPEXPIREAT', KEYS[1], math.floor(tonumber(ARGV[2]) * 1000), 'FIELDS', 1, field)
+  live[field] = true
+  table.insert(echoes, {field, tonumber(ARGV[2])})
+end
+table.sort(echoes, function(a, b) return a[2] < b[2] end)
+for i = 1, #echoes - tonumber(ARGV[4]) do
+  redis.call('HDEL', KEYS[1], echoes[i][1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+"""
+
+# KEYS[1] state hash
+# ARGV now, digest, max pending echoes
+_CONSUME_ECHO = """
+local field = 'echo:' .. ARGV[2]
+for n = 1, tonumber(ARGV[3]) do
+  if n > 1 then field = 'echo:' .. ARGV[2] .. ':' .. n end
+  local deadline = redis.call('HGET', KEYS[1], field)
+  if deadline then
+    redis.call('HDEL', KEYS[1], field)
+    if tonumber(deadline) > tonumber(ARGV[1]) then return 1 end
+  end
+end
+return 0
+"""
+
+
+def echo_digest(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()[:20]
+
+
+class ConversationState:
+    """Buffer, debounce timer, processing lock, human block and echo markers of each sender."""
+
+    def __init__(
+        self, redis_client=None, ttl_seconds: int = STATE_TTL_SECONDS, legacy_reads: bool = CONVERSATION_STATE_LEGACY_READS
+    ):
+        self.redis = redis_client or get_redis()
+        self.ttl_seconds = ttl_seconds
+        self.legacy_reads = legacy_reads
+        self._set_deadline = self.redis.register_script(_SET_DEADLINE)
+        self._expect_echoes = self.redis.register_script(_EXPECT_ECHOES)
+        self._consume_echo = self.redis.register_script(_CONSUME_ECHO)
+
+    def _key(self, sender_id: str) -> str:
+        return current_tenant().key(f"{STATE_KEY_PREFIX}{sender_id}")
+
+    def _legacy_key(self, prefix: str, sender_id: str) -> str:
+        return current_tenant().key(f"{prefix}{sender_id}")
+
+    def _deadline(self, sender_id: str, field: str, seconds: float, only_if_free: bool, legacy_key=None) -> bool:
+        now = time.time()
+        keys = [self._key(sender_id)] + ([legacy_key] if legacy_key and self.legacy_reads else [])
+        args = [field, repr(now + seconds), repr(now), self.ttl_seconds, "1" if only_if_free else "0"]
+        return bool(self._set_deadline(keys=keys, args=args))
+
+    def _remaining(self, sender_id: str, field: str) -> float:
+        deadline = self.redis.hget(self._key(sender_id), field)
+        return max(0.0, float(deadline) - time.time()) if deadline else 0.0
+
+    # ------------------------------------------------------------------ #
+    # Buffer and debounce timer                                            #
+    # ------------------------------------------------------------------ #
+
+    def push_message(self, sender_id: str, message: str) -> None:
+        """Buffer an incoming message and restart the silence timer (one round trip)."""
+        key = self._key(sender_id)
+        pipeline = self.redis.pipeline()
+        pipeline.rpush(key + BUFFER_KEY_SUFFIX, message)
+        pipeline.expire(key + BUFFER_KEY_SUFFIX, self.ttl_seconds)
+        pipeline.hset(key, FIELD_LAST_SEEN, repr(time.time()))
+        pipeline.expire(key, self.ttl_seconds)
+        pipeline.execute()
+
+    def last_seen(self, sender_id: str) -> float:
+        value = self.redis.hget(self._key(sender_id), FIELD_LAST_SEEN)
+        return float(value) if value else 0.0
+
+    def drain_messages(self, sender_id: str) -> List[str]:
+        """Take every buffered message (atomically)."""
+        key = self._key(sender_id) + BUFFER_KEY_SUFFIX
+        pipeline = self.redis.pipeline()
+        if self.legacy_reads:
+            legacy_key = self._legacy_key(LEGACY_BUFFER_PREFIX, sender_id)
+            pipeline.lrange(legacy_key, 0, -1)
+            pipeline.delete(legacy_key)
+        pipeline.lrange(key, 0, -1)
+        pipeline.delete(key)
+        results = pipeline.execute()
+        return [message for messages in results[::2] for message in messages or ()]
+
+    # ------------------------------------------------------------------ #
+    # Processing lock                                                      #
+    # ------------------------------------------------------------------ #
+
+    def acquire_processing_lock(self, sender_id: str) -> bool:
+        legacy_key = self._legacy_key(LEGACY_PROCESSING_PREFIX, sender_id)
+        return self._deadline(sender_id, FIELD_PROCESSING, PROCESSING_LOCK_SECONDS, True, legacy_key)
+
+    def release_processing_lock(self, sender_id: str) -> None:
+        self.redis.hdel(self._key(sender_id), FIELD_PROCESSING)
+
+    # ------------------------------------------------------------------ #
+    # Human interaction block                                              #
+    # ------------------------------------------------------------------ #
+
+    def block(self, sender_id: str) -> bool:
+        """Start the block; False when one is already running (it is never extended)."""
+        legacy_key = self._legacy_key(LEGACY_INTERACTION_LOCK_PREFIX, sender_id)
+        return self._deadline(sender_id, FIELD_BLOCKED_UNTIL, INTERACTION_BLOCK_SECONDS, True, legacy_key)
+
+    def block_remaining(self, sender_id: str) -> float:
+        remaining = self._remaining(sender_id, FIELD_BLOCKED_UNTIL)
+        if not remaining and self.legacy_reads:
+            remaining = max(0, self.redis.ttl(self._legacy_key(LEGACY_INTERACTION_LOCK_PREFIX, sender_id)))
+        return remaining
+
+    def unblock(self, sender_id: str) -> None:
+        self.redis.hdel(self._key(sender_id), FIELD_BLOCKED_UNTIL)
+        if self.legacy_reads:
+            self.redis.delete(self._legacy_key(LEGACY_INTERACTION_LOCK_PREFIX, sender_id))
+
+    # ------------------------------------------------------------------ #
+    # Outbound echo markers                                                #
+    # ------------------------------------------------------------------ #
+
+    def expect_echoes(self, sender_id: str, texts: List[str]) -> None:
+        """Expect one echo per text (the chunks of a reply, in one round trip)."""
+        now = time.time()
+        args = [repr(now), repr(now + ECHO_MARKER_SECONDS), self.ttl_seconds, MAX_PENDING_ECHOES]
+        self._expect_echoes(keys=[self._key(sender_id)], args=args + [echo_digest(text) for text in texts])
+
+    def consume_echo(self, sender_id: str, text: str) -> bool:
+        """True (once per registered copy) when `text` is the echo of a message the agent sent recently."""
+        digest = echo_digest(text)
+        args = [repr(time.time()), digest, MAX_PENDING_ECHOES]
+        if not self.legacy_reads:
+            return bool(self._consume_echo(keys=[self._key(sender_id)], args=args))
+        pipeline = self.redis.pipeline()
+        self._consume_echo(keys=[self._key(sender_id)], args=args, client=pipeline)
+        pipeline.delete(self._legacy_key(f"{LEGACY_ECHO_PREFIX}{sender_id}:", digest))
+        consumed, legacy = pipeline.execute()
+        return bool(consumed or legacy)
+
+    # ------------------------------------------------------------------ #
+    # Whole state                                                          #
+    # ------------------------------------------------------------------ #
+
+    def snapshot(self, sender_id: str) -> dict:
+        """Everything stored for a sender, read in one round trip (live fields only)."""
+        key = self._key(sender_id)
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hgetall(key)
+        pipeline.lrange(key + BUFFER_KEY_SUFFIX, 0, -1)
+        fields, buffer = pipeline.execute()
+        now = time.time()
+        live = {name: float(value) for name, value in fields.items() if name == FIELD_LAST_SEEN or float(value) > now}
+        return {
+            "buffer": buffer,
+            "last_seen": live.get(FIELD_LAST_SEEN, 0.0),
+            "processing": FIELD_PROCESSING in live,
+            "blocked_seconds": round(live[FIELD_BLOCKED_UNTIL] - now) if FIELD_BLOCKED_UNTIL in live else 0,
+            "pending_echoes": sum(1 for name in live if name.startswith(ECHO_FIELD_PREFIX)),
+        }
+
+
+# Global instance
+_state: Optional[ConversationState] = None
+
+
+def get_conversation_state() -> ConversationState:
+    """Get or create global ConversationState instance."""
+    global _state
+    if _state is None:
+        _state = ConversationState()
+    return _state
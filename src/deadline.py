@@ -0,0 +1,56 @@
+"""
+Reply deadline.
+Created when a message is ingested and passed through transcription, classification,
+agent run and Graph send, so each stage can see how much of the reply budget is left
+and skip optional work (fallback model, audio reply, send retries) when it runs out.
+"""
+import logging
+import time
+from typing import Optional
+
+from opentelemetry import trace
+
+from src.config import REPLY_DEADLINE_SECONDS
+from src.metrics import DEADLINE_OVERRUNS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Monotonic time budget for producing one reply."""
+
+    def __init__(self, budget_seconds: float = REPLY_DEADLINE_SECONDS, started_at: Optional[float] = None):
+        # started_at: wall-clock ingest time (time.time()), so a message forwarded by another worker
+        # keeps the budget it started with instead of getting a fresh one.
+        self.budget_seconds = budget_seconds
+        self.started_at = time.time() if started_at is None else started_at
+        spent = max(0.0, time.time() - self.started_at)
+        self._expires_at = time.monotonic() + budget_seconds - spent
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def has(self, seconds: float) -> bool:
+        """Whether at least `seconds` of budget are left."""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: float, floor: float = 0.0) -> float:
+        """Timeout for a call: the remaining budget, bounded by `cap` and `floor`."""
+        return max(floor, min(cap, self.remaining()))
+
+    def extend(self, seconds: float) -> None:
+        """Exclude deliberate waiting (the buffer debounce window) from the budget."""
+        self._expires_at += seconds
+
+    def record_overrun(self, stage: str, sender_id: str = "") -> None:
+        """Count a stage that was skipped, cut short or not retried for lack of budget."""
+        DEADLINE_OVERRUNS_TOTAL.labels(stage=stage).inc()
+        trace.get_current_span().add_event("deadline.overrun", {"stage": stage})
+        logger.warning(
+            "[%s] Reply budget exhausted at stage %s (%.1fs left of %.0fs)",
+            sender_id[-6:] if sender_id else "-", stage, self.remaining(), self.budget_seconds,
+        )
@@ -0,0 +1,139 @@
+"""
+Canned answers for frequent questions (location, catalog, WhatsApp, payment), without an LLM call.
+
+Each intent has trigger phrases over normalized text (lowercase, no accents). All phrases are
+compiled once into an Aho-Corasick automaton, so a message is scanned in a single pass whatever
+the number of phrases. Answers come from the scripted options in the prompt of the current tenant,
+so they stay in sync with what the agent itself would send.
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from src.prompts import LEAD_DATA_REQUEST
+from src.tenants import current_tenant
+
+INTENT_LOCATION = "location"
+INTENT_CATALOG = "catalog"
+INTENT_WHATSAPP = "whatsapp"
+INTENT_PAYMENT = "payment"
+
+
+@dataclass(frozen=True)
+class FaqEntry:
+    intent: str
+    phrases: Tuple[str, ...]
+    section: Optional[str]  # prompt heading of the scripted answer; None sends LEAD_DATA_REQUEST
+    first_turn_only: bool = False  # later in a conversation the agent answers (it knows what was already asked)
+
+    @property
+    def reply(self) -> str:
+        return current_tenant().section(self.section) if self.section else LEAD_DATA_REQUEST
+
+
+FAQ_TABLE: Tuple[FaqEntry, ...] = (
+    FaqEntry(
+        INTENT_LOCATION,
+        (
+            "endereco", "localizacao", "onde fica", "onde voces ficam", "onde e a loja", "onde e a loja de voces",
+            "local da loja", "loja fisica", "como chego", "como chegar", "horario", "horarios", "que horas abre",
+            "que horas fecha", "abre sabado", "abre no sabado", "funciona sabado", "funcionamento",
+        ),
+        "Opção 4 – Localização",
+    ),
+    FaqEntry(
+        INTENT_CATALOG,
+        ("catalogo", "catalogo completo", "link do catalogo", "manda o catalogo", "ver catalogo"),
+        "Opção 5 – Catálogo",
+    ),
+    FaqEntry(
+        # The WhatsApp link is only sent after the lead data is collected (see the prompt's flow),
+        # so the canned answer asks for the data, which must never be asked for twice.
+        INTENT_WHATSAPP,
+        (
+            "whatsapp", "whats", "zap", "zapzap", "wpp", "numero de voces", "numero da loja", "contato",
+            "falar com vendedor", "falar com um vendedor", "falar com consultor", "falar com um consultor",
+            "falar com atendente", "falar com alguem", "simular", "simulacao",
+        ),
+        None,
+        first_turn_only=True,
+    ),
+    FaqEntry(
+        INTENT_PAYMENT,
+        (
+            "forma de pagamento", "formas de pagamento", "como pagar", "como funciona o pagamento",
+            "financiamento", "financia", "financiam", "financiar", "voces financiam", "parcelado", "parcelam",
+            "parcela no cartao", "cartao", "boleto", "pix", "a vista",
+        ),
+        "Opção 2 – Formas de pagamento",
+    ),
+)
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over phrases; matches only on word boundaries."""
+
+    def __init__(self, phrases: Dict[str, str]):
+        # Trie: one transitions dict per state; state 0 is the root.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # (phrase length, label) ending at this state
+        for phrase, label in phrases.items():
+            self._add(phrase, label)
+        self._build_failure_links()
+
+    def _add(self, phrase: str, label: str) -> None:
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(phrase), label))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state].extend(self._out[self._fail[next_state]])
+
+    def labels(self, text: str) -> Set[str]:
+        """Labels of every phrase found in `text` as whole words."""
+        found: Set[str] = set()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, label in self._out[state]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    found.add(label)
+        return found
+
+
+def _build_automaton(entries: Iterable[FaqEntry]) -> PhraseAutomaton:
+    return PhraseAutomaton({phrase: entry.intent for entry in entries for phrase in entry.phrases})
+
+
+_AUTOMATON = _build_automaton(FAQ_TABLE)
+_ENTRIES = {entry.intent: entry for entry in FAQ_TABLE}
+
+
+def match_intents(normalized_text: str) -> Sequence[str]:
+    """FAQ intents mentioned in an already normalized message (see src.text.normalize_text)."""
+    return sorted(_AUTOMATON.labels(normalized_text))
+
+
+def faq_entry(intent: str) -> Optional[FaqEntry]:
+    return _ENTRIES.get(intent)
@@ -0,0 +1,158 @@
+"""
+Liveness and readiness.
+
+/health/live only says the event loop answers. /health/ready reports dependency checks that a
+background task refreshes every HEALTH_CHECK_INTERVAL_SECONDS, so a probe never touches Redis,
+the filesystem or the circuit keys itself:
+
+    redis        PING round trip (fails above HEALTH_REDIS_MAX_LATENCY_MS or on error)
+    ffmpeg       binary on PATH (audio conversion; transcription falls back without it)
+    circuit_*    OpenAI and Graph API circuit breaker state
+    lead_queue   write-behind lead backlog (above HEALTH_MAX_LEAD_BACKLOG)
+
+Critical checks (Redis, a stale snapshot, draining, overload DEFER mode) make the worker not
+ready (503). The others only mark it "degraded": an open OpenAI circuit hits every replica alike,
+and taking them all out of rotation would just turn canned apologies into failed webhooks.
+"""
+import asyncio
+import logging
+import shutil
+import time
+from typing import Dict, Optional
+
+import redis
+
+from src.circuit_breaker import CLOSED, GRAPH, OPENAI, get_circuit_breaker
+from src.config import (
+    HEALTH_CHECK_INTERVAL_SECONDS,
+    HEALTH_MAX_LEAD_BACKLOG,
+    HEALTH_REDIS_MAX_LATENCY_MS,
+    REDIS_URL,
+)
+from src.lead_sink import get_lead_sink
+from src.lifecycle import get_lifecycle
+from src.metrics import HEALTH_CHECK_OK
+from src.overload import OverloadMode, get_overload_controller
+
+logger = logging.getLogger(__name__)
+
+STATUS_READY = "ready"
+STATUS_DEGRADED = "degraded"
+STATUS_NOT_READY = "not_ready"
+
+PROBE_TIMEOUT_SECONDS = 2.0
+CRITICAL_CHECKS = frozenset({"redis", "snapshot", "draining", "overload"})
+
+
+def _check(ok: bool, **details) -> dict:
+    return {"ok": ok, **details}
+
+
+class HealthMonitor:
+    """Periodically probes dependencies and keeps the last results for the readiness endpoint."""
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL_SECONDS, redis_client=None):
+        self.interval = interval
+        # Own client with short timeouts: a hung Redis must fail the probe, not stall it.
+        self.redis_client = redis_client or redis.from_url(
+            REDIS_URL, socket_timeout=PROBE_TIMEOUT_SECONDS, socket_connect_timeout=PROBE_TIMEOUT_SECONDS
+        )
+        self._checks: Dict[str, dict] = {}
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------ #
+    # Probes (worker thread)                                               #
+    # ------------------------------------------------------------------ #
+
+    def _probe_redis(self) -> dict:
+        started = time.perf_counter()
+        try:
+            self.redis_client.ping()
+        except Exception as e:
+            return _check(False, error=str(e)[:200])
+        latency_ms = (time.perf_counter() - started) * 1000
+        return _check(latency_ms <= HEALTH_REDIS_MAX_LATENCY_MS, latency_ms=round(latency_ms, 1))
+
+    def _probe_circuit(self, name: str) -> dict:
+        state = get_circuit_breaker(name).state()
+        return _check(state == CLOSED, state=state)
+
+    def _probe_lead_queue(self) -> dict:
+        backlog = get_lead_sink().backlog()
+        return _check(backlog <= HEALTH_MAX_LEAD_BACKLOG, backlog=backlog)
+
+    def probe(self) -> Dict[str, dict]:
+        """Run every dependency check (blocking)."""
+        checks = {
+            "redis": self._probe_redis(),
+            "ffmpeg": _check(shutil.which("ffmpeg") is not None),
+            f"circuit_{OPENAI}": self._probe_circuit(OPENAI),
+            f"circuit_{GRAPH}": self._probe_circuit(GRAPH),
+            "lead_queue": self._probe_lead_queue(),
+        }
+        for name, result in checks.items():
+            HEALTH_CHECK_OK.labels(check=name).set(1 if result["ok"] else 0)
+        return checks
+
+    # ------------------------------------------------------------------ #
+    # Background refresh                                                   #
+    # ------------------------------------------------------------------ #
+
+    async def refresh(self) -> None:
+        try:
+            self._checks = await asyncio.to_thread(self.probe)
+            self._checked_at = time.time()
+        except Exception as e:
+            logger.error("[HEALTH] Probe failed: %s", e, exc_info=True)
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ------------------------------------------------------------------ #
+    # Report (event loop, no I/O)                                          #
+    # ------------------------------------------------------------------ #
+
+    def readiness(self) -> dict:
+        """Last probe results plus live in-process state; `status` is ready, degraded or not_ready."""
+        lifecycle = get_lifecycle()
+        mode = get_overload_controller().mode
+        age = time.time() - self._checked_at if self._checked_at is not None else None
+        checks = dict(self._checks)
+        checks["snapshot"] = _check(
+            age is not None and age <= 3 * self.interval, age_s=None if age is None else round(age, 1)
+        )
+        checks["draining"] = _check(not lifecycle.draining, in_flight=lifecycle.in_flight())
+        checks["overload"] = _check(mode < OverloadMode.DEFER, mode=mode.name.lower())
+
+        if any(not result["ok"] for name, result in checks.items() if name in CRITICAL_CHECKS):
+            status = STATUS_NOT_READY
+        elif any(not result["ok"] for result in checks.values()):
+            status = STATUS_DEGRADED
+        else:
+            status = STATUS_READY
+        return {"status": status, "checks": checks}
+
+
+# Global instance
+_monitor: Optional[HealthMonitor] = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get or create global HealthMonitor instance."""
+    global _monitor
+    if _monitor is None:
+        _monitor = HealthMonitor()
+    return _monitor
@@ -1,40 +1,35 @@
 """
 Interaction blocker: Prevents agent from responding when user is actively interacting.
-Uses Redis to track user interactions with a rolling 5-minute window.
+Tracks user interactions with a rolling 5-minute window in the sender's conversation state
+(src/conversation_state.py), together with the markers of messages the agent sent.
 """
-import redis
 import logging
-import hashlib
-from typing import Optional
-from src.config import REDIS_URL
+from typing import List, Optional
+from src.conversation_state import INTERACTION_BLOCK_SECONDS, ConversationState, get_conversation_state
 
 logger = logging.getLogger(__name__)
 
-# Redis key prefix for user interaction locks
-INTERACTION_LOCK_PREFIX = "user_interaction_lock:"
-INTERACTION_LOCK_TTL = 300  # 5 minutes in seconds
-AGENT_OUTBOUND_ECHO_PREFIX = "agent_outbound_echo:"
-AGENT_OUTBOUND_ECHO_TTL = 120  # echo should arrive quickly after outbound send
+INTERACTION_LOCK_TTL = INTERACTION_BLOCK_SECONDS  # 5 minutes in seconds
 
 
 class InteractionBlocker:
     """Manages agent blocking when user is actively interacting."""
     
-    def __init__(self, redis_url: str = REDIS_URL):
+    def __init__(self, state: Optional[ConversationState] = None):
         """
-        Initialize Redis connection.
+        Initialize the conversation state store.
         
         Args:
-            redis_url: Redis connection URL
+            state: Per-sender state store (default: the process-wide one)
         """
         try:
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            self.state = state or get_conversation_state()
             # Test connection
-            self.redis_client.ping()
+            self.state.redis.ping()
             logger.info("InteractionBlocker: Redis connection established")
         except Exception as e:
             logger.warning("InteractionBlocker: Failed to connect to Redis: %s", e)
-            self.redis_client = None
+            self.state = None
     
     def mark_user_interaction(self, sender_id: str) -> None:
         """
@@ -45,43 +40,33 @@ class InteractionBlocker:
         Args:
             sender_id: Instagram user ID
         """
-        if not self.redis_client:
+        if not self.state:
             logger.debug("Redis not available, skipping interaction lock")
             return
         
         try:
-            key = f"{INTERACTION_LOCK_PREFIX}{sender_id}"
-            
-            # Only set if key doesn't exist (first interaction)
+            # Only set if no block is running (first interaction)
             # This ensures 5 min is from FIRST message, not extended by subsequent ones
-            exists = self.redis_client.exists(key) > 0
-            
-            if not exists:
-                # Create new lock with 5 min TTL
-                self.redis_client.setex(key, INTERACTION_LOCK_TTL, "locked")
+            if self.state.block(sender_id):
                 logger.info("[USER] First interaction from %s - Agent blocked for 5 min", sender_id[-6:])
             else:
                 # User sent another message, but don't extend the timer
-                remaining = self.redis_client.ttl(key)
+                remaining = self.state.block_remaining(sender_id)
                 logger.info("[USER] Additional interaction from %s - Block continues (%.0f sec remaining)", 
                            sender_id[-6:], remaining)
         except Exception as e:
             logger.error("Error marking user interaction for %s: %s", sender_id, e)
 
-    def _build_echo_key(self, user_id: str, text: str) -> str:
-        digest = hashlib.sha256(text.strip().encode("utf-8")).hexdigest()[:20]
-        return f"{AGENT_OUTBOUND_ECHO_PREFIX}{user_id}:{digest}"
-
-    def register_agent_outbound_message(self, user_id: str, text: str) -> None:
+    def register_agent_outbound_messages(self, user_id: str, texts: List[str]) -> None:
         """
-        Register outbound agent message so its echo does not trigger user block.
+        Register outbound agent messages (the chunks of a reply) so their echoes do not trigger user block.
         """
-        if not self.redis_client or not user_id or not text:
+        texts = [text for text in texts if text]
+        if not self.state or not user_id or not texts:
             return
 
         try:
-            key = self._build_echo_key(user_id, text)
-            self.redis_client.setex(key, AGENT_OUTBOUND_ECHO_TTL, "1")
+            self.state.expect_echoes(user_id, texts)
         except Exception as e:
             logger.error("Error registering outbound message for %s: %s", user_id, e)
 
@@ -89,13 +74,11 @@ class InteractionBlocker:
         """
         Consume outbound marker if this echo matches a recent agent-sent message.
         """
-        if not self.redis_client or not user_id or not text:
+        if not self.state or not user_id or not text:
             return False
 
         try:
-            key = self._build_echo_key(user_id, text)
-            removed = self.redis_client.delete(key)
-            return removed > 0
+            return self.state.consume_echo(user_id, text)
         except Exception as e:
             logger.error("Error consuming outbound echo for %s: %s", user_id, e)
             return False
@@ -110,20 +93,17 @@ class InteractionBlocker:
         Returns:
             True if agent is blocked, False otherwise
         """
-        if not self.redis_client:
+        if not self.state:
             logger.debug("Redis not available, no block applied")
             return False
         
         try:
-            key = f"{INTERACTION_LOCK_PREFIX}{sender_id}"
-            is_locked = self.redis_client.exists(key) > 0
+            remaining = self.state.block_remaining(sender_id)
             
-            if is_locked:
-                # Get remaining TTL
-                ttl = self.redis_client.ttl(key)
-                logger.debug("[BLOCK] Agent blocked for %s (%.0f sec remaining)", sender_id[-6:], ttl)
+            if remaining:
+                logger.debug("[BLOCK] Agent blocked for %s (%.0f sec remaining)", sender_id[-6:], remaining)
             
-            return is_locked
+            return remaining > 0
         except Exception as e:
             logger.error("Error checking block status for %s: %s", sender_id, e)
             return False
@@ -135,12 +115,11 @@ class InteractionBlocker:
         Args:
             sender_id: Instagram user ID
         """
-        if not self.redis_client:
+        if not self.state:
             return
         
         try:
-            key = f"{INTERACTION_LOCK_PREFIX}{sender_id}"
-            self.redis_client.delete(key)
+            self.state.unblock(sender_id)
             logger.info("[UNBLOCK] Agent unblocked for %s", sender_id[-6:])
         except Exception as e:
             logger.error("Error unblocking for %s: %s", sender_id, e)
@@ -155,15 +134,14 @@ class InteractionBlocker:
         Returns:
             Remaining seconds, or None if not blocked
         """
-        if not self.redis_client:
+        if not self.state:
             return None
         
         try:
-            key = f"{INTERACTION_LOCK_PREFIX}{sender_id}"
-            ttl = self.redis_client.ttl(key)
+            remaining = round(self.state.block_remaining(sender_id))
             
-            if ttl > 0:
-                return ttl
+            if remaining > 0:
+                return remaining
             return None
         except Exception as e:
             logger.error("Error getting block time for %s: %s", sender_id, e)
@@ -0,0 +1,371 @@
+"""
+Lead sink: writes qualified leads to NocoDB.
+Uses a pooled HTTP session, a Redis idempotency key on normalized CPF + phone,
+and a durable Redis queue for write-behind batching and retry of transient failures.
+One sink (and queue) serves every tenant: each lead carries the NocoDB table of its page.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.circuit_breaker import NOCODB, CircuitOpenError, get_circuit_breaker
+from src.config import (
+    LEAD_BATCH_SIZE,
+    LEAD_FLUSH_INTERVAL_SECONDS,
+    LEAD_MAX_ATTEMPTS,
+    LEAD_WRITE_BEHIND,
+    NOCODB_API_TOKEN,
+    NOCODB_TABLE_URL,
+)
+from src.metrics import ERRORS_TOTAL, RETRIES_TOTAL
+from src.redis_client import get_redis
+from src.tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+LEAD_IDEMPOTENCY_PREFIX = "lead:idempotency:"
+LEAD_IDEMPOTENCY_TTL = 30 * 24 * 3600  # a lead is registered at most once per month
+LEAD_QUEUE_KEY = "lead:queue"  # sorted set: entry id -> timestamp when it may be (re)tried
+LEAD_QUEUE_ENTRIES_KEY = "lead:queue:entries"  # hash: entry id -> JSON entry
+LEAD_DEAD_LETTER_KEY = "lead:dead_letter"
+LEAD_CLAIM_LEASE_SECONDS = 60  # claimed entries become visible again if the worker dies
+LEAD_HTTP_TIMEOUT = 10
+LEAD_HTTP_POOL_SIZE = 10
+
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Submission outcomes
+LEAD_SAVED = "saved"
+LEAD_QUEUED = "queued"
+LEAD_DUPLICATE = "duplicate"
+
+# Atomically claim ready entries by pushing their score past the lease.
+_CLAIM_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[1], ARGV[3], id)
+end
+return ids
+"""
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+class LeadRejectedError(Exception):
+    """NocoDB permanently rejected the lead (not worth retrying)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code  # client errors don't trip the NocoDB circuit breaker
+
+
+class _TransientLeadError(Exception):
+    """NocoDB is temporarily unavailable; the write can be retried."""
+
+
+def build_idempotency_key(cpf: str, telefone: str) -> str:
+    """
+    Idempotency key from normalized CPF + phone digits (hashed, no PII in key names),
+    in the current tenant's namespace (the same person may be a lead of two stores).
+    """
+    normalized = f"{_NON_DIGITS.sub('', cpf)}:{_NON_DIGITS.sub('', telefone)}"
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+    return current_tenant().key(f"{LEAD_IDEMPOTENCY_PREFIX}{digest}")
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(5 * 2 ** attempts, 600)
+
+
+class LeadSink:
+    """Idempotent, retrying NocoDB writer with optional write-behind batching."""
+
+    def __init__(
+        self,
+        table_url: str = NOCODB_TABLE_URL,
+        api_token: str = NOCODB_API_TOKEN,
+        write_behind: bool = LEAD_WRITE_BEHIND,
+        batch_size: int = LEAD_BATCH_SIZE,
+        flush_interval: float = LEAD_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.table_url = table_url
+        self.write_behind = write_behind
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LEAD_HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"xc-token": api_token, "Content-Type": "application/json"})
+
+        try:
+            self.redis_client = get_redis()
+            self._claim = self.redis_client.register_script(_CLAIM_SCRIPT)
+        except Exception as e:
+            logger.warning("LeadSink: Failed to get Redis client, idempotency and retry queue disabled: %s", e)
+            self.redis_client = None
+            self._claim = None
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Submission                                                          #
+    # ------------------------------------------------------------------ #
+
+    def submit(self, record: dict, cpf: str, telefone: str, table_url: Optional[str] = None) -> str:
+        """
+        Register a lead once, in `table_url` (default: the sink's table).
+
+        Returns:
+            LEAD_SAVED, LEAD_QUEUED (will be written by the flusher) or LEAD_DUPLICATE
+
+        Raises:
+            LeadRejectedError: NocoDB permanently rejected the record
+            RuntimeError: NocoDB is unavailable and there is no durable queue to retry from
+        """
+        table_url = table_url or self.table_url
+        idempotency_key = build_idempotency_key(cpf, telefone)
+        if self.redis_client and not self._claim_idempotency_key(idempotency_key):
+            logger.info("[LEAD] Duplicate lead ignored (%s)", idempotency_key[-8:])
+            return LEAD_DUPLICATE
+
+        try:
+            if self.write_behind and self.redis_client:
+                self._enqueue(record, idempotency_key, table_url)
+                return LEAD_QUEUED
+
+            try:
+                self._post([record], table_url)
+                return LEAD_SAVED
+            except _TransientLeadError as e:
+                if not self.redis_client:
+                    raise RuntimeError(str(e)) from e
+                logger.warning("[LEAD] Transient NocoDB failure, queued for retry: %s", e)
+                RETRIES_TOTAL.labels(operation="nocodb").inc()
+                self._enqueue(record, idempotency_key, table_url, attempts=1, delay=_retry_delay(1))
+                return LEAD_QUEUED
+        except Exception:
+            # Not saved and not queued: let a later attempt register this lead.
+            self._release_idempotency_key(idempotency_key)
+            raise
+
+    def _claim_idempotency_key(self, key: str) -> bool:
+        try:
+            return bool(self.redis_client.set(key, "1", nx=True, ex=LEAD_IDEMPOTENCY_TTL))
+        except Exception as e:
+            logger.error("[LEAD] Idempotency check failed, accepting lead: %s", e)
+            return True
+
+    def _release_idempotency_key(self, key: str) -> None:
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.delete(key)
+        except Exception as e:
+            logger.error("[LEAD] Failed to release idempotency key: %s", e)
+
+    # ------------------------------------------------------------------ #
+    # HTTP                                                                #
+    # ------------------------------------------------------------------ #
+
+    def _post(self, records: List[dict], table_url: str) -> None:
+        """POST one record, or a list of records (NocoDB bulk insert)."""
+        body = records[0] if len(records) == 1 else records
+        try:
+            with get_circuit_breaker(NOCODB).guard():
+                self._post_body(table_url, body, len(records))
+        except CircuitOpenError as e:
+            raise _TransientLeadError(str(e)) from e
+
+    def _post_body(self, table_url: str, body, count: int) -> None:
+        try:
+            response = self.session.post(table_url, json=body, timeout=LEAD_HTTP_TIMEOUT)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise _TransientLeadError(f"NocoDB unreachable: {e}") from e
+
+        if response.status_code in (200, 201):
+            logger.info("[LEAD] %d lead(s) saved to NocoDB", count)
+            return
+        message = f"{response.status_code} - {response.text[:200]}"
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            raise _TransientLeadError(message)
+        raise LeadRejectedError(message, status_code=response.status_code)
+
+    # ------------------------------------------------------------------ #
+    # Durable queue                                                       #
+    # ------------------------------------------------------------------ #
+
+    def _enqueue(
+        self, record: dict, idempotency_key: str, table_url: str, attempts: int = 0, delay: float = 0.0
+    ) -> None:
+        entry_id = uuid.uuid4().hex
+        entry = {"record": record, "key": idempotency_key, "table": table_url, "attempts": attempts}
+        pipeline = self.redis_client.pipeline()
+        pipeline.hset(LEAD_QUEUE_ENTRIES_KEY, entry_id, json.dumps(entry, ensure_ascii=False))
+        pipeline.zadd(LEAD_QUEUE_KEY, {entry_id: time.time() + delay})
+        pipeline.execute()
+        self.start()
+
+    def backlog(self) -> int:
+        """Number of leads waiting in the durable queue."""
+        if not self.redis_client:
+            return 0
+        try:
+            return int(self.redis_client.zcard(LEAD_QUEUE_KEY))
+        except Exception:
+            return 0
+
+    def flush_once(self) -> int:
+        """
+        Claim one batch of ready entries and write it. Returns the number of entries processed.
+        """
+        if not self.redis_client:
+            return 0
+        if get_circuit_breaker(NOCODB).is_open():
+            # Don't burn retry attempts while NocoDB is known to be down.
+            return 0
+
+        now = time.time()
+        entry_ids = self._claim(
+            keys=[LEAD_QUEUE_KEY], args=[now, self.batch_size, now + LEAD_CLAIM_LEASE_SECONDS]
+        )
+        if not entry_ids:
+            return 0
+
+        raw_entries = self.redis_client.hmget(LEAD_QUEUE_ENTRIES_KEY, entry_ids)
+        entries = {}
+        for entry_id, raw in zip(entry_ids, raw_entries):
+            if raw:
+                entries[entry_id] = json.loads(raw)
+            else:
+                self.redis_client.zrem(LEAD_QUEUE_KEY, entry_id)
+        if not entries:
+            return 0
+
+        # One bulk insert per table (entries queued before tenants existed have no table).
+        by_table = {}
+        for entry_id, entry in entries.items():
+            by_table.setdefault(entry.get("table") or self.table_url, {})[entry_id] = entry
+        for table_url, batch in by_table.items():
+            self._write_batch(table_url, batch)
+        return len(entries)
+
+    def _write_batch(self, table_url: str, entries: dict) -> None:
+        try:
+            self._post([entry["record"] for entry in entries.values()], table_url)
+            self._remove(entries.keys())
+        except _TransientLeadError as e:
+            logger.warning("[LEAD] Batch of %d failed, will retry: %s", len(entries), e)
+            self._reschedule(entries)
+        except LeadRejectedError as e:
+            if len(entries) == 1:
+                self._dead_letter(entries, str(e))
+            else:
+                # One bad record rejects the whole bulk insert; retry individually to isolate it.
+                for entry_id, entry in entries.items():
+                    try:
+                        self._post([entry["record"]], table_url)
+                        self._remove([entry_id])
+                    except _TransientLeadError:
+                        self._reschedule({entry_id: entry})
+                    except LeadRejectedError as single_error:
+                        self._dead_letter({entry_id: entry}, str(single_error))
+
+    def _remove(self, entry_ids) -> None:
+        entry_ids = list(entry_ids)
+        pipeline = self.redis_client.pipeline()
+        pipeline.zrem(LEAD_QUEUE_KEY, *entry_ids)
+        pipeline.hdel(LEAD_QUEUE_ENTRIES_KEY, *entry_ids)
+        pipeline.execute()
+
+    def _reschedule(self, entries: dict) -> None:
+        exhausted = {}
+        pipeline = self.redis_client.pipeline()
+        for entry_id, entry in entries.items():
+            entry["attempts"] = entry.get("attempts", 0) + 1
+            RETRIES_TOTAL.labels(operation="nocodb").inc()
+            if entry["attempts"] >= LEAD_MAX_ATTEMPTS:
+                exhausted[entry_id] = entry
+                continue
+            pipeline.hset(LEAD_QUEUE_ENTRIES_KEY, entry_id, json.dumps(entry, ensure_ascii=False))
+            pipeline.zadd(LEAD_QUEUE_KEY, {entry_id: time.time() + _retry_delay(entry["attempts"])})
+        pipeline.execute()
+        if exhausted:
+            self._dead_letter(exhausted, "max attempts exceeded")
+
+    def _dead_letter(self, entries: dict, reason: str) -> None:
+        ERRORS_TOTAL.labels(stage="nocodb").inc(len(entries))
+        logger.error("[LEAD] %d lead(s) moved to dead letter: %s", len(entries), reason)
+        pipeline = self.redis_client.pipeline()
+        for entry in entries.values():
+            entry["error"] = reason
+            pipeline.rpush(LEAD_DEAD_LETTER_KEY, json.dumps(entry, ensure_ascii=False))
+            pipeline.delete(entry["key"])
+        pipeline.execute()
+        self._remove(entries.keys())
+
+    # ------------------------------------------------------------------ #
+    # Flusher thread                                                      #
+    # ------------------------------------------------------------------ #
+
+    def start(self) -> None:
+        """Start the background flusher (idempotent)."""
+        if not self.redis_client:
+            return
+        with self._flusher_lock:
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._run_flusher, name="lead-sink-flusher", daemon=True)
+            self._flusher.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush what is ready and stop the background flusher."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._flusher:
+            self._flusher.join(timeout)
+
+    def _run_flusher(self) -> None:
+        while True:
+            try:
+                while self.flush_once() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error("[LEAD] Flusher error: %s", e, exc_info=True)
+            if self._stop.is_set():
+                return
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+
+# Global instance
+_sink: Optional[LeadSink] = None
+
+
+def get_lead_sink() -> LeadSink:
+    """Get or create global LeadSink instance (starts the flusher for leftover queue entries)."""
+    global _sink
+    if _sink is None:
+        _sink = LeadSink()
+        if _sink.backlog():
+            _sink.start()
+    return _sink
+
+
+def stop_lead_sink(timeout: float = 10.0) -> None:
+    """Stop the global LeadSink's flusher, if this process started one (used on shutdown)."""
+    if _sink is not None:
+        _sink.stop(timeout)
@@ -0,0 +1,99 @@
+"""
+Process lifecycle: tracks the background work of this worker so a shutdown can drain it.
+
+Webhook handlers (buffer processors, audio handling) and deferred agent runs are started with
+`spawn()` instead of fire-and-forget tasks. On SIGTERM the worker enters draining mode:
+
+- /health/ready answers 503, so the load balancer stops sending traffic;
+- buffer processors stop waiting for silence and answer what is buffered right away;
+- deferred runs stop waiting for the overload to clear;
+- the app lifespan waits up to SHUTDOWN_DRAIN_SECONDS for the tracked tasks, then cancels the
+  rest (cancelled processors release their processing lock on the way out).
+"""
+import asyncio
+import logging
+import signal
+import time
+from typing import Coroutine, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DRAIN_POLL_SECONDS = 0.25  # how quickly sleeping background work notices a shutdown
+
+
+class Lifecycle:
+    """Set of in-flight background tasks plus the draining flag of this worker."""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._draining = False
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        """Run `coro` in the background; the task is awaited (or cancelled) by drain()."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def sleep(self, seconds: float) -> None:
+        """asyncio.sleep that returns early once draining starts."""
+        until = time.monotonic() + seconds
+        while not self._draining:
+            left = until - time.monotonic()
+            if left <= 0:
+                return
+            await asyncio.sleep(min(left, DRAIN_POLL_SECONDS))
+
+    def begin_drain(self) -> None:
+        if not self._draining:
+            logger.info("[SHUTDOWN] Draining: %d background task(s) in flight", len(self._tasks))
+        self._draining = True
+
+    def install_signal_handler(self) -> None:
+        """
+        Start draining as soon as SIGTERM arrives, then hand the signal to the server's own handler
+        (uvicorn restores its handlers when it exits, so this needs no cleanup).
+        """
+        previous = signal.getsignal(signal.SIGTERM)
+        if not callable(previous):
+            return
+
+        def _on_sigterm(signum, frame):
+            self.begin_drain()
+            previous(signum, frame)
+
+        signal.signal(signal.SIGTERM, _on_sigterm)
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to `timeout` seconds for tracked tasks; cancel the rest. Returns how many were cancelled."""
+        self.begin_drain()
+        pending = set(self._tasks)
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning("[SHUTDOWN] Drain timed out after %.0fs: cancelled %d task(s)", timeout, len(pending))
+        else:
+            logger.info("[SHUTDOWN] Drained all background tasks")
+        return len(pending)
+
+
+# Global instance
+_lifecycle: Optional[Lifecycle] = None
+
+
+def get_lifecycle() -> Lifecycle:
+    """Get or create global Lifecycle instance."""
+    global _lifecycle
+    if _lifecycle is None:
+        _lifecycle = Lifecycle()
+    return _lifecycle
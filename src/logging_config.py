@@ -0,0 +1,140 @@
+"""
+Process logging: JSON lines written by a listener thread, off the event loop.
+
+    caller (event loop)   level check, sampling filter, enqueue the record as is
+    listener thread       format the message, redact CPFs/phones, JSON-encode, write to stderr
+
+Configured once per worker by `configure_logging()` (src/app.py):
+
+    LOG_LEVEL           root level (INFO)
+    LOG_LEVELS          per-module levels, "httpx=WARNING,src.api.webhook=DEBUG"
+    LOG_FORMAT          json | text
+    LOG_SAMPLE_RATE     share of the high-frequency INFO lines kept (SAMPLED_PREFIXES: one or more
+                        per incoming message); warnings and errors are never sampled
+
+Records cross the queue unformatted: `%` arguments are merged in the listener, so a record
+dropped by a level or the sampler costs nothing beyond the check.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from src.config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_SAMPLE_RATE
+from src.text import redact_pii
+
+# Message templates logged for (almost) every webhook event
+SAMPLED_PREFIXES: Tuple[str, ...] = (
+    "[RECV]",
+    "[SEND]",
+    "[OUTGOING] sender=",
+    "[OUTGOING] Agent echo ignored",
+    "[%s] Message sent successfully",
+    "[%s] Message buffered",
+    "[%s] Lock acquired",
+    "[%s] Processor already running",
+    "[%s] Processing batch",
+    "[%s] Time to first message",
+)
+TEXT_FORMAT = "%(levelname)s %(name)s: %(message)s"
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """'httpx=WARNING,agno=ERROR' -> {'httpx': 30, 'agno': 40} (unknown levels are ignored)."""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        value = logging.getLevelName(level.strip().upper())
+        if name.strip() and isinstance(value, int):
+            levels[name.strip()] = value
+    return levels
+
+
+class SamplingFilter(logging.Filter):
+    """Keep `rate` of the INFO-and-below records whose message template starts with one of `prefixes`."""
+
+    def __init__(self, rate: float, prefixes: Tuple[str, ...] = SAMPLED_PREFIXES):
+        super().__init__()
+        self.rate = rate
+        self.prefixes = prefixes
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno > logging.INFO:
+            return True
+        if isinstance(record.msg, str) and record.msg.startswith(self.prefixes):
+            return random.random() < self.rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, message redacted."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_pii(record.getMessage()),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return redact_pii(super().format(record))
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process: the listener formats it (the stdlib version formats here, on the caller).
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    log_format: str = LOG_FORMAT,
+    sample_rate: float = LOG_SAMPLE_RATE,
+    stream=None,
+) -> None:
+    """Route the root logger through the queue (idempotent: the first call wins)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if log_format == "json" else RedactingFormatter(TEXT_FORMAT))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        handler.addFilter(SamplingFilter(sample_rate))
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level.upper())
+        for name, module_level in parse_levels(levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush what is queued and stop the listener thread (worker shutdown)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,157 @@
+"""
+Numbered menu of the script (1–5 plus "menu") answered without the agent.
+
+The menu state of a conversation lives in the Redis hash `menu:{sender_id}` (tenant namespace,
+same TTL as the agent session) and is updated after every reply the user receives:
+
+    menu shown           the last reply listed the options (welcome, "menu", an agent reply
+                         ending with the options) or answered one of them (1, 2, 4, 5)
+    (none)               anything else; a bare digit then goes to the agent, since it may be
+                         an answer to a question ("quantas parcelas?" -> "3")
+
+While the menu is shown, a bare selection ("1", "1️⃣", "opção 2") gets the scripted option text
+right away; "menu"/"voltar" is answered from any state. Option 3 asks for the lead data only until
+the user sent some, after that the agent handles it (it must never ask twice). Canned menu replies
+are written into the session history like every other template reply, so the agent still sees them.
+"""
+import logging
+import re
+from typing import Optional
+
+from src.catalog import format_listing, get_catalog
+from src.config import MENU_STATE_TTL_SECONDS
+from src.metrics import ROUTER_DECISIONS_TOTAL
+from src.prompts import LEAD_DATA_REQUEST
+from src.redis_client import get_redis
+from src.router import ROUTE_TEMPLATE, RouteDecision, extract_features, has_lead_data, log_decision
+from src.tenants import current_tenant
+from src.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+MENU_KEY_PREFIX = "menu:"
+STATE_MENU = "menu"
+LISTING_PLACEHOLDER = "[lista da ferramenta buscar_modelos]"
+MENU_MARKER = "1️⃣"  # an outgoing text containing it lists the options
+
+# Bare selection: "1", "1.", "1️⃣", "opcao 1", "op 2" (normalized text)
+_SELECTION = re.compile(r"^(?:opcao|opc|op)?\s*([1-5])\W*$")
+MENU_WORDS = frozenset({"menu", "menu inicial", "voltar", "voltar ao menu", "voltar pro menu", "inicio"})
+
+OPTION_SECTIONS = {
+    "2": "Opção 2 – Formas de pagamento",
+    "4": "Opção 4 – Localização",
+    "5": "Opção 5 – Catálogo",
+}
+
+
+def parse_selection(text: str) -> Optional[str]:
+    """'menu', an option digit, or None for free-form text."""
+    normalized = normalize_text(text).strip(" .!")
+    if normalized in MENU_WORDS:
+        return "menu"
+    match = _SELECTION.match(normalized)
+    return match.group(1) if match else None
+
+
+def menu_reply() -> str:
+    """The options of the welcome message; "menu" never repeats the welcome text itself."""
+    welcome = current_tenant().section("Menu Inicial")
+    return welcome[welcome.index("Escolha uma opção"):]
+
+
+def option_reply(option: str) -> str:
+    """Scripted text of an option (current tenant); option 1 gets the price list from the catalog."""
+    if option == "1":
+        section = current_tenant().section("Opção 1 – Modelos")
+        return section.replace(LISTING_PLACEHOLDER, format_listing(get_catalog()))
+    if option == "3":
+        return LEAD_DATA_REQUEST
+    return current_tenant().section(OPTION_SECTIONS[option])
+
+
+class MenuStateMachine:
+    """Per-conversation menu state in Redis; `handle` answers bare selections."""
+
+    def __init__(self, redis_client=None, ttl_seconds: int = MENU_STATE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        if redis_client is not None:
+            self.redis_client = redis_client
+        else:
+            try:
+                self.redis_client = get_redis()
+            except Exception as e:
+                logger.warning("MenuStateMachine: Failed to get Redis client: %s", e)
+                self.redis_client = None
+
+    def _key(self, sender_id: str) -> str:
+        return current_tenant().key(f"{MENU_KEY_PREFIX}{sender_id}")
+
+    def _state(self, sender_id: str) -> dict:
+        try:
+            return self.redis_client.hgetall(self._key(sender_id)) or {}
+        except Exception as e:
+            logger.error("[MENU] Failed to read state for %s: %s", sender_id[-6:], e)
+            return {}
+
+    def _update(self, sender_id: str, **fields) -> None:
+        """Set (or, with an empty value, clear) hash fields and refresh the TTL."""
+        key = self._key(sender_id)
+        try:
+            pipeline = self.redis_client.pipeline()
+            for name, value in fields.items():
+                if value:
+                    pipeline.hset(key, name, value)
+                else:
+                    pipeline.hdel(key, name)
+            pipeline.expire(key, self.ttl_seconds)
+            pipeline.execute()
+        except Exception as e:
+            logger.error("[MENU] Failed to update state for %s: %s", sender_id[-6:], e)
+
+    def handle(self, sender_id: str, text: str) -> Optional[RouteDecision]:
+        """Template decision for a menu selection, or None when the agent should answer."""
+        if not self.redis_client:
+            return None
+        selection = parse_selection(text)
+        if selection is None:
+            if has_lead_data(extract_features(text)):
+                self._update(sender_id, lead_data="1")
+            return None
+
+        state = self._state(sender_id)
+        if selection == "menu":
+            reply, next_state = menu_reply(), STATE_MENU
+        elif state.get("state") != STATE_MENU:
+            return None
+        elif selection == "3":
+            if state.get("lead_data"):
+                return None
+            # The next message is the lead data, not a menu choice.
+            reply, next_state = LEAD_DATA_REQUEST, ""
+        else:
+            reply, next_state = option_reply(selection), STATE_MENU
+
+        self._update(sender_id, state=next_state)
+        decision = RouteDecision(ROUTE_TEMPLATE, f"menu_{selection}" if selection != "menu" else "menu", reply=reply)
+        ROUTER_DECISIONS_TOTAL.labels(route=decision.route, reason=decision.reason).inc()
+        log_decision(decision, text, sender_id)
+        return decision
+
+    def observe_reply(self, sender_id: str, reply: str) -> None:
+        """Track whether the menu is shown after a reply sent outside `handle` (agent, router, cache)."""
+        if not self.redis_client or not reply:
+            return
+        self._update(sender_id, state=STATE_MENU if MENU_MARKER in reply else "")
+
+
+# Global instance
+_menu: Optional[MenuStateMachine] = None
+
+
+def get_menu_state_machine() -> MenuStateMachine:
+    """Get or create global MenuStateMachine instance."""
+    global _menu
+    if _menu is None:
+        _menu = MenuStateMachine()
+    return _menu
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics for the hot paths, plus a small timing helper.
+
+`timed` works as a decorator (sync or async functions) and as a context manager:
+
+    @timed(AGENT_RUN_SECONDS, in_flight="agent")
+    async def run(): ...
+
+    with timed(TRANSCRIPTION_STAGE_SECONDS, stage="download"):
+        ...
+"""
+import functools
+import inspect
+import os
+import time
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+METRICS_NAMESPACE = "igagent"
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# Latency histograms
+WEBHOOK_SECONDS = Histogram(
+    "webhook_handling_seconds", "Time to accept a webhook POST", namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+BUFFER_WAIT_SECONDS = Histogram(
+    "buffer_wait_seconds", "Time a batch waited for buffer silence", namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+SCOPE_CLASSIFICATION_SECONDS = Histogram(
+    "scope_classification_seconds", "Scope classifier latency", namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+TRANSCRIPTION_STAGE_SECONDS = Histogram(
+    "transcription_stage_seconds",
+    "Audio transcription latency by stage (download, ffmpeg, vad, probe, api)",
+    ["stage"],
+    namespace=METRICS_NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_RUN_SECONDS = Histogram(
+    "agent_run_seconds", "Agent run latency", ["mode"], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+TIME_TO_FIRST_MESSAGE_SECONDS = Histogram(
+    "time_to_first_message_seconds",
+    "Time from start of reply generation until the first message was sent",
+    ["mode"],
+    namespace=METRICS_NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+TTS_SECONDS = Histogram(
+    "tts_seconds", "Text-to-speech synthesis latency", namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+GRAPH_SEND_SECONDS = Histogram(
+    "graph_send_seconds", "Graph API send latency (including retries)", ["kind"], namespace=METRICS_NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+# Counters
+MESSAGES_TOTAL = Counter("messages_total", "Incoming user messages", ["kind"], namespace=METRICS_NAMESPACE)
+BATCHES_TOTAL = Counter("batches_total", "Buffered message batches processed", namespace=METRICS_NAMESPACE)
+BATCH_MESSAGES = Histogram(
+    "batch_messages", "Messages per processed batch", namespace=METRICS_NAMESPACE, buckets=(1, 2, 3, 5, 8, 13)
+)
+SESSION_VALUE_BYTES = Histogram(
+    "session_value_bytes", "Size of stored agent session values (session record, run)", ["table"],
+    namespace=METRICS_NAMESPACE, buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536),
+)
+AUDIO_TRIMMED_SECONDS = Histogram(
+    "audio_trimmed_seconds", "Silence removed from voice messages before transcription", namespace=METRICS_NAMESPACE,
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 45),
+)
+TRANSCRIBED_AUDIO_SECONDS = Counter(
+    "transcribed_audio_seconds", "Audio seconds uploaded for transcription (billed)", namespace=METRICS_NAMESPACE
+)
+BLOCKS_TOTAL = Counter("blocks_total", "Replies skipped because a human is interacting", namespace=METRICS_NAMESPACE)
+ECHOES_TOTAL = Counter("echoes_total", "Outgoing echo events", ["kind"], namespace=METRICS_NAMESPACE)
+ERRORS_TOTAL = Counter("errors_total", "Errors by stage", ["stage"], namespace=METRICS_NAMESPACE)
+RETRIES_TOTAL = Counter("retries_total", "Retries by operation", ["operation"], namespace=METRICS_NAMESPACE)
+DEADLINE_OVERRUNS_TOTAL = Counter(
+    "deadline_overruns_total",
+    "Stages skipped, cut short or not retried because the reply budget ran out",
+    ["stage"],
+    namespace=METRICS_NAMESPACE,
+)
+
+AGENT_QUEUE_WAIT_SECONDS = Histogram(
+    "agent_queue_wait_seconds", "Time waiting for a free agent run slot", namespace=METRICS_NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+OVERLOAD_TRANSITIONS_TOTAL = Counter(
+    "overload_transitions_total", "Degraded mode transitions", ["from_mode", "to_mode"], namespace=METRICS_NAMESPACE
+)
+OVERLOAD_SHED_TOTAL = Counter(
+    "overload_shed_total",
+    "Work shed under overload (audio_reply, scope_classification, small_model, deferred)",
+    ["action"],
+    namespace=METRICS_NAMESPACE,
+)
+ROUTER_DECISIONS_TOTAL = Counter(
+    "router_decisions_total", "Per-turn routing decisions", ["route", "reason"], namespace=METRICS_NAMESPACE
+)
+RESPONSE_CACHE_LOOKUPS_TOTAL = Counter(
+    "response_cache_lookups_total", "First-turn response cache lookups", ["result"], namespace=METRICS_NAMESPACE
+)
+CIRCUIT_REJECTIONS_TOTAL = Counter(
+    "circuit_rejections_total", "Calls failed fast by an open circuit", ["dependency"], namespace=METRICS_NAMESPACE
+)
+CIRCUIT_TRANSITIONS_TOTAL = Counter(
+    "circuit_transitions_total", "Circuit state transitions", ["dependency", "to_state"], namespace=METRICS_NAMESPACE
+)
+SHARD_FORWARDS_TOTAL = Counter(
+    "shard_forwards_total", "Webhook messages forwarded to the worker owning the conversation",
+    namespace=METRICS_NAMESPACE,
+)
+
+# Gauges
+# (multiprocess_mode only applies with several workers, see render_metrics)
+IN_FLIGHT = Gauge(
+    "in_flight", "Work currently in progress", ["stage"], namespace=METRICS_NAMESPACE, multiprocess_mode="livesum"
+)
+CIRCUIT_STATE = Gauge(
+    "circuit_state", "Last seen circuit state (0 closed, 1 half-open, 2 open)", ["dependency"],
+    namespace=METRICS_NAMESPACE, multiprocess_mode="livemax",
+)
+HEALTH_CHECK_OK = Gauge(
+    "health_check_ok", "Last readiness probe result per check (1 ok, 0 failing)", ["check"],
+    namespace=METRICS_NAMESPACE, multiprocess_mode="livemin",
+)
+OVERLOAD_MODE = Gauge(
+    "overload_mode",
+    "Current degraded mode (0 normal, 1 no audio reply, 2 no classifier, 3 small model, 4 defer)",
+    namespace=METRICS_NAMESPACE,
+    multiprocess_mode="livemax",
+)
+SHARD_MEMBERS = Gauge(
+    "shard_members", "Workers in the conversation sharding ring", namespace=METRICS_NAMESPACE,
+    multiprocess_mode="livemax",
+)
+
+
+class timed:
+    """Observe elapsed seconds into a histogram and optionally track an in-flight gauge."""
+
+    def __init__(self, histogram: Histogram, in_flight: Optional[str] = None, **labels):
+        self._histogram = histogram
+        self._in_flight_stage = in_flight
+        self._labels = labels
+        self._started = 0.0
+
+    def __enter__(self):
+        if self._in_flight_stage:
+            IN_FLIGHT.labels(stage=self._in_flight_stage).inc()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        metric = self._histogram.labels(**self._labels) if self._labels else self._histogram
+        metric.observe(elapsed)
+        if self._in_flight_stage:
+            IN_FLIGHT.labels(stage=self._in_flight_stage).dec()
+        return False
+
+    def _fresh(self) -> "timed":
+        # Each call gets its own timer so concurrent calls don't share start times.
+        return timed(self._histogram, self._in_flight_stage, **self._labels)
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self._fresh():
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._fresh():
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Serialize all registered metrics in the Prometheus text format.
+    With several workers (PROMETHEUS_MULTIPROC_DIR set), every worker's metrics are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the multiprocess metrics (on shutdown)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
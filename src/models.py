@@ -3,9 +3,39 @@ Pydantic models for data validation across the application.
 """
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Literal
-from datetime import datetime
+from datetime import date
 import re
 
+# Compiled once: these validators run on every tool call and every message batch.
+NOME_PATTERN = re.compile(r"^[a-zA-ZÀ-ÿ\s]+$")
+NON_DIGITS_PATTERN = re.compile(r"\D")
+NASCIMENTO_PATTERN = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")  # as strptime("%d/%m/%Y"): 5/3/1990 is valid
+
+
+def is_valid_cpf(cpf_digits: str) -> bool:
+    """Validate an 11-digit CPF string, including both check digits."""
+    if len(cpf_digits) != 11 or not cpf_digits.isdigit() or len(set(cpf_digits)) == 1:
+        return False
+    numbers = [ord(c) - 48 for c in cpf_digits]
+    for position in (9, 10):
+        total = sum(numbers[i] * (position + 1 - i) for i in range(position))
+        check = (total * 10) % 11 % 10
+        if numbers[position] != check:
+            return False
+    return True
+
+
+def validate_webhook_fields(sender_id: str, text: str) -> Optional[str]:
+    """
+    Fast path equivalent of WebhookMessage validation, without building a model.
+    Returns None when valid, or the error message.
+    """
+    if not sender_id or not sender_id.isdigit():
+        return "Sender ID must be numeric"
+    if not text or text.isspace():
+        return "Message text cannot be empty"
+    return None
+
 
 class LeadModel(BaseModel):
     """Model for validating lead data before saving to NocoDB."""
@@ -22,22 +52,21 @@ class LeadModel(BaseModel):
     def validate_nome(cls, v):
         """Validate and trim name."""
         v = v.strip()
-        if not v or not re.match(r"^[a-zA-ZÀ-ÿ\s]+$", v):
+        if not v or not NOME_PATTERN.match(v):
             raise ValueError("Nome deve conter apenas letras e espaços")
         return v
     
     @field_validator("cpf")
     @classmethod
     def validate_cpf(cls, v):
-        """Validate CPF format and basic checksum."""
+        """Validate CPF format and check digits."""
         # Remove common formatting
-        cpf_clean = re.sub(r"\D", "", v)
+        cpf_clean = NON_DIGITS_PATTERN.sub("", v)
         
         if len(cpf_clean) != 11:
             raise ValueError("CPF deve conter 11 dígitos")
         
-        # Basic validation: all same digit is invalid
-        if len(set(cpf_clean)) == 1:
+        if not is_valid_cpf(cpf_clean):
             raise ValueError("CPF inválido")
         
         # Format to XXX.XXX.XXX-XX for storage
@@ -49,7 +78,7 @@ class LeadModel(BaseModel):
     def validate_telefone(cls, v):
         """Validate phone format."""
         # Remove common formatting
-        phone_clean = re.sub(r"\D", "", v)
+        phone_clean = NON_DIGITS_PATTERN.sub("", v)
         
         if len(phone_clean) < 10 or len(phone_clean) > 11:
             raise ValueError("Telefone deve conter 10 ou 11 dígitos")
@@ -66,8 +95,12 @@ class LeadModel(BaseModel):
     @classmethod
     def validate_nascimento(cls, v):
         """Validate birth date format (DD/MM/YYYY)."""
+        match = NASCIMENTO_PATTERN.match(v)
+        if not match:
+            raise ValueError("Data de nascimento deve estar no formato DD/MM/YYYY")
+        day, month, year = (int(part) for part in match.groups())
         try:
-            datetime.strptime(v, "%d/%m/%Y")
+            date(year, month, day)
         except ValueError:
             raise ValueError("Data de nascimento deve estar no formato DD/MM/YYYY")
         return v
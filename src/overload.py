@@ -0,0 +1,180 @@
+"""
+Overload controller.
+Bounds concurrent agent runs and steps the service down through degraded modes as
+slots fill up and the wait for a slot grows:
+
+    NORMAL -> NO_AUDIO_REPLY -> NO_CLASSIFIER -> SMALL_MODEL -> DEFER
+
+Load is scored as max(occupancy, oldest queue wait / OVERLOAD_QUEUE_WAIT_SECONDS), where
+occupancy is (running + waiting) / AGENT_MAX_CONCURRENCY. Modes go up as soon as a threshold
+is crossed and recover one step at a time, once the score is below the step's threshold times
+OVERLOAD_RECOVERY_RATIO and the current mode has been held for OVERLOAD_MIN_DWELL_SECONDS.
+State is per process: the threads it protects are per process too.
+"""
+import asyncio
+import enum
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Sequence
+
+from src.config import (
+    AGENT_MAX_CONCURRENCY,
+    OVERLOAD_MIN_DWELL_SECONDS,
+    OVERLOAD_QUEUE_WAIT_SECONDS,
+    OVERLOAD_RECOVERY_RATIO,
+    OVERLOAD_THRESHOLDS,
+)
+from src.metrics import AGENT_QUEUE_WAIT_SECONDS, OVERLOAD_MODE, OVERLOAD_TRANSITIONS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadMode(enum.IntEnum):
+    NORMAL = 0
+    NO_AUDIO_REPLY = 1
+    NO_CLASSIFIER = 2
+    SMALL_MODEL = 3
+    DEFER = 4
+
+
+class OverloadController:
+    """Agent run slots plus the degraded mode derived from their occupancy."""
+
+    def __init__(
+        self,
+        max_concurrency: int = AGENT_MAX_CONCURRENCY,
+        thresholds: Sequence[float] = OVERLOAD_THRESHOLDS,
+        queue_wait_target: float = OVERLOAD_QUEUE_WAIT_SECONDS,
+        recovery_ratio: float = OVERLOAD_RECOVERY_RATIO,
+        min_dwell_seconds: float = OVERLOAD_MIN_DWELL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if len(thresholds) != len(OverloadMode) - 1:
+            raise ValueError(f"Expected {len(OverloadMode) - 1} overload thresholds, got {len(thresholds)}")
+        self.max_concurrency = max_concurrency
+        self.thresholds = tuple(thresholds)
+        self.queue_wait_target = queue_wait_target
+        self.recovery_ratio = recovery_ratio
+        self.min_dwell_seconds = min_dwell_seconds
+        self._clock = clock
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._running = 0
+        self._waiters: Dict[int, float] = {}
+        self._tickets = itertools.count()
+        self._mode = OverloadMode.NORMAL
+        self._changed_at = clock()
+        OVERLOAD_MODE.set(self._mode)
+
+    # ------------------------------------------------------------------ #
+    # Mode                                                                 #
+    # ------------------------------------------------------------------ #
+
+    def load_score(self) -> float:
+        occupancy = (self._running + len(self._waiters)) / self.max_concurrency
+        oldest_wait = self._clock() - min(self._waiters.values()) if self._waiters else 0.0
+        return max(occupancy, oldest_wait / self.queue_wait_target)
+
+    @property
+    def mode(self) -> OverloadMode:
+        self._update()
+        return self._mode
+
+    def _update(self) -> None:
+        score = self.load_score()
+        target = OverloadMode(sum(1 for threshold in self.thresholds if score >= threshold))
+        now = self._clock()
+        if target > self._mode:
+            self._transition(target, score, now)
+        elif (
+            target < self._mode
+            and score < self.thresholds[self._mode - 1] * self.recovery_ratio
+            and now - self._changed_at >= self.min_dwell_seconds
+        ):
+            self._transition(OverloadMode(self._mode - 1), score, now)
+
+    def _transition(self, mode: OverloadMode, score: float, now: float) -> None:
+        OVERLOAD_TRANSITIONS_TOTAL.labels(from_mode=self._mode.name.lower(), to_mode=mode.name.lower()).inc()
+        OVERLOAD_MODE.set(mode)
+        logger.warning(
+            "[OVERLOAD] %s -> %s (score=%.2f running=%d waiting=%d)",
+            self._mode.name, mode.name, score, self._running, len(self._waiters),
+        )
+        self._mode = mode
+        self._changed_at = now
+
+    def skip_audio_reply(self) -> bool:
+        return self.mode >= OverloadMode.NO_AUDIO_REPLY
+
+    def skip_classifier(self) -> bool:
+        return self.mode >= OverloadMode.NO_CLASSIFIER
+
+    def use_small_model(self) -> bool:
+        return self.mode >= OverloadMode.SMALL_MODEL
+
+    def should_defer(self) -> bool:
+        return self.mode >= OverloadMode.DEFER
+
+    # ------------------------------------------------------------------ #
+    # Agent run slots                                                      #
+    # ------------------------------------------------------------------ #
+
+    async def _acquire(self) -> None:
+        ticket = next(self._tickets)
+        started = self._clock()
+        self._waiters[ticket] = started
+        self._update()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            del self._waiters[ticket]
+        AGENT_QUEUE_WAIT_SECONDS.observe(self._clock() - started)
+        self._running += 1
+        self._update()
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._semaphore.release()
+        self._update()
+
+    @asynccontextmanager
+    async def agent_slot(self):
+        """Hold an agent run slot for the duration of the block (waiting for one if needed)."""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def run_in_thread(self, func: Callable, timeout: float):
+        """
+        Run blocking `func` in a worker thread once a slot is free.
+        The slot stays taken until the thread finishes, even when the caller stops waiting,
+        so abandoned runs still count against capacity.
+        Raises TimeoutError when the slot wait plus the run exceed `timeout`.
+        """
+        started = self._clock()
+        await asyncio.wait_for(self._acquire(), timeout)
+        worker = asyncio.ensure_future(asyncio.to_thread(func))
+        worker.add_done_callback(self._on_worker_done)
+        remaining = max(0.0, timeout - (self._clock() - started))
+        return await asyncio.wait_for(asyncio.shield(worker), remaining)
+
+    def _on_worker_done(self, worker: asyncio.Future) -> None:
+        self._release()
+        if not worker.cancelled() and worker.exception() is not None:
+            # Retrieved here so abandoned runs don't log "exception was never retrieved".
+            logger.debug("Agent worker finished with error: %s", worker.exception())
+
+
+# Global instance
+_controller: Optional[OverloadController] = None
+
+
+def get_overload_controller() -> OverloadController:
+    """Get or create global OverloadController instance."""
+    global _controller
+    if _controller is None:
+        _controller = OverloadController()
+    return _controller
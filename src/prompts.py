@@ -1,3 +1,5 @@
+from typing import Tuple
+
 SYSTEM_PROMPT = """Você é o Assistente Virtual da Shineray Rosário, pronto para ajudar você a encontrar sua moto ideal, tirar dúvidas, apresentar opções e direcionar para um consultor no WhatsApp.
 
 **Objetivo:**  
@@ -42,7 +44,7 @@ Máximo de 500 caracteres por bloco sempre que possível.
 2. Processamento: identificar intenção (modelos, pagamento, simulação, localização) 
 3. Captura Nome, CPF, Telefone e Modelo de interesse sempre que escolher a opção 3 e depois adicionar ao mocodb na Tool do mcp
 4. Enviar e-mail e notificação push notificando os vendedores com os dados do lead
-5. Após coletar os dados, mande o link para o cliente acessar o whatsapp: http://bit.ly/46ia00v
+5. Após coletar os dados, mande o link do WhatsApp (buscar_roteiro("whatsapp"))
 6. Saída: responder conforme a intenção e oferecer direcionamento para WhatsApp ou menu  
 
 **Script básico:**  
@@ -56,12 +58,14 @@ Máximo de 500 caracteres por bloco sempre que possível.
 - Menu de retorno  
 
 **Lógica condicional:**  
-- Opção 1: Listar modelos + preços + benefícios
-- Opção 2: Explicar formas de pagamento  
-- Opção 3: Direcionar para simulação + WhatsApp  
-- Opção 4: Enviar localização + horário 
-- Opção 5: Enviar link do catálogo 
-- Menu: Voltar ao menu inicial  
+Os textos prontos da loja vêm da ferramenta buscar_roteiro: envie exatamente o texto que ela retornar, sem mudar nomes, preços, links, endereço ou horário.
+- Boas-vindas: buscar_roteiro("boas-vindas")
+- Opção 1: buscar_roteiro("1") traz modelos + preços + benefícios; para um modelo ou categoria específicos use buscar_modelos, exatamente com os nomes e preços que ela retornar
+- Opção 2: buscar_roteiro("2") (formas de pagamento)
+- Opção 3: buscar_roteiro("3") pede os dados da simulação; depois de salvar o lead, buscar_roteiro("whatsapp") traz o link do WhatsApp
+- Opção 4: buscar_roteiro("4") (localização + horário)
+- Opção 5: buscar_roteiro("5") (link do catálogo)
+- Menu: buscar_roteiro("menu"), sem repetir as boas-vindas
 
 ---
 
@@ -76,7 +80,15 @@ Máximo de 500 caracteres por bloco sempre que possível.
 
 ---
 
-## 🔷 Exemplos de Interação
+**Menu de retorno:**  
+❓ Quer voltar ao menu? Digite 'menu'
+- Sempre que o usuario pedir o menu, não mostrar a mensagem de boas-vindas novamente
+"""
+
+# Scripted texts of the store, sent as-is: served to the agent by the buscar_roteiro tool (src/tools.py)
+# and used for the replies sent without the agent (welcome, FAQ, menu), instead of riding along on every run.
+SCRIPT_HEADING = "## 🔷 Exemplos de Interação"
+SCRIPTED_REPLIES = """## 🔷 Exemplos de Interação
 
 **Menu Inicial:**  
 👋 Olá! Bem-vindo(a) à Shineray Rosário! 🚀 Sua moto nova te espera com:  
@@ -97,40 +109,7 @@ Escolha uma opção:
 📢 Confira os modelos disponíveis e escolha o seu favorito!
 🚨 Valores para pagamento à vista.
 
----
-
-🟥 Modelos a Combustão
-
-* JET 50s – R$ 12.999,00
-* JET 125 SS – R$ 14.999,00
-* JEF 150 – R$ 16.999,00
-* PHOENIX 50 – R$ 10.999,00
-* RIO 125 – R$ 14.999,00
-* SHI 175 EFI (injeção eletrônica) – R$ 20.999,00
-* SHI 175 (carburada) – R$ 18.999,00
-* FLASH 250 – R$ 24.999,00
-* DENVER 250 – R$ 29.999,00
-* STORM 200 – R$ 24.999,00
-* URBAN 150 EFI – R$ 22.499,00
-* FREE 150 EFI – R$ 15.999,00
-* SHI 250 – R$ 24.999,00
-* Quadriciclo ATV 200 – R$ 29.999,00
-
----
-
-### ⚡️ Modelos Elétricos
-
-* PT1 – R$ 7.999,00
-* PT4 – R$ 16.999,00
-* SE1 – R$ 14.999,00
-* SCOOTER SH3 Triciclo – R$ 14.999,00
-* EBIKE – R$ 6.999,00
-
----
-
-### 🟦 Carro
-
-* TLUX – R$ 114.999,00
+[lista da ferramenta buscar_modelos]
 
 🚚 Entrega em até 24h + 1 revisão grátis  
 ✳️ Digite 'menu' para voltar  
@@ -172,8 +151,47 @@ Veja nosso catálogo completo 👇:
 https://drive.google.com/file/d/1sowc9Ty9b2j9DyRAmYEA2MPYYr7r66NY/view?usp=sharing
 
 ---
-
-**Menu de retorno:**  
-❓ Quer voltar ao menu? Digite 'menu'
-- Sempre que o usuario pedir o menu, não mostrar a mensagem de boas-vindas novamente
 """
+
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """
+    (instructions, scripted replies) of a prompt file written as one text, like a tenant's: the
+    scripts start at SCRIPT_HEADING. Instructions go to the model on every run, scripts only on request.
+    A file without the heading is kept whole on both sides, so its sections are still found.
+    """
+    start = prompt.find(SCRIPT_HEADING)
+    if start < 0:
+        return prompt, prompt
+    return prompt[:start].rstrip() + "\n", prompt[start:]
+
+
+def prompt_section(title: str, prompt: str = SCRIPTED_REPLIES) -> str:
+    """
+    Scripted answer under `**{title}:**` in the prompt (SCRIPTED_REPLIES by default), up to the next
+    heading or `---`, with the markdown line-break spaces removed (ready to send as-is).
+    """
+    marker = f"**{title}:**"
+    start = prompt.index(marker) + len(marker)
+    lines = []
+    for line in prompt[start:].splitlines():
+        if line.startswith("---") or line.startswith("**"):
+            break
+        lines.append(line.rstrip())
+    return "\n".join(lines).strip()
+
+
+# Canned replies sent without an agent run (see src/router.py); they are also written
+# into the session history so later runs see them.
+WELCOME_MESSAGE = prompt_section("Menu Inicial")
+THANKS_REPLY = "Por nada! 😊 Se precisar de mais alguma coisa, é só chamar.\n✳️ Digite 'menu' para voltar"
+LEAD_DATA_REQUEST = (
+    "🎯 Vou te encaminhar para um consultor no WhatsApp!\n"
+    "Me envie em uma única mensagem:\n"
+    "Nome completo\n"
+    "CPF: 000.000.000-00\n"
+    "Telefone: (00) 00000-0000\n"
+    "Modelo de interesse\n"
+    "Nascimento: 00/00/0000\n"
+    "CNH: SIM ou NÃO"
+)
@@ -0,0 +1,32 @@
+"""
+Shared Redis clients.
+A single connection pool per process, reused by every component that talks to Redis
+(plus one returning raw bytes, for binary values such as compressed agent sessions).
+"""
+import logging
+from typing import Optional
+
+import redis
+
+from src.config import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_bytes_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Get or create the process-wide Redis client (decoded responses)."""
+    global _client
+    if _client is None:
+        _client = redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_redis_bytes() -> redis.Redis:
+    """Get or create the process-wide Redis client that returns raw bytes."""
+    global _bytes_client
+    if _bytes_client is None:
+        _bytes_client = redis.from_url(REDIS_URL, decode_responses=False)
+    return _bytes_client
@@ -0,0 +1,250 @@
+"""
+Semantic response cache for history-free (first-turn) messages.
+
+Opening questions repeat a lot ("quanto custa a jet 50?", "vocês financiam?") and their answer does
+not depend on the conversation, so a reply produced on a conversation's first turn can answer a
+near-identical first message from someone else without an agent run.
+
+Messages are embedded locally (no API call): word unigrams plus character trigrams of the
+normalized text, feature-hashed into a sparse, L2-normalized vector. A lookup hits when the cosine
+similarity to a stored message reaches RESPONSE_CACHE_THRESHOLD and both messages contain exactly
+the same numbers (so "jet 50" never answers "jet 125").
+
+Each process keeps an in-memory LRU index; entries are shared through Redis:
+
+    response_cache:entries  hash: entry id -> JSON {text, reply, created_at, version}
+    response_cache:lru      sorted set: entry id -> last use (evicts the least recently used)
+
+Each tenant has its own cache (its own prompt and catalog), under its Redis key prefix.
+
+Replies quote prices, so each entry records the catalog version it was produced with and is
+ignored once the catalog file changes (see src/catalog.py).
+
+Replies that depend on history are never stored: only first-turn replies without tool calls are,
+and messages carrying lead data (CPF, phone, birth date) are neither stored nor looked up.
+"""
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from src.config import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from src.catalog import get_catalog
+from src.metrics import RESPONSE_CACHE_LOOKUPS_TOTAL
+from src.redis_client import get_redis
+from src.router import extract_features, has_lead_data
+from src.tenants import current_tenant
+from src.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENTRIES_KEY = "response_cache:entries"
+RESPONSE_CACHE_LRU_KEY = "response_cache:lru"
+RESPONSE_CACHE_SYNC_SECONDS = 30  # how often the local index picks up entries stored by other replicas
+
+EMBEDDING_DIMENSIONS = 1 << 18
+_WORD = re.compile(r"[a-z0-9]+")
+_NUMBER = re.compile(r"\d+")
+
+
+def embed(text: str) -> Dict[int, float]:
+    """Sparse L2-normalized vector of word unigrams (weight 2) and character trigrams."""
+    normalized = normalize_text(text)
+    features: Counter = Counter()
+    for word in _WORD.findall(normalized):
+        features[f"w:{word}"] += 2.0
+        padded = f"#{word}#"
+        for index in range(len(padded) - 2):
+            features[f"c:{padded[index:index + 3]}"] += 1.0
+    vector: Dict[int, float] = {}
+    for feature, weight in features.items():
+        slot = zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIMENSIONS
+        vector[slot] = vector.get(slot, 0.0) + weight
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {slot: weight / norm for slot, weight in vector.items()} if norm else {}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(slot, 0.0) for slot, weight in a.items())
+
+
+def is_cacheable(text: str) -> bool:
+    """Messages with lead data are personal: never answered from or stored in the cache."""
+    return not has_lead_data(extract_features(text))
+
+
+@dataclass
+class _Entry:
+    text: str
+    reply: str
+    created_at: float
+    version: str
+    vector: Dict[int, float]
+    numbers: frozenset
+
+
+def _entry_id(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """In-memory cosine index over first-turn messages, with TTL and LRU eviction, shared via Redis."""
+
+    def __init__(
+        self,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        redis_client=None,
+        clock: Callable[[], float] = time.time,
+        version: Optional[Callable[[], str]] = None,
+        key_prefix: str = "",
+    ):
+        self.threshold = threshold
+        self._entries_key = f"{key_prefix}{RESPONSE_CACHE_ENTRIES_KEY}"
+        self._lru_key = f"{key_prefix}{RESPONSE_CACHE_LRU_KEY}"
+        self._version = version or (lambda: get_catalog().version)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._synced_at: Optional[float] = None
+        if redis_client is None:
+            try:
+                redis_client = get_redis()
+            except Exception as e:
+                logger.warning("ResponseCache: Failed to get Redis client, cache is local only: %s", e)
+        self.redis_client = redis_client
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Cached reply for a message similar enough to `text`, or None."""
+        self._sync()
+        vector = embed(text)
+        numbers = frozenset(_NUMBER.findall(normalize_text(text)))
+        now = self._clock()
+        version = self._version()
+        best_id, best_score = None, 0.0
+        with self._lock:
+            for entry_id, entry in list(self._entries.items()):
+                if now - entry.created_at > self.ttl_seconds or entry.version != version:
+                    del self._entries[entry_id]
+                    continue
+                if entry.numbers != numbers:
+                    continue
+                score = cosine(vector, entry.vector)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None or best_score < self.threshold:
+                RESPONSE_CACHE_LOOKUPS_TOTAL.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(best_id)
+            reply = self._entries[best_id].reply
+        RESPONSE_CACHE_LOOKUPS_TOTAL.labels(result="hit").inc()
+        logger.info("[CACHE] hit score=%.3f entry=%s", best_score, best_id)
+        self._try_redis(lambda: self.redis_client.zadd(self._lru_key, {best_id: now}))
+        return reply
+
+    def store(self, text: str, reply: str) -> None:
+        """Store the reply to a first-turn message."""
+        entry_id = _entry_id(text)
+        now = self._clock()
+        version = self._version()
+        self._put(entry_id, text, reply, now, version)
+        payload = json.dumps(
+            {"text": text, "reply": reply, "created_at": now, "version": version}, ensure_ascii=False
+        )
+
+        def _write():
+            pipeline = self.redis_client.pipeline()
+            pipeline.hset(self._entries_key, entry_id, payload)
+            pipeline.zadd(self._lru_key, {entry_id: now})
+            pipeline.execute()
+            excess = self.redis_client.zcard(self._lru_key) - self.max_entries
+            if excess > 0:
+                evicted = self.redis_client.zrange(self._lru_key, 0, excess - 1)
+                if evicted:
+                    pipeline = self.redis_client.pipeline()
+                    pipeline.zrem(self._lru_key, *evicted)
+                    pipeline.hdel(self._entries_key, *evicted)
+                    pipeline.execute()
+
+        self._try_redis(_write)
+
+    def _put(self, entry_id: str, text: str, reply: str, created_at: float, version: str) -> None:
+        normalized = normalize_text(text)
+        entry = _Entry(text, reply, created_at, version, embed(text), frozenset(_NUMBER.findall(normalized)))
+        with self._lock:
+            self._entries[entry_id] = entry
+            self._entries.move_to_end(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _sync(self) -> None:
+        """Load entries stored by other replicas (at most every RESPONSE_CACHE_SYNC_SECONDS)."""
+        if not self.redis_client:
+            return
+        now = self._clock()
+        if self._synced_at is not None and now - self._synced_at < RESPONSE_CACHE_SYNC_SECONDS:
+            return
+        self._synced_at = now
+        version = self._version()
+
+        def _load():
+            # Least recently used first, so the local LRU order follows the shared one.
+            entry_ids = self.redis_client.zrange(self._lru_key, 0, -1)
+            if not entry_ids:
+                return
+            payloads = self.redis_client.hmget(self._entries_key, entry_ids)
+            expired = []
+            for entry_id, raw in zip(entry_ids, payloads):
+                data = json.loads(raw) if raw else None
+                if not data or now - data["created_at"] > self.ttl_seconds or data.get("version") != version:
+                    expired.append(entry_id)
+                elif entry_id not in self._entries:
+                    self._put(entry_id, data["text"], data["reply"], data["created_at"], version)
+            if expired:
+                pipeline = self.redis_client.pipeline()
+                pipeline.zrem(self._lru_key, *expired)
+                pipeline.hdel(self._entries_key, *expired)
+                pipeline.execute()
+
+        self._try_redis(_load)
+
+    def _try_redis(self, operation) -> None:
+        if not self.redis_client:
+            return
+        try:
+            operation()
+        except Exception as e:
+            logger.error("ResponseCache: Redis error: %s", e)
+
+
+# Global instances, by tenant
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the ResponseCache of the current tenant."""
+    tenant = current_tenant()
+    cache = _caches.get(tenant.id)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(tenant.id)
+            if cache is None:
+                cache = _caches[tenant.id] = ResponseCache(key_prefix=tenant.key_prefix)
+    return cache
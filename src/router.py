@@ -0,0 +1,141 @@
+"""
+Per-turn model routing.
+Picks, from cheap local features of the message, how a turn is answered:
+
+    template  canned reply, no model call (greeting on a new conversation, thanks, FAQ intents
+              from src/faq.py)
+    small     AGENT_SMALL_MODEL with the usual prompt and tools (short, simple turns)
+    full      AGENT_MODEL (lead data, catalog models, financing, long or multi-question turns)
+
+Every decision is logged as one JSON line prefixed with [ROUTER] (features, route, reason and
+the normalized text with digits masked) so routing quality can be evaluated offline.
+"""
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from src.catalog import get_catalog
+from src.config import ENABLE_FAQ_REPLIES, ROUTER_SMALL_MAX_WORDS
+from src.faq import faq_entry, match_intents
+from src.metrics import ROUTER_DECISIONS_TOTAL
+from src.prompts import THANKS_REPLY
+from src.tenants import current_tenant
+from src.text import CPF_PATTERN, PHONE_PATTERN, normalize_text
+
+logger = logging.getLogger(__name__)
+
+ROUTE_TEMPLATE = "template"
+ROUTE_SMALL = "small"
+ROUTE_FULL = "full"
+
+_BIRTHDATE = re.compile(r"\d{1,2}/\d{1,2}/\d{2,4}")
+_WORD = re.compile(r"[a-z0-9]+")
+_DIGIT = re.compile(r"\d")
+
+QUESTION_WORDS = frozenset(
+    {"quanto", "quantos", "qual", "quais", "como", "onde", "quando", "porque", "pq", "cade", "tem", "voces", "vcs"}
+)
+COMPLEX_KEYWORDS = frozenset(
+    {
+        "financiamento", "financia", "financiam", "financiar", "parcela", "parcelas", "parcelado", "parcelar",
+        "simular", "simulacao", "entrada", "cnh", "consorcio", "troca", "usada", "garantia", "cpf",
+    }
+)
+GREETING_WORDS = frozenset(
+    {"oi", "oii", "oie", "ola", "opa", "eae", "eai", "salve", "bom", "boa", "dia", "tarde", "noite", "tudo", "bem",
+     "hello", "hi"}
+)
+THANKS_WORDS = frozenset({"obrigado", "obrigada", "obg", "brigado", "brigada", "valeu", "vlw", "agradeco", "tmj"})
+# Words that may accompany a thanks ("ok, muito obrigado pela ajuda")
+ACK_WORDS = frozenset(
+    {"ok", "okay", "blz", "beleza", "show", "top", "certo", "entendi", "perfeito", "otimo", "massa", "muito", "mto",
+     "pela", "ajuda", "e", "de", "nada", "entao"}
+)
+
+
+@dataclass
+class RouteDecision:
+    route: str
+    reason: str
+    features: dict = field(default_factory=dict)
+    reply: Optional[str] = None  # canned text for ROUTE_TEMPLATE
+
+
+def extract_features(text: str) -> dict:
+    """Cheap, model-free features of one (possibly combined) user message."""
+    normalized = normalize_text(text)
+    words = _WORD.findall(normalized)
+    word_set = set(words)
+    return {
+        "chars": len(normalized),
+        "words": len(words),
+        "questions": normalized.count("?"),
+        "question_words": len(word_set & QUESTION_WORDS),
+        "complex_keywords": sorted(word_set & COMPLEX_KEYWORDS),
+        "models": get_catalog().mentioned(normalized),
+        "faq_intents": list(match_intents(normalized)),
+        "has_cpf": bool(CPF_PATTERN.search(text or "")),
+        "has_phone": bool(PHONE_PATTERN.search(text or "")),
+        "has_birthdate": bool(_BIRTHDATE.search(text or "")),
+        "greeting_only": bool(words) and word_set <= GREETING_WORDS,
+        "thanks_only": bool(word_set & THANKS_WORDS) and word_set <= THANKS_WORDS | ACK_WORDS,
+    }
+
+
+def has_lead_data(features: dict) -> bool:
+    return features["has_cpf"] or features["has_phone"] or features["has_birthdate"]
+
+
+def _decide(features: dict, is_first_turn: Callable[[], bool]) -> RouteDecision:
+    if has_lead_data(features):
+        return RouteDecision(ROUTE_FULL, "lead_data", features)
+    if features["thanks_only"] and not features["questions"]:
+        return RouteDecision(ROUTE_TEMPLATE, "thanks", features, THANKS_REPLY)
+    if features["greeting_only"] and not features["questions"]:
+        # The welcome menu is sent once per conversation; a repeated greeting goes to the small model.
+        if is_first_turn():
+            return RouteDecision(ROUTE_TEMPLATE, "welcome", features, current_tenant().section("Menu Inicial"))
+        return RouteDecision(ROUTE_SMALL, "greeting", features)
+    if (
+        ENABLE_FAQ_REPLIES
+        and len(features["faq_intents"]) == 1
+        and not features["models"]
+        and features["words"] <= ROUTER_SMALL_MAX_WORDS
+    ):
+        entry = faq_entry(features["faq_intents"][0])
+        if not entry.first_turn_only or is_first_turn():
+            return RouteDecision(ROUTE_TEMPLATE, f"faq_{entry.intent}", features, entry.reply)
+    if features["models"]:
+        return RouteDecision(ROUTE_FULL, "catalog_model", features)
+    if features["complex_keywords"]:
+        return RouteDecision(ROUTE_FULL, "complex_keyword", features)
+    if features["words"] > ROUTER_SMALL_MAX_WORDS or features["questions"] > 1:
+        return RouteDecision(ROUTE_FULL, "long", features)
+    return RouteDecision(ROUTE_SMALL, "simple", features)
+
+
+def route_message(text: str, is_first_turn: Callable[[], bool], sender_id: str = "") -> RouteDecision:
+    """
+    Decide how to answer `text`. `is_first_turn` is only called for greetings and
+    first-turn-only FAQ intents (it usually reads the session from Redis).
+    """
+    decision = _decide(extract_features(text), is_first_turn)
+    ROUTER_DECISIONS_TOTAL.labels(route=decision.route, reason=decision.reason).inc()
+    log_decision(decision, text, sender_id)
+    return decision
+
+
+def log_decision(decision: RouteDecision, text: str, sender_id: str = "") -> None:
+    record = {
+        "ts": round(time.time(), 3),
+        "sender": sender_id[-6:],
+        "route": decision.route,
+        "reason": decision.reason,
+        "features": decision.features,
+        "text": _DIGIT.sub("#", normalize_text(text))[:300],  # digits masked: no CPF/phone in logs
+    }
+    logger.info("[ROUTER] %s", json.dumps(record, ensure_ascii=False))
+
@@ -0,0 +1,190 @@
+"""
+Compact storage for the agent sessions (Agno's RedisDb layout with smaller values and fewer round trips).
+
+RedisDb keeps one key per session (`{prefix}:sessions:{id}`) and one per run (`{prefix}:runs:{run_id}`),
+listed in the sorted set `{prefix}:runs:by_session:{id}`: a turn appends its own run and never
+rewrites the earlier ones. CompactRedisDb keeps that layout and changes what goes into it:
+
+    values          compact JSON compressed with zlib and a preset dictionary: the tenant prompt
+                    and scripted replies (the texts the agent repeats) plus the field names of a stored run
+    system message  dropped from stored runs; it is the same in every run (about 6 KB) and
+                    history replay skips it anyway
+    field indexes   not written: nothing looks sessions or runs up by agent or status, and
+                    RedisDb's index sets never expire
+    reads           the runs of a session come back in one MGET instead of one GET per run
+
+Values are framed as `VALUE_MAGIC + dictionary id + zlib stream`; plain JSON written by RedisDb is
+still read, so switching needs no migration. A value compressed with a dictionary this process does
+not know (the prompt changed since it was written) reads as missing, like an expired session.
+"""
+import hashlib
+import json
+import logging
+import zlib
+from typing import Any, Dict, List, Optional, Union
+
+from agno.db.redis import RedisDb
+from agno.db.redis.utils import CustomEncoder, generate_redis_key
+from agno.db.utils import build_single_run_row
+
+from src.config import AGENT_MODEL
+from src.metrics import SESSION_VALUE_BYTES
+from src.redis_client import get_redis_bytes
+
+logger = logging.getLogger(__name__)
+
+VALUE_MAGIC = b"\x01"
+DICTIONARY_ID_BYTES = 4
+COMPRESSION_LEVEL = 6
+ZDICT_MAX_BYTES = 32 * 1024  # zlib only uses the last 32 KB of a preset dictionary
+
+# Field names and fixed values of a stored run, in serialization order. zlib favours the end of
+# the dictionary, so these go after the prompt.
+_RECORD_SKELETON = json.dumps(
+    {
+        "run_id": "", "session_id": "", "run_type": "agent", "agent_id": "", "team_id": None,
+        "workflow_id": None, "user_id": None, "parent_run_id": None, "status": "COMPLETED", "run_index": 0,
+        "run_data": {
+            "run_id": "", "agent_id": "", "session_id": "", "content": "", "content_type": "str",
+            "model_provider_data": {"id": "chatcmpl-"}, "model": AGENT_MODEL, "model_provider": "OpenAI",
+            "session_state": {}, "created_at": 0, "status": "COMPLETED",
+            "metrics": {
+                "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cache_read_tokens": 0,
+                "time_to_first_token": 0.0, "duration": 0.0,
+                "details": {"model": [{"input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                                       "cache_read_tokens": 0, "id": AGENT_MODEL, "provider": "OpenAI Chat"}]},
+            },
+            "messages": [{"id": "", "content": "", "from_history": False, "stop_after_tool_call": False,
+                          "role": "user", "created_at": 0}],
+        },
+        "created_at": 0, "updated_at": 0,
+    },
+    separators=(",", ":"),
+)
+
+# Dictionaries by id, shared by every CompactRedisDb of the process (a tenant's values are only
+# written by its own db, but any db can read them).
+_dictionaries: Dict[bytes, bytes] = {}
+
+
+def build_dictionary(prompt: str) -> bytes:
+    """Preset dictionary for a tenant: its prompt followed by the record skeleton."""
+    return (prompt + _RECORD_SKELETON).encode("utf-8")[-ZDICT_MAX_BYTES:]
+
+
+def _dictionary_id(dictionary: bytes) -> bytes:
+    return hashlib.blake2b(dictionary, digest_size=DICTIONARY_ID_BYTES).digest()
+
+
+def encode_value(data: dict, dictionary: bytes) -> bytes:
+    dictionary_id = _dictionary_id(dictionary)
+    _dictionaries.setdefault(dictionary_id, dictionary)
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), cls=CustomEncoder).encode("utf-8")
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=dictionary)
+    return VALUE_MAGIC + dictionary_id + compressor.compress(payload) + compressor.flush()
+
+
+def decode_value(raw: Union[bytes, str, None]) -> Optional[dict]:
+    """Decode a stored value (compact or plain RedisDb JSON); None when missing or unreadable."""
+    if raw is None:
+        return None
+    if isinstance(raw, str) or not raw.startswith(VALUE_MAGIC):
+        return json.loads(raw)
+    header = len(VALUE_MAGIC) + DICTIONARY_ID_BYTES
+    dictionary = _dictionaries.get(raw[len(VALUE_MAGIC):header])
+    if dictionary is None:
+        logger.warning("[SESSION] Value compressed with an unknown dictionary (prompt changed?), ignoring it")
+        return None
+    decompressor = zlib.decompressobj(zdict=dictionary)
+    return json.loads(decompressor.decompress(raw[header:]) + decompressor.flush())
+
+
+def _strip_system_messages(row: Dict[str, Any]) -> Dict[str, Any]:
+    run_data = row.get("run_data")
+    if not isinstance(run_data, dict) or not run_data.get("messages"):
+        return row
+    messages = [message for message in run_data["messages"] if message.get("role") != "system"]
+    return {**row, "run_data": {**run_data, "messages": messages}}
+
+
+class CompactRedisDb(RedisDb):
+    """RedisDb storing compressed values through a bytes client (see module docstring)."""
+
+    def __init__(self, prompt: str, redis_client=None, bytes_client=None, **kwargs):
+        super().__init__(redis_client=redis_client, **kwargs)
+        self.bytes_client = bytes_client or get_redis_bytes()
+        self.dictionary = build_dictionary(prompt)
+        _dictionaries.setdefault(_dictionary_id(self.dictionary), self.dictionary)
+
+    def _key(self, table_type: str, record_id: str) -> str:
+        return generate_redis_key(prefix=self.db_prefix, table_type=table_type, key_id=record_id)
+
+    def _store_record(
+        self, table_type: str, record_id: str, data: Dict[str, Any], index_fields: Optional[List[str]] = None
+    ) -> bool:
+        try:
+            value = encode_value(data, self.dictionary)
+            self.bytes_client.set(self._key(table_type, record_id), value, ex=self.expire)
+            SESSION_VALUE_BYTES.labels(table=table_type).observe(len(value))
+            return True
+        except Exception as e:
+            logger.error("[SESSION] Failed to store %s %s: %s", table_type, record_id[-6:], e)
+            return False
+
+    def _get_record(self, table_type: str, record_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return decode_value(self.bytes_client.get(self._key(table_type, record_id)))
+        except Exception as e:
+            logger.error("[SESSION] Failed to read %s %s: %s", table_type, record_id[-6:], e)
+            return None
+
+    def _get_all_records(self, table_type: str) -> List[Dict[str, Any]]:
+        records = []
+        for key in self.bytes_client.scan_iter(match=f"{self.db_prefix}:{table_type}:*"):
+            # Index keys (written by plain RedisDb) are sets, not records.
+            if b":index:" in key or b":by_session:" in key:
+                continue
+            record = decode_value(self.bytes_client.get(key))
+            if record:
+                records.append(record)
+        return records
+
+    def upsert_run(self, run, session_id: str, user_id: Optional[str] = None, run_index: Optional[int] = None) -> None:
+        """Same contract as RedisDb.upsert_run: one key for the run plus its entry in the session's run index."""
+        row = _strip_system_messages(
+            build_single_run_row(run=run, session_id=session_id, user_id=user_id, run_index=run_index)
+        )
+        existing = self._get_record("runs", row["run_id"])
+        if existing is not None and "run_index" in existing:
+            row["run_index"] = existing["run_index"]
+
+        value = encode_value(row, self.dictionary)
+        index_key = self._runs_by_session_index_key(session_id)
+        pipeline = self.bytes_client.pipeline()
+        pipeline.set(self._key("runs", row["run_id"]), value, ex=self.expire)
+        pipeline.zadd(index_key, {row["run_id"]: float(row.get("run_index") or 0)})
+        if self.expire is not None:
+            pipeline.expire(index_key, self.expire)
+        pipeline.execute()
+        SESSION_VALUE_BYTES.labels(table="runs").observe(len(value))
+
+    def _get_session_runs_data(self, session_id: str) -> List[Dict[str, Any]]:
+        run_ids = self.bytes_client.zrange(self._runs_by_session_index_key(session_id), 0, -1)
+        if not run_ids:
+            return []
+        values = self.bytes_client.mget([self._key("runs", run_id.decode()) for run_id in run_ids])
+        rows = (decode_value(value) for value in values)
+        return [row["run_data"] for row in rows if row and row.get("run_data") is not None]
+
+    def has_runs(self, session_id: str) -> bool:
+        """True when the session has stored turns (reads the run index only)."""
+        return self.bytes_client.zcard(self._runs_by_session_index_key(session_id)) > 0
+
+    def session_bytes(self, session_id: str) -> int:
+        """Bytes stored for a session: its record plus every run."""
+        run_ids = self.bytes_client.zrange(self._runs_by_session_index_key(session_id), 0, -1)
+        pipeline = self.bytes_client.pipeline()
+        pipeline.strlen(self._key("sessions", session_id))
+        for run_id in run_ids:
+            pipeline.strlen(self._key("runs", run_id.decode()))
+        return sum(pipeline.execute())
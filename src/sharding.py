@@ -0,0 +1,306 @@
+"""
+Sender-affine routing across workers (processes and replicas).
+
+Every live worker heartbeats into the Redis sorted set `shard:members`. The live members form a
+consistent-hash ring (SHARD_VNODES points per worker), and each conversation (tenant + sender) is
+owned by one of them. A webhook that lands on another worker is forwarded to the owner's inbox
+list `shard:inbox:{worker}`, which the owner consumes and handles as if it had received it. So
+the messages of one conversation are buffered, ordered and answered in a single process, and the
+owner can keep per-conversation state in memory:
+
+    history      whether the session already has history (otherwise a full session read from Redis
+                 on every greeting/FAQ/cache decision)
+    agent        the conversation's Agno agent, built with `cache_session=True`, so the next turn
+                 runs on the session held in memory instead of reloading it (at most
+                 SHARD_SESSION_CACHE_SIZE conversations, least recently used first out)
+
+An agent is checked out for a turn (`take_agent`) and checked back in once the turn is stored
+(`return_agent`); if another turn of the same conversation ran meanwhile, or the turn failed, it is
+dropped and the next turn reads the session from Redis again.
+
+Ownership changes:
+
+    scale-up     the new worker appears in the set; peers rebuild the ring on their next heartbeat
+                 and only the conversations on its arc move (about 1/N of them)
+    shutdown     on drain the worker leaves the set first and re-forwards what is left in its inbox
+    crash        a peer that finds its heartbeat older than SHARD_MEMBER_TTL_SECONDS removes it
+                 and re-forwards its inbox
+
+While peers disagree about the ring (one heartbeat at most), two workers may both handle a
+conversation: the processing lock (src/conversation_state.py) still serializes them, and
+in-memory state is only a positive cache that a cold owner rebuilds from Redis. A ring change drops
+the state of the conversations that moved away, so a conversation that comes back starts cold.
+"""
+import asyncio
+import bisect
+import collections
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from src.config import (
+    SHARD_HEARTBEAT_SECONDS,
+    SHARD_MEMBER_TTL_SECONDS,
+    SHARD_SESSION_CACHE_SIZE,
+    SHARD_VNODES,
+)
+from src.lifecycle import get_lifecycle
+from src.metrics import SHARD_FORWARDS_TOTAL, SHARD_MEMBERS
+from src.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SHARD_MEMBERS_KEY = "shard:members"  # sorted set: worker id -> last heartbeat
+SHARD_INBOX_PREFIX = "shard:inbox:"  # list per worker: forwarded messages (JSON)
+INBOX_POLL_SECONDS = 1.0
+HISTORY_TTL_SECONDS = 300  # the agent session expires this long after its last turn
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes."""
+
+    def __init__(self, members: Iterable[str] = (), vnodes: int = SHARD_VNODES):
+        self.members: FrozenSet[str] = frozenset(members)
+        points = sorted((_hash(f"{member}#{index}"), member) for member in self.members for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ShardRouter:
+    """Membership, ring and inbox of this worker, plus the in-memory state of the conversations it owns."""
+
+    def __init__(
+        self,
+        redis_client=None,
+        worker_id: Optional[str] = None,
+        member_ttl: float = SHARD_MEMBER_TTL_SECONDS,
+        vnodes: int = SHARD_VNODES,
+        session_cache_size: int = SHARD_SESSION_CACHE_SIZE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.redis_client = redis_client or get_redis()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.member_ttl = member_ttl
+        self.vnodes = vnodes
+        self._clock = clock
+        self.ring = HashRing((self.worker_id,), vnodes)
+        self.session_cache_size = session_cache_size
+        self._history: Dict[str, float] = {}  # conversation key -> until when "has history" is known
+        self._agents: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()  # key -> (until, agent)
+        self._taken: Dict[str, int] = {}  # conversation key -> turns running on a checked-out agent
+        self._overlapped: Set[str] = set()  # keys whose checked-out agents missed another turn
+        self._lock = threading.Lock()
+        self._handle: Optional[Callable[[dict], None]] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._consumer_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    # ------------------------------------------------------------------ #
+    # Membership (worker thread)                                           #
+    # ------------------------------------------------------------------ #
+
+    def heartbeat(self) -> None:
+        """Refresh this worker's entry, evict dead peers and rebuild the ring when membership changed."""
+        now = self._clock()
+        pipeline = self.redis_client.pipeline()
+        pipeline.zadd(SHARD_MEMBERS_KEY, {self.worker_id: now})
+        pipeline.zrangebyscore(SHARD_MEMBERS_KEY, now - self.member_ttl, "+inf")
+        pipeline.zrangebyscore(SHARD_MEMBERS_KEY, "-inf", f"({now - self.member_ttl}")
+        _, live, dead = pipeline.execute()
+        self._set_members(live)
+        for worker_id in dead:
+            # Only the peer whose ZREM succeeds takes over the inbox.
+            if self.redis_client.zrem(SHARD_MEMBERS_KEY, worker_id):
+                logger.warning("[SHARD] Worker %s missed its heartbeats; re-routing its inbox", worker_id)
+                self._reroute_inbox(worker_id)
+
+    def leave(self) -> List[dict]:
+        """
+        Leave the ring and hand what is left in the inbox to the new owners.
+        Returns the messages nobody else can take (this was the last worker): the caller handles them.
+        """
+        self.redis_client.zrem(SHARD_MEMBERS_KEY, self.worker_id)
+        live = self.redis_client.zrangebyscore(SHARD_MEMBERS_KEY, self._clock() - self.member_ttl, "+inf")
+        self._set_members(live)
+        leftover = []
+        moved = self._reroute_inbox(self.worker_id, leftover)
+        logger.info("[SHARD] Worker %s left the ring (%d queued message(s) re-routed)", self.worker_id, moved)
+        return leftover
+
+    def _set_members(self, members: Iterable[str]) -> None:
+        members = frozenset(members)
+        if members == self.ring.members:
+            return
+        self.ring = HashRing(members, self.vnodes)
+        SHARD_MEMBERS.set(len(members))
+        logger.info("[SHARD] Ring changed: %d worker(s)", len(members))
+        now = self._clock()
+        with self._lock:
+            # Conversations that moved away (or whose state expired) are someone else's now.
+            self._history = {
+                key: until for key, until in self._history.items() if until > now and self.is_local(key)
+            }
+            self._agents = collections.OrderedDict(
+                (key, cached) for key, cached in self._agents.items() if cached[0] > now and self.is_local(key)
+            )
+
+    def _reroute_inbox(self, worker_id: str, leftover: Optional[List[dict]] = None) -> int:
+        """Move the inbox of `worker_id` (no longer in the ring) to the current owners."""
+        inbox = f"{SHARD_INBOX_PREFIX}{worker_id}"
+        moved = 0
+        while True:
+            raw = self.redis_client.lpop(inbox)
+            if raw is None:
+                return moved
+            item = json.loads(raw)
+            owner = self.ring.owner(item["key"])
+            if owner is None:
+                leftover.append(item)
+                continue
+            self.redis_client.rpush(f"{SHARD_INBOX_PREFIX}{owner}", raw)
+            moved += 1
+
+    # ------------------------------------------------------------------ #
+    # Routing                                                              #
+    # ------------------------------------------------------------------ #
+
+    def owner(self, key: str) -> str:
+        return self.ring.owner(key) or self.worker_id
+
+    def is_local(self, key: str) -> bool:
+        return self.owner(key) == self.worker_id
+
+    def route(self, key: str, item: dict) -> bool:
+        """Forward `item` to the owner of conversation `key`. False when this worker owns it."""
+        owner = self.owner(key)
+        if owner == self.worker_id:
+            return False
+        self.redis_client.rpush(f"{SHARD_INBOX_PREFIX}{owner}", json.dumps({**item, "key": key}, ensure_ascii=False))
+        SHARD_FORWARDS_TOTAL.inc()
+        return True
+
+    def poll(self, timeout: float = INBOX_POLL_SECONDS) -> Optional[dict]:
+        """Next message forwarded to this worker (blocks up to `timeout` seconds)."""
+        popped = self.redis_client.blpop(f"{SHARD_INBOX_PREFIX}{self.worker_id}", timeout=timeout)
+        return json.loads(popped[1]) if popped else None
+
+    # ------------------------------------------------------------------ #
+    # Per-conversation state                                               #
+    # ------------------------------------------------------------------ #
+
+    def knows_history(self, key: str) -> bool:
+        """True when this worker saw a turn of conversation `key` recently enough for its session to exist."""
+        with self._lock:
+            return self._history.get(key, 0.0) > self._clock()
+
+    def remember_turn(self, key: str) -> None:
+        """A turn was stored in the session of `key` (its TTL restarts)."""
+        with self._lock:
+            self._history[key] = self._clock() + HISTORY_TTL_SECONDS
+
+    def take_agent(self, key: str) -> Optional[Any]:
+        """Check out the agent kept for conversation `key` (None when there is none); pair with return_agent."""
+        with self._lock:
+            self._taken[key] = self._taken.get(key, 0) + 1
+            if self._taken[key] > 1:
+                self._overlapped.add(key)
+            cached = self._agents.pop(key, None)
+        if cached is None or cached[0] <= self._clock():
+            return None
+        return cached[1]
+
+    def return_agent(self, key: str, agent: Optional[Any]) -> None:
+        """
+        End a turn of conversation `key`. `agent` (None when the turn failed) is kept for the next turn,
+        unless another turn of the conversation overlapped this one (its session would miss that turn).
+        """
+        with self._lock:
+            self._taken[key] -= 1
+            keep = agent is not None and key not in self._overlapped
+            if not self._taken[key]:
+                del self._taken[key]
+                self._overlapped.discard(key)
+            if not keep:
+                self._agents.pop(key, None)
+                return
+            self._agents[key] = (self._clock() + HISTORY_TTL_SECONDS, agent)
+            while len(self._agents) > self.session_cache_size:
+                self._agents.popitem(last=False)
+
+    # ------------------------------------------------------------------ #
+    # Background loops                                                     #
+    # ------------------------------------------------------------------ #
+
+    async def start(self, handle: Callable[[dict], None]) -> None:
+        """Join the ring and consume the inbox with `handle` (called on the event loop)."""
+        await asyncio.to_thread(self.heartbeat)
+        logger.info("[SHARD] Worker %s joined the ring (%d worker(s))", self.worker_id, len(self.ring.members))
+        self._handle = handle
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        self._consumer_task = asyncio.create_task(self._consume())
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(SHARD_HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(self.heartbeat)
+            except Exception as e:
+                logger.error("[SHARD] Heartbeat failed: %s", e)
+
+    async def _consume(self) -> None:
+        lifecycle = get_lifecycle()
+        while not self._stopping and not lifecycle.draining:
+            try:
+                item = await asyncio.to_thread(self.poll)
+            except Exception as e:
+                logger.error("[SHARD] Inbox poll failed: %s", e)
+                await lifecycle.sleep(INBOX_POLL_SECONDS)
+                continue
+            if item is not None:
+                self._handle(item)
+
+    async def stop(self) -> None:
+        """Stop consuming, leave the ring and handle locally what no other worker can take."""
+        if self._heartbeat_task is None:
+            return
+        self._stopping = True
+        self._heartbeat_task.cancel()
+        # The consumer is not cancelled (a BLPOP in flight would lose the message it pops);
+        # it notices the flag within one poll.
+        await asyncio.gather(self._heartbeat_task, self._consumer_task, return_exceptions=True)
+        self._heartbeat_task = self._consumer_task = None
+        try:
+            leftover = await asyncio.to_thread(self.leave)
+        except Exception as e:
+            logger.error("[SHARD] Failed to leave the ring: %s", e)
+            return
+        for item in leftover:
+            self._handle(item)
+
+
+# Global instance
+_router: Optional[ShardRouter] = None
+
+
+def get_shard_router() -> ShardRouter:
+    """Get or create global ShardRouter instance."""
+    global _router
+    if _router is None:
+        _router = ShardRouter()
+    return _router
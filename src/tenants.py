@@ -0,0 +1,195 @@
+"""
+Tenants: the Instagram accounts (store pages) served by this deployment.
+
+Each webhook entry carries the id of the page it belongs to (`entry.id`). The registry maps it to
+a Tenant with that page's access token, prompt, catalog file and NocoDB table, and the webhook runs
+the whole conversation inside `use_tenant(tenant)`. Everything below reads `current_tenant()`
+instead of a global setting, so one process serves every page with shared Redis pools, agent
+storage and model clients:
+
+    Graph API sends / media downloads    tenant access token
+    agent system message                 tenant prompt, up to "## 🔷 Exemplos de Interação"
+    buscar_roteiro, canned replies       tenant prompt, from that heading on (same section headings
+                                         as src/prompts.py)
+    buscar_modelos, menu option 1        tenant catalog
+    add_lead_to_nocodb                   tenant NocoDB table
+    Redis keys                           `tenant.key(...)`: "t:{id}:" prefix
+
+Tenants are listed in TENANTS_PATH (JSON, read once at startup):
+
+    {"tenants": [{"id": "17841400000000000", "nome": "Shineray Rosário",
+                  "access_token_env": "INSTAGRAM_TOKEN_ROSARIO", "prompt_path": "prompts/rosario.md",
+                  "catalog_path": "catalogs/rosario.json", "nocodb_table_url": "https://..."}]}
+
+Unset fields fall back to the single-account settings (INSTAGRAM_ACCESS_TOKEN, SYSTEM_PROMPT and
+SCRIPTED_REPLIES, CATALOG_PATH, NOCODB_TABLE_URL). Those settings also form the default tenant, used for entries of
+unknown pages and outside any webhook; its Redis keys have no prefix, so a single-account
+deployment keeps its existing data.
+"""
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+from src.config import (
+    AGENT_MODEL,
+    AGENT_NAME,
+    AGENT_PROMPT_CACHE_KEY,
+    CATALOG_PATH,
+    INSTAGRAM_ACCESS_TOKEN,
+    NOCODB_TABLE_URL,
+    TENANTS_PATH,
+)
+from src.prompts import SCRIPTED_REPLIES, SYSTEM_PROMPT, prompt_section, split_prompt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT_ID = ""
+TENANT_KEY_PREFIX = "t:"
+
+
+@functools.lru_cache(maxsize=512)
+def _section(prompt: str, title: str) -> str:
+    return prompt_section(title, prompt)
+
+
+@functools.lru_cache(maxsize=128)
+def _prompt_cache_key(static_system_message: str, tool_names: Tuple[str, ...]) -> str:
+    fingerprint = "|".join([AGENT_MODEL, static_system_message, *tool_names])
+    return f"{AGENT_NAME}-{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]}"
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    name: str
+    access_token: str
+    system_prompt: str
+    scripted_replies: str
+    catalog_path: str
+    nocodb_table_url: str
+
+    @property
+    def key_prefix(self) -> str:
+        return f"{TENANT_KEY_PREFIX}{self.id}:" if self.id else ""
+
+    def key(self, key: str) -> str:
+        """Redis key in this tenant's namespace."""
+        return f"{self.key_prefix}{key}"
+
+    def section(self, title: str) -> str:
+        """Scripted answer under `**{title}:**` in this tenant's scripts (see src.prompts.prompt_section)."""
+        return _section(self.scripted_replies, title)
+
+    @functools.cached_property
+    def static_system_message(self) -> str:
+        # Same layout Agno uses for description + instructions, without per-run content
+        # (datetime, session state, memories), so the provider can cache it.
+        return f"{AGENT_NAME}\n<instructions>\n{self.system_prompt.strip()}\n</instructions>\n"
+
+    def prompt_cache_key(self, tool_names: Tuple[str, ...]) -> str:
+        """Stable routing key so every conversation of this tenant lands on the same cached prefix."""
+        if AGENT_PROMPT_CACHE_KEY and not self.id:
+            return AGENT_PROMPT_CACHE_KEY
+        return _prompt_cache_key(self.static_system_message, tool_names)
+
+
+DEFAULT_TENANT = Tenant(
+    id=DEFAULT_TENANT_ID,
+    name=AGENT_NAME,
+    access_token=INSTAGRAM_ACCESS_TOKEN,
+    system_prompt=SYSTEM_PROMPT,
+    scripted_replies=SCRIPTED_REPLIES,
+    catalog_path=CATALOG_PATH,
+    nocodb_table_url=NOCODB_TABLE_URL,
+)
+
+_current: contextvars.ContextVar[Tenant] = contextvars.ContextVar("tenant", default=DEFAULT_TENANT)
+
+
+def current_tenant() -> Tenant:
+    """Tenant of the conversation being handled (the default tenant outside a webhook)."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def use_tenant(tenant: Tenant) -> Iterator[Tenant]:
+    """
+    Make `tenant` current. Tasks created and `asyncio.to_thread` calls made inside the block
+    copy the context, so background work started here keeps the tenant.
+    """
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def _read_text(path: str, base_dir: str) -> str:
+    with open(os.path.join(base_dir, path), encoding="utf-8") as handle:
+        return handle.read()
+
+
+def _tenant_from_dict(item: dict, base_dir: str) -> Tenant:
+    token = item.get("access_token") or os.getenv(item.get("access_token_env", ""), "")
+    if item.get("prompt_path"):
+        prompt, scripts = split_prompt(_read_text(item["prompt_path"], base_dir))
+    else:
+        prompt, scripts = SYSTEM_PROMPT, SCRIPTED_REPLIES
+    catalog_path = os.path.join(base_dir, item["catalog_path"]) if item.get("catalog_path") else CATALOG_PATH
+    return Tenant(
+        id=str(item["id"]),
+        name=item.get("nome") or str(item["id"]),
+        access_token=token.strip(),
+        system_prompt=prompt,
+        scripted_replies=scripts,
+        catalog_path=catalog_path,
+        nocodb_table_url=item.get("nocodb_table_url") or NOCODB_TABLE_URL,
+    )
+
+
+class TenantRegistry:
+    """Tenants by Instagram account id, loaded once from TENANTS_PATH."""
+
+    def __init__(self, path: str = TENANTS_PATH):
+        self._tenants: Dict[str, Tenant] = {}
+        if not path:
+            return
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        for item in data.get("tenants", ()):
+            tenant = _tenant_from_dict(item, base_dir)
+            if not tenant.access_token:
+                logger.warning("[TENANT] %s (%s) has no access token - messages will not be sent", tenant.name, tenant.id)
+            self._tenants[tenant.id] = tenant
+        logger.info("[TENANT] Loaded %d tenant(s) from %s", len(self._tenants), path)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def resolve(self, account_id: str) -> Tenant:
+        """Tenant of a webhook entry (`entry.id`); the default tenant when the page is not listed."""
+        tenant = self._tenants.get(account_id)
+        if tenant is None:
+            if self._tenants and account_id:
+                logger.warning("[TENANT] Unknown account %s, using the default tenant", account_id)
+            return DEFAULT_TENANT
+        return tenant
+
+
+# Global instance
+_registry: Optional[TenantRegistry] = None
+
+
+def get_tenant_registry() -> TenantRegistry:
+    """Get or create global TenantRegistry instance."""
+    global _registry
+    if _registry is None:
+        _registry = TenantRegistry()
+    return _registry
@@ -0,0 +1,20 @@
+"""Text normalization shared by the router, FAQ, catalog and response cache (and PII patterns)."""
+import re
+import unicodedata
+
+CPF_PATTERN = re.compile(r"\d{3}\.?\d{3}\.?\d{3}-?\d{2}")
+PHONE_PATTERN = re.compile(r"\(?\d{2}\)?\s*9?\d{4}[-\s]?\d{4}")
+# Whole numbers only, so longer ids (Instagram accounts, tokens) are left alone
+_PII = re.compile(rf"(?<!\d)(?:(?P<cpf>{CPF_PATTERN.pattern})|{PHONE_PATTERN.pattern})(?!\d)")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def redact_pii(text: str) -> str:
+    """Mask CPFs and phone numbers (for logs)."""
+    return _PII.sub(lambda match: "[cpf]" if match.group("cpf") else "[telefone]", text)
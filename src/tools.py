@@ -1,9 +1,10 @@
-import os
-import requests
 import logging
 from pydantic import ValidationError
+from src.catalog import format_listing, format_models, get_catalog
 from src.models import LeadModel
-from src.config import NOCODB_API_TOKEN, NOCODB_TABLE_URL
+from src.config import NOCODB_API_TOKEN
+from src.lead_sink import LEAD_DUPLICATE, LEAD_QUEUED, LeadRejectedError, get_lead_sink
+from src.tenants import current_tenant
 
 logger = logging.getLogger(__name__)
 
@@ -47,15 +48,11 @@ def add_lead_to_nocodb(nome: str, cpf: str, telefone: str, modelo_interesse: str
         logger.warning("[TOOL] Validation error: %s", error_msg)
         return f"ERRO: {error_msg}"
 
-    if not NOCODB_API_TOKEN or not NOCODB_TABLE_URL:
+    table_url = current_tenant().nocodb_table_url
+    if not NOCODB_API_TOKEN or not table_url:
         logger.info("[TOOL] NocoDB not configured, returning local simulation")
         return "SUCESSO (Simulação Local): Lead adicionado no NocoDB."
 
-    headers = {
-        "xc-token": NOCODB_API_TOKEN,
-        "Content-Type": "application/json"
-    }
-
     payload = {
         "Nome": lead.nome,
         "CPF": lead.cpf,
@@ -66,19 +63,75 @@ def add_lead_to_nocodb(nome: str, cpf: str, telefone: str, modelo_interesse: str
     }
 
     try:
-        response = requests.post(NOCODB_TABLE_URL, headers=headers, json=payload, timeout=10)
-        if response.status_code in (200, 201):
-            logger.info("[TOOL] Lead successfully saved to NocoDB: %s", nome)
-            return "SUCESSO: Lead adicionado no NocoDB."
-        else:
-            error_msg = f"ERRO ao adicionar no NocoDB: {response.status_code} - {response.text}"
-            logger.error("[TOOL] %s", error_msg)
-            return error_msg
-    except requests.Timeout:
-        error_msg = "ERRO: Timeout ao conectar com NocoDB"
+        outcome = get_lead_sink().submit(payload, lead.cpf, lead.telefone, table_url)
+    except LeadRejectedError as e:
+        error_msg = f"ERRO ao adicionar no NocoDB: {e}"
         logger.error("[TOOL] %s", error_msg)
         return error_msg
     except Exception as e:
         error_msg = f"ERRO na requisição para NocoDB: {str(e)}"
         logger.error("[TOOL] %s", error_msg, exc_info=True)
         return error_msg
+
+    if outcome == LEAD_DUPLICATE:
+        logger.info("[TOOL] Lead already registered: %s", nome)
+        return "SUCESSO: Lead já registrado anteriormente no NocoDB. Não é necessário registrar novamente."
+    if outcome == LEAD_QUEUED:
+        logger.info("[TOOL] Lead queued for NocoDB: %s", nome)
+        return "SUCESSO: Dados do lead recebidos; o registro no NocoDB será concluído em instantes."
+    logger.info("[TOOL] Lead successfully saved to NocoDB: %s", nome)
+    return "SUCESSO: Lead adicionado no NocoDB."
+
+
+def buscar_modelos(consulta: str = "") -> str:
+    """
+    Consulta o catálogo de modelos da loja com os preços atualizados (à vista).
+    Use sempre que o cliente pedir a lista de modelos (opção 1) ou perguntar sobre um modelo, preço ou categoria.
+    Nunca informe um preço que não tenha vindo desta ferramenta.
+
+    Args:
+        consulta (str): Nome ou parte do nome do modelo (ex.: "jet 50", "shi efi"), ou uma categoria
+            ("elétricas", "combustão", "carro"). Vazio para a lista completa.
+
+    Returns:
+        str: Modelos encontrados com preço, um por linha, ou a indicação de que nada foi encontrado.
+    """
+    logger.info("[TOOL] buscar_modelos called: consulta=%s", consulta[:80])
+    catalog = get_catalog()
+    category = catalog.find_category(consulta) if consulta.strip() else None
+    if not consulta.strip() or category:
+        return format_listing(catalog, category)
+
+    models = catalog.search(consulta)
+    if not models:
+        return f"Nenhum modelo encontrado para '{consulta}'. Modelos disponíveis: " + ", ".join(
+            model.name for model in catalog.models
+        )
+    return "\n".join(format_models(models))
+
+
+def buscar_roteiro(opcao: str = "menu") -> str:
+    """
+    Texto pronto da loja para enviar ao cliente exatamente como retornado (sem mudar nomes, preços, links, endereço ou horário).
+
+    Args:
+        opcao (str): "boas-vindas" (primeira mensagem), "1" a "5" (opção do menu escolhida pelo cliente),
+            "whatsapp" (link para simular com o consultor, depois de salvar o lead) ou "menu" (só as opções).
+
+    Returns:
+        str: O texto pronto, ou as opções válidas quando `opcao` não é uma delas.
+    """
+    from src.menu import menu_reply, option_reply
+
+    logger.info("[TOOL] buscar_roteiro called: opcao=%s", opcao[:20])
+    opcao = opcao.strip().lower()
+    tenant = current_tenant()
+    if opcao == "boas-vindas":
+        return tenant.section("Menu Inicial")
+    if opcao == "whatsapp":
+        return tenant.section("Opção 3 – Simular")
+    if opcao in ("1", "2", "3", "4", "5"):
+        return option_reply(opcao)
+    if opcao == "menu":
+        return menu_reply()
+    return f"Opção '{opcao}' não existe. Use: boas-vindas, 1, 2, 3, 4, 5, whatsapp ou menu."
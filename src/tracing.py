@@ -0,0 +1,154 @@
+"""
+Per-conversation tracing.
+OpenTelemetry spans from webhook ingest through buffering, agent run and Graph sends,
+exported to an in-process ring buffer (served at /traces/recent) or to an OTLP collector.
+"""
+import collections
+import functools
+import hashlib
+import inspect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor, SpanExporter, SpanExportResult
+
+from src.config import TRACING_EXPORTER, TRACING_MAX_SPANS
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "agente-instagram"
+
+tracer = trace.get_tracer(TRACER_NAME)
+
+
+class RecentSpanExporter(SpanExporter):
+    """Keeps the most recent finished spans in memory."""
+
+    def __init__(self, max_spans: int = TRACING_MAX_SPANS):
+        self._spans: collections.deque = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        with self._lock:
+            self._spans.extend(spans)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def recent_traces(self, limit: int = 20) -> List[dict]:
+        """Group buffered spans by trace, most recent trace first."""
+        with self._lock:
+            spans: List[ReadableSpan] = list(self._spans)
+
+        traces: Dict[str, List[ReadableSpan]] = collections.OrderedDict()
+        for span in spans:
+            traces.setdefault(format(span.context.trace_id, "032x"), []).append(span)
+
+        result = []
+        for trace_id, trace_spans in reversed(traces.items()):
+            trace_spans.sort(key=lambda s: s.start_time or 0)
+            start = trace_spans[0].start_time or 0
+            end = max((s.end_time or 0) for s in trace_spans)
+            result.append({
+                "trace_id": trace_id,
+                "duration_ms": round((end - start) / 1e6, 1),
+                "spans": [_span_to_dict(s, start) for s in trace_spans],
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+
+def _span_to_dict(span: ReadableSpan, trace_start: int) -> dict:
+    return {
+        "name": span.name,
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "offset_ms": round(((span.start_time or 0) - trace_start) / 1e6, 1),
+        "duration_ms": round(((span.end_time or 0) - (span.start_time or 0)) / 1e6, 1),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+_recent_exporter: Optional[RecentSpanExporter] = None
+
+
+def configure_tracing(exporter: str = TRACING_EXPORTER) -> None:
+    """
+    Install the tracer provider. exporter: "memory" (default), "otlp" or "none".
+    OTLP uses the standard OTEL_EXPORTER_OTLP_* environment variables.
+    """
+    global _recent_exporter
+    if exporter == "none" or _recent_exporter is not None:
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACER_NAME}))
+    _recent_exporter = RecentSpanExporter()
+    provider.add_span_processor(SimpleSpanProcessor(_recent_exporter))
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    logger.info("Tracing enabled (exporter=%s)", exporter)
+
+
+def get_recent_traces(limit: int = 20) -> List[dict]:
+    if _recent_exporter is None:
+        return []
+    return _recent_exporter.recent_traces(limit)
+
+
+def sender_hash(sender_id: str) -> str:
+    """Stable, non-reversible sender identifier for span attributes."""
+    return hashlib.sha256((sender_id or "").encode("utf-8")).hexdigest()[:12]
+
+
+def capture_context():
+    """Current trace context, to hand over to background tasks."""
+    return otel_context.get_current()
+
+
+@contextmanager
+def start_span(name: str, sender_id: Optional[str] = None, parent=None, **attributes):
+    """
+    Start a span as the current span.
+
+    Args:
+        name: Span name
+        sender_id: Instagram user ID (recorded as a hash)
+        parent: Trace context captured with capture_context(), for work started in the background
+        **attributes: Extra span attributes
+    """
+    if sender_id:
+        attributes["sender.hash"] = sender_hash(sender_id)
+    with tracer.start_as_current_span(name, context=parent, attributes=attributes) as span:
+        yield span
+
+
+def traced(name: str, sender_param: Optional[str] = None):
+    """
+    Decorator: run an async function inside a span.
+    `sender_param` names the argument holding the Instagram user ID.
+    """
+    def decorator(func):
+        position = list(inspect.signature(func).parameters).index(sender_param) if sender_param else None
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            sender_id = None
+            if sender_param:
+                sender_id = kwargs.get(sender_param, args[position] if len(args) > position else None)
+            with start_span(name, sender_id):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
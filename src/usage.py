@@ -0,0 +1,209 @@
+"""
+Token accounting for agent runs.
+Stores prompt, cached and completion token counts per conversation and in aggregate
+so the cost and latency effect of provider-side prompt caching can be inspected.
+Turns answered with a canned reply (no agent run) are counted too, with the agent time and
+tokens they saved.
+"""
+import logging
+from typing import Optional
+
+from src.config import (
+    AGENT_CACHED_INPUT_PRICE_PER_MTOK,
+    AGENT_INPUT_PRICE_PER_MTOK,
+    AGENT_OUTPUT_PRICE_PER_MTOK,
+)
+from src.redis_client import get_redis
+from src.tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+USAGE_SESSION_PREFIX = "usage:session:"
+USAGE_AGGREGATE_KEY = "usage:aggregate"
+USAGE_SESSION_TTL = 7 * 24 * 3600  # keep per-conversation counters for a week
+
+_COUNTER_FIELDS = (
+    "runs",
+    "prompt_tokens",
+    "cached_tokens",
+    "completion_tokens",
+    "cache_hit_runs",
+    "duration_ms_cache_hit",
+    "duration_ms_cache_miss",
+    "first_messages_streamed",
+    "ttfm_ms_streamed",
+    "first_messages_buffered",
+    "ttfm_ms_buffered",
+    "canned_replies",
+    "faq_replies",
+    "response_cache_hits",
+    "menu_replies",
+)
+
+
+def _metric(metrics, name: str) -> int:
+    value = getattr(metrics, name, 0) if metrics is not None else 0
+    return int(value or 0)
+
+
+def _build_report(raw: dict) -> dict:
+    counters = {field: int(float(raw.get(field, 0) or 0)) for field in _COUNTER_FIELDS}
+    prompt = counters["prompt_tokens"]
+    cached = counters["cached_tokens"]
+    completion = counters["completion_tokens"]
+    hit_runs = counters["cache_hit_runs"]
+    miss_runs = counters["runs"] - hit_runs
+
+    uncached = prompt - cached
+    cost = (
+        uncached * AGENT_INPUT_PRICE_PER_MTOK
+        + cached * AGENT_CACHED_INPUT_PRICE_PER_MTOK
+        + completion * AGENT_OUTPUT_PRICE_PER_MTOK
+    ) / 1_000_000
+    cost_without_cache = (
+        prompt * AGENT_INPUT_PRICE_PER_MTOK + completion * AGENT_OUTPUT_PRICE_PER_MTOK
+    ) / 1_000_000
+
+    streamed = counters["first_messages_streamed"]
+    buffered = counters["first_messages_buffered"]
+    runs = counters["runs"]
+    turns = runs + counters["canned_replies"]
+    avg_run_ms = (counters["duration_ms_cache_hit"] + counters["duration_ms_cache_miss"]) / runs if runs else 0.0
+    avg_run_tokens = (prompt + completion) / runs if runs else 0.0
+
+    return {
+        **counters,
+        "cache_hit_ratio": round(cached / prompt, 4) if prompt else 0.0,
+        "avg_duration_ms_cache_hit": round(counters["duration_ms_cache_hit"] / hit_runs, 1) if hit_runs else None,
+        "avg_duration_ms_cache_miss": round(counters["duration_ms_cache_miss"] / miss_runs, 1) if miss_runs else None,
+        "avg_ttfm_ms_streamed": round(counters["ttfm_ms_streamed"] / streamed, 1) if streamed else None,
+        "avg_ttfm_ms_buffered": round(counters["ttfm_ms_buffered"] / buffered, 1) if buffered else None,
+        "estimated_cost_usd": round(cost, 6),
+        "estimated_savings_usd": round(cost_without_cache - cost, 6),
+        "canned_reply_ratio": round(counters["canned_replies"] / turns, 4) if turns else 0.0,
+        "faq_hit_ratio": round(counters["faq_replies"] / turns, 4) if turns else 0.0,
+        "response_cache_hit_ratio": round(counters["response_cache_hits"] / turns, 4) if turns else 0.0,
+        "menu_hit_ratio": round(counters["menu_replies"] / turns, 4) if turns else 0.0,
+        # Agent time and tokens the canned replies would have cost, at the average run
+        "estimated_latency_saved_ms": round(counters["canned_replies"] * avg_run_ms, 1),
+        "estimated_tokens_saved": round(counters["canned_replies"] * avg_run_tokens),
+    }
+
+
+class UsageTracker:
+    """Records token usage of agent runs in Redis hashes."""
+
+    def __init__(self):
+        try:
+            self.redis_client = get_redis()
+        except Exception as e:
+            logger.warning("UsageTracker: Failed to get Redis client: %s", e)
+            self.redis_client = None
+
+    def record_run(self, session_id: str, metrics) -> None:
+        """
+        Record token counts of a finished agent run.
+
+        Args:
+            session_id: Conversation (Agno session) ID
+            metrics: Agno RunMetrics of the run (may be None)
+        """
+        prompt = _metric(metrics, "input_tokens")
+        cached = _metric(metrics, "cache_read_tokens")
+        completion = _metric(metrics, "output_tokens")
+        duration_ms = int((getattr(metrics, "duration", None) or 0) * 1000)
+        cache_hit = cached > 0
+
+        logger.info(
+            "[USAGE] session=%s prompt=%d cached=%d completion=%d duration_ms=%d",
+            session_id[-6:], prompt, cached, completion, duration_ms,
+        )
+
+        if not self.redis_client:
+            return
+
+        increments = {
+            "runs": 1,
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "completion_tokens": completion,
+            "cache_hit_runs": 1 if cache_hit else 0,
+            "duration_ms_cache_hit" if cache_hit else "duration_ms_cache_miss": duration_ms,
+        }
+        self._increment(session_id, increments)
+
+    def record_first_message(self, session_id: str, seconds: float, streamed: bool) -> None:
+        """
+        Record time from start of reply generation until the first message was delivered.
+
+        Args:
+            session_id: Conversation (Agno session) ID
+            seconds: Elapsed time in seconds
+            streamed: Whether the reply was produced in streaming mode
+        """
+        if not self.redis_client:
+            return
+        mode = "streamed" if streamed else "buffered"
+        self._increment(session_id, {f"first_messages_{mode}": 1, f"ttfm_ms_{mode}": int(seconds * 1000)})
+
+    def record_canned_reply(self, session_id: str, reason: str) -> None:
+        """
+        Record a turn answered without an agent run.
+
+        Args:
+            session_id: Conversation (Agno session) ID
+            reason: Router reason ("welcome", "thanks", "faq_<intent>"), "response_cache" or a
+                menu selection ("menu", "menu_<option>")
+        """
+        if not self.redis_client:
+            return
+        self._increment(
+            session_id,
+            {
+                "canned_replies": 1,
+                "faq_replies": 1 if reason.startswith("faq_") else 0,
+                "response_cache_hits": 1 if reason == "response_cache" else 0,
+                "menu_replies": 1 if reason.startswith("menu") else 0,
+            },
+        )
+
+    def _increment(self, session_id: str, increments: dict) -> None:
+        tenant = current_tenant()
+        session_key = tenant.key(f"{USAGE_SESSION_PREFIX}{session_id}")
+        aggregate_key = tenant.key(USAGE_AGGREGATE_KEY)
+        try:
+            pipeline = self.redis_client.pipeline()
+            for field, amount in increments.items():
+                pipeline.hincrby(session_key, field, amount)
+                pipeline.hincrby(aggregate_key, field, amount)
+            pipeline.expire(session_key, USAGE_SESSION_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logger.error("Error recording usage for %s: %s", session_id[-6:], e)
+
+    def get_report(self, session_id: Optional[str] = None) -> dict:
+        """
+        Build a usage report for one conversation, or the aggregate when no session is given
+        (of the current tenant).
+        """
+        if not self.redis_client:
+            return _build_report({})
+
+        key = current_tenant().key(f"{USAGE_SESSION_PREFIX}{session_id}" if session_id else USAGE_AGGREGATE_KEY)
+        try:
+            return _build_report(self.redis_client.hgetall(key) or {})
+        except Exception as e:
+            logger.error("Error reading usage report: %s", e)
+            return _build_report({})
+
+
+# Global instance
+_tracker: Optional[UsageTracker] = None
+
+
+def get_usage_tracker() -> UsageTracker:
+    """Get or create global UsageTracker instance."""
+    global _tracker
+    if _tracker is None:
+        _tracker = UsageTracker()
+    return _tracker
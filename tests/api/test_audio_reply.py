@@ -0,0 +1,28 @@
+import os
+import time
+
+from src.api import audio_reply
+
+
+def test_a_reply_written_by_one_worker_is_served_by_any_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_reply, "AUDIO_REPLY_DIR", str(tmp_path / "audio"))
+    # another worker synthesized the reply: nothing in this process has touched the directory
+    (audio_reply.get_audio_reply_dir() / "abc.wav").write_bytes(b"RIFF")
+
+    assert audio_reply.resolve_audio_file("abc.wav") == tmp_path / "audio" / "abc.wav"
+    assert audio_reply.resolve_audio_file("missing.wav") is None
+    assert audio_reply.resolve_audio_file("../abc.wav") is None
+    assert audio_reply.resolve_audio_file("abc.mp3") is None
+
+
+def test_expired_replies_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_reply, "AUDIO_REPLY_DIR", str(tmp_path))
+    old, fresh = tmp_path / "old.wav", tmp_path / "fresh.wav"
+    old.write_bytes(b"RIFF")
+    fresh.write_bytes(b"RIFF")
+    expired = time.time() - audio_reply.AUDIO_REPLY_TTL_SECONDS - 1
+    os.utime(old, (expired, expired))
+
+    audio_reply._cleanup_expired_files()
+
+    assert not old.exists() and fresh.exists()
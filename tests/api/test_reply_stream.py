@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from agno.run.agent import RunContentEvent, RunOutput
+
+from src.api.reply_stream import ReplyChunker, split_reply, stream_agent_run
+
+
+def _feed_all(chunker, text, step=7):
+    out = []
+    for i in range(0, len(text), step):
+        out += chunker.feed(text[i:i + step])
+    return out + chunker.flush()
+
+def test_chunker_releases_first_sentence_early():
+    chunker = ReplyChunker(min_chars=20)
+    assert chunker.feed("Olá! Temos varias motos disponiveis. ") == ["Olá! Temos varias motos disponiveis."]
+
+def test_chunker_waits_for_paragraph_after_first_message():
+    chunker = ReplyChunker(min_chars=20)
+    chunker.feed("Olá! Temos varias motos disponiveis. ")
+    assert chunker.feed("Financiamento em ate 48x. ") == []
+    assert chunker.feed("Entrada facilitada.\n\nDigite menu") == ["Financiamento em ate 48x. Entrada facilitada."]
+    assert chunker.flush() == ["Digite menu"]
+
+def test_chunker_does_not_split_prices():
+    chunker = ReplyChunker(min_chars=5)
+    assert chunker.feed("JET 50s – R$ 12.999,00") == []
+
+def test_chunker_respects_instagram_limit():
+    messages = _feed_all(ReplyChunker(min_chars=80), "Frase curta aqui " * 200)
+    assert messages
+    assert all(len(message) <= 1000 for message in messages)
+
+def test_split_reply_hard_cut_without_boundaries():
+    assert [len(chunk) for chunk in split_reply("x" * 2500)] == [1000, 1000, 500]
+
+def test_split_reply_keeps_short_reply_whole():
+    assert split_reply("Oi!\n\nTudo bem?") == ["Oi!\n\nTudo bem?"]
+
+
+class _StreamingAgent:
+    def run(self, text, stream=False, yield_run_output=False):
+        yield RunContentEvent(content="Olá")
+        yield RunContentEvent(content="!")
+        yield RunOutput(content="Olá!")
+
+class _FailingAgent:
+    def run(self, text, stream=False, yield_run_output=False):
+        yield RunContentEvent(content="Olá")
+        raise RuntimeError("boom")
+
+def test_stream_agent_run_yields_deltas_then_output():
+    async def _collect():
+        return [item async for item in stream_agent_run(_StreamingAgent(), "oi")]
+
+    items = asyncio.run(_collect())
+    assert items[:2] == ["Olá", "!"]
+    assert isinstance(items[2], RunOutput)
+
+def test_stream_agent_run_propagates_errors():
+    async def _collect():
+        seen = []
+        try:
+            async for item in stream_agent_run(_FailingAgent(), "oi"):
+                seen.append(item)
+        except RuntimeError as exc:
+            return seen, str(exc)
+        return seen, None
+
+    assert asyncio.run(_collect()) == (["Olá"], "boom")
+
+
+class _StalledAgent:
+    def run(self, text, stream=False, yield_run_output=False):
+        yield RunContentEvent(content="Olá")
+        time.sleep(2)  # model call hangs
+        yield RunContentEvent(content="!")
+
+def test_stream_agent_run_honours_the_deadline_when_the_model_stalls():
+    async def _collect():
+        seen = []
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(0.3):
+                async for item in stream_agent_run(_StalledAgent(), "oi"):
+                    seen.append(item)
+        except TimeoutError:
+            return seen, time.monotonic() - started
+        return seen, None
+
+    seen, elapsed = asyncio.run(_collect())
+    assert seen == ["Olá"]
+    assert elapsed is not None and elapsed < 1.0
@@ -0,0 +1,40 @@
+import array
+import io
+import math
+import wave
+
+from src.api.voice_activity import trim_silence
+
+RATE = 16000
+
+
+def _wav(*parts) -> bytes:
+    """parts: (seconds, amplitude) of a 220 Hz tone, amplitude 0 for silence."""
+    samples = array.array("h")
+    for seconds, amplitude in parts:
+        samples.extend(int(amplitude * math.sin(2 * math.pi * 220 * i / RATE)) for i in range(int(seconds * RATE)))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def test_leading_trailing_silence_and_long_pauses_are_removed():
+    result = trim_silence(_wav((3, 0), (1, 8000), (4, 0), (1.5, 8000), (5, 60)), max_pause_seconds=0.5)
+
+    assert result.original_seconds == 14.5
+    # 2.5 s of speech, 0.2 s padding around each word, one pause cut to 0.5 s; the hiss is silence
+    assert 3.6 <= result.seconds <= 3.8
+    assert abs(trim_silence(result.wav).original_seconds - result.seconds) < 0.01
+    assert len(result.wav) < len(_wav((3, 0), (1, 8000), (4, 0), (1.5, 8000), (5, 60))) / 3
+
+
+def test_audio_without_speech_or_not_wav_is_left_alone():
+    silent = _wav((2, 0))
+    result = trim_silence(silent)
+
+    assert result.wav == silent and result.trimmed_seconds == 0
+    assert trim_silence(b"OggS not a wav") is None
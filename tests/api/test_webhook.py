@@ -1,27 +1,21 @@
-import sys
-from unittest.mock import MagicMock
-
-# Mock external dependencies that are not installed in the environment
-mock_modules = [
-    "fastapi",
-    "fastapi.responses",
-    "pydantic",
-    "src.config",
-    "src.agent",
-    "src.api.instagram",
-    "src.api.transcription",
-    "src.api.scope_classifier",
-    "src.api.audio_reply",
-    "src.models",
-    "src.interaction_blocker",
-    "dotenv",
-]
-
-for module in mock_modules:
-    sys.modules[module] = MagicMock()
-
-# Now we can import the function under test
+import asyncio
+import time
+
+import httpx
+import pytest
+from agno.run.agent import RunContentEvent
+from openai import OpenAI
+
+from src import agent as agent_module
+from src import usage
+from src.api import webhook
 from src.api.webhook import _extract_audio_url
+from src.circuit_breaker import CLOSED, OPENAI, CircuitBreaker
+from src.deadline import Deadline
+from src.overload import OverloadController
+from src.prompts import SCRIPTED_REPLIES, SYSTEM_PROMPT
+from src.session_store import CompactRedisDb
+from src.sharding import ShardRouter
 
 def test_extract_audio_url_empty_list():
     assert _extract_audio_url([]) == ""
@@ -84,3 +78,100 @@ def test_extract_audio_url_invalid_attachment_format():
 def test_extract_audio_url_payload_is_none():
     attachments = [{"type": "audio", "payload": None}]
     assert _extract_audio_url(attachments) == ""
+
+
+class _StreamingAgent:
+    def run(self, text, stream=False, yield_run_output=False):
+        yield RunContentEvent(content="Temos a JET 50s e a Phoenix S disponíveis para pronta entrega na loja. ")
+        yield RunContentEvent(content="Financiamento em até 48x com entrada facilitada.")
+
+
+def test_graph_failures_while_streaming_do_not_count_against_the_agent(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    breaker = CircuitBreaker(OPENAI, failure_threshold=1, redis_client=fakeredis.FakeRedis(decode_responses=True))
+    overload = OverloadController(max_concurrency=1)
+    sends = []
+
+    async def _send_message(recipient_id, text, **kwargs):
+        sends.append(text)
+        raise RuntimeError("Failed to send message after 2 attempts")  # Graph outage
+
+    monkeypatch.setattr(webhook, "_build_agent", lambda sender_id, model_id=None: _StreamingAgent())
+    monkeypatch.setattr(webhook, "send_message", _send_message)
+    monkeypatch.setattr(webhook, "register_reply_echoes", lambda *args: asyncio.ensure_future(asyncio.sleep(0)))
+    monkeypatch.setattr(webhook, "get_circuit_breaker", lambda name: breaker)
+    monkeypatch.setattr(webhook, "get_overload_controller", lambda: overload)
+
+    asyncio.run(webhook._stream_agent_reply_logic("123456789", "oi", 0.0, Deadline(10.0)))
+
+    assert len(sends) == 1
+    assert breaker.state() == CLOSED  # a send failure is not an OpenAI failure
+    assert overload._running == 0
+
+
+def test_a_forwarded_message_keeps_the_budget_it_was_received_with(monkeypatch):
+    deadlines = []
+
+    async def _handle_message(sender_id, text, trace_context=None, deadline=None):
+        deadlines.append(deadline)
+
+    monkeypatch.setattr(webhook, "_handle_message", _handle_message)
+
+    async def _main():
+        webhook.dispatch_forwarded(
+            {"tenant": "", "sender_id": "1784140000012345", "text": "oi", "received_at": time.time() - 5.0}
+        )
+        await asyncio.sleep(0)
+
+    asyncio.run(_main())
+
+    deadline, = deadlines
+    assert deadline.remaining() <= deadline.budget_seconds - 5.0
+
+
+def _chat_completion(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={
+        "id": "chatcmpl-1", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Olá!"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    })
+
+
+def test_the_owner_runs_the_next_turn_on_the_session_in_memory(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    db = CompactRedisDb(
+        SYSTEM_PROMPT + SCRIPTED_REPLIES, redis_client=redis_client, bytes_client=fakeredis.FakeRedis(server=server),
+        db_prefix="agno", expire=300,
+    )
+    session_reads = []
+    read_session = db.get_session
+
+    def _get_session(*args, **kwargs):
+        session_reads.append(kwargs.get("session_id"))
+        return read_session(*args, **kwargs)
+
+    monkeypatch.setattr(db, "get_session", _get_session)
+    client = OpenAI(api_key="test-key", http_client=httpx.Client(transport=httpx.MockTransport(_chat_completion)))
+    shard = ShardRouter(redis_client, "worker-a")
+
+    monkeypatch.setattr(agent_module, "_session_db", lambda: db)
+    monkeypatch.setattr(agent_module, "get_openai_client", lambda: client)
+    monkeypatch.setattr(usage, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(usage, "_tracker", None)
+    monkeypatch.setattr(webhook, "ENABLE_SHARDING", True)
+    monkeypatch.setattr(webhook, "get_shard_router", lambda: shard)
+    monkeypatch.setattr(webhook, "get_circuit_breaker", lambda name: CircuitBreaker(OPENAI, redis_client=redis_client))
+    monkeypatch.setattr(webhook, "get_overload_controller", lambda: OverloadController(max_concurrency=1))
+
+    async def _two_turns():
+        for text in ("oi", "qual o preço da jet 50s?"):
+            assert await webhook._generate_agent_reply_logic("1784140000012345", text, Deadline(10.0)) == "Olá!"
+
+    asyncio.run(_two_turns())
+
+    assert len(session_reads) == 1  # the first turn only
+    assert db.has_runs("1784140000012345")
+    kept = shard.take_agent("1784140000012345")
+    assert len(kept.get_session("1784140000012345").runs) == 2
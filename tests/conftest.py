@@ -0,0 +1,4 @@
+import os
+
+# The process-wide OpenAI client (src/api/openai_client.py) needs a key to be built
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
@@ -0,0 +1,407 @@
+"""
+Offline load-test harness.
+
+Starts the FastAPI app against fakeredis (or a real Redis via --redis-url) and the stub servers
+from tests/load/stubs.py, replays a mix of Instagram DM traffic and reports throughput,
+reply latency percentiles and resource use.
+
+    python -m tests.load.harness --conversations 200 --rate 20
+    python -m tests.load.harness --streaming --json > run.json
+
+Traffic mix (--mix, weights):
+    single  one text message
+    burst   3-5 texts in quick succession (exercises the debounce buffer)
+    voice   audio attachment (download, transcription, scope classifier, optional TTS reply)
+    lead    message carrying lead data (agent tool call + NocoDB write)
+    manual  a human replies from the Instagram inbox first; the agent must stay silent
+
+Reply latency is measured from the last inbound message of a conversation to the first
+Graph send to that user, so it includes the buffer silence window (--silence). Holding
+messages sent under overload ("respondo em instantes") are counted separately, not as replies.
+CPU and RSS are those of the harness process, which hosts the app and the traffic
+generator; the stubs run in a child process and are not counted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+ACCOUNT_ID = "17841400000000000"
+SCENARIOS = ("single", "burst", "voice", "lead", "manual")
+DEFAULT_MIX = "single=5,burst=2,voice=2,lead=1,manual=1"
+SIGNATURE_HEADERS = {"X-Hub-Signature-256": "sha256=loadtest"}
+
+BURST_TEXTS = (
+    "oi",
+    "tudo bem?",
+    "queria saber o preço da jet 50s",
+    "vocês financiam?",
+    "qual a entrada mínima?",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": round(ordered[-1] * 1000, 1)}
+
+
+def _parse_mix(raw: str) -> Dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _valid_cpf(seed: int) -> str:
+    digits = [int(c) for c in f"{seed % 10**9:09d}"]
+    if len(set(digits)) == 1:
+        digits[0] = (digits[0] + 1) % 10
+    for position in (9, 10):
+        total = sum(digits[i] * (position + 1 - i) for i in range(position))
+        digits.append((total * 10) % 11 % 10)
+    cpf = "".join(map(str, digits))
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+def _message_event(sender_id: str, message: dict, entry_id: str = ACCOUNT_ID, recipient_id: str = ACCOUNT_ID) -> dict:
+    now_ms = int(time.time() * 1000)
+    return {
+        "object": "instagram",
+        "entry": [{
+            "id": entry_id,
+            "time": now_ms,
+            "messaging": [{
+                "sender": {"id": sender_id},
+                "recipient": {"id": recipient_id},
+                "timestamp": now_ms,
+                "message": {"mid": f"m_{now_ms}_{sender_id[-6:]}", **message},
+            }],
+        }],
+    }
+
+
+class LoadRun:
+    """Drives one load-test run against an already running app and stub server."""
+
+    def __init__(self, app_url: str, stub_url: str, rng: random.Random, holding_texts=()):
+        self.app_url = app_url
+        self.stub_url = stub_url
+        self.rng = rng
+        self.holding_texts = set(holding_texts)
+        self.client = httpx.AsyncClient(timeout=30.0)
+        self.last_inbound: Dict[str, float] = {}
+        self.scenario_of: Dict[str, str] = {}
+        self.ack_seconds: List[float] = []
+        self.webhook_errors = 0
+
+    async def _post(self, payload: dict) -> None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(f"{self.app_url}/webhook", json=payload, headers=SIGNATURE_HEADERS)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self.webhook_errors += 1
+        finally:
+            self.ack_seconds.append(time.perf_counter() - started)
+
+    async def _send_text(self, user_id: str, text: str) -> None:
+        self.last_inbound[user_id] = time.time()
+        await self._post(_message_event(user_id, {"text": text}))
+
+    async def single(self, user_id: str) -> None:
+        await self._send_text(user_id, "Oi! Quais motos vocês têm disponíveis?")
+
+    async def burst(self, user_id: str) -> None:
+        for text in self.rng.sample(BURST_TEXTS, self.rng.randint(3, 5)):
+            await self._send_text(user_id, text)
+            await asyncio.sleep(self.rng.uniform(0.05, 0.3))
+
+    async def voice(self, user_id: str) -> None:
+        attachment = {"type": "audio", "payload": {"url": f"{self.stub_url}/media/voice-{user_id}.wav"}}
+        self.last_inbound[user_id] = time.time()
+        await self._post(_message_event(user_id, {"attachments": [attachment]}))
+
+    async def lead(self, user_id: str) -> None:
+        data = {
+            "nome": "Cliente Teste",
+            "cpf": _valid_cpf(int(user_id)),
+            "telefone": f"(11) 9{int(user_id) % 10**8:08d}",
+            "modelo_interesse": "JET 50s",
+            "nascimento": "10/05/1990",
+            "cnh": "SIM",
+        }
+        await self._send_text(user_id, f"Quero fazer a simulação. Meus dados: {json.dumps(data, ensure_ascii=False)}")
+
+    async def manual(self, user_id: str) -> None:
+        # Seller answers from the Instagram inbox: echo of a message the agent never sent.
+        echo = _message_event(ACCOUNT_ID, {"text": "Oi, aqui é o Carlos da loja!", "is_echo": True}, recipient_id=user_id)
+        await self._post(echo)
+        await asyncio.sleep(0.2)
+        await self._send_text(user_id, "Oi Carlos, tudo bem?")
+
+    async def stats(self) -> dict:
+        response = await self.client.get(f"{self.stub_url}/_stats")
+        response.raise_for_status()
+        return response.json()
+
+    def first_replies(self, sends: List[dict]) -> Dict[str, float]:
+        replies: Dict[str, float] = {}
+        for send in sorted(sends, key=lambda s: s["at"]):
+            if send["text"] in self.holding_texts:
+                continue
+            user_id = send["recipient"]
+            if user_id in self.last_inbound and user_id not in replies and send["at"] >= self.last_inbound[user_id]:
+                replies[user_id] = send["at"]
+        return replies
+
+    async def run(self, conversations: int, rate: float, mix: Dict[str, float], timeout: float) -> dict:
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        tasks = []
+        started = time.time()
+        arrival = 0.0
+        for index in range(conversations):
+            user_id = str(10**15 + index)
+            scenario = self.rng.choices(names, weights)[0]
+            self.scenario_of[user_id] = scenario
+            delay = arrival - (time.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(getattr(self, scenario)(user_id)))
+            arrival += self.rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+        traffic_done = time.time()
+
+        expected = {user_id for user_id, scenario in self.scenario_of.items() if scenario != "manual"}
+        deadline = traffic_done + timeout
+        stats = await self.stats()
+        while time.time() < deadline:
+            if expected <= set(self.first_replies(stats["sends"])):
+                break
+            await asyncio.sleep(0.25)
+            stats = await self.stats()
+        finished = time.time()
+        await self.client.aclose()
+        return self._report(stats, started, traffic_done, finished, expected)
+
+    def _report(self, stats: dict, started: float, traffic_done: float, finished: float, expected: set) -> dict:
+        replies = self.first_replies(stats["sends"])
+        latencies = defaultdict(list)
+        for user_id, replied_at in replies.items():
+            latencies[self.scenario_of[user_id]].append(replied_at - self.last_inbound[user_id])
+
+        answered = [user_id for user_id in expected if user_id in replies]
+        last_reply = max(replies.values(), default=finished)
+        window = max(last_reply - started, 1e-9)
+        all_latencies = [value for scenario, values in latencies.items() if scenario != "manual" for value in values]
+
+        return {
+            "conversations": len(self.scenario_of),
+            "scenarios": dict(Counter(self.scenario_of.values())),
+            "webhook_requests": len(self.ack_seconds),
+            "webhook_errors": self.webhook_errors,
+            "webhook_ack_ms": _percentiles(self.ack_seconds),
+            "traffic_seconds": round(traffic_done - started, 2),
+            "window_seconds": round(window, 2),
+            "answered": len(answered),
+            "unanswered": len(expected) - len(answered),
+            "manual_replied": len(latencies.get("manual", [])),
+            "replies_per_second": round(len(answered) / window, 2),
+            "reply_latency_ms": _percentiles(all_latencies),
+            "reply_latency_ms_by_scenario": {
+                scenario: _percentiles(values) for scenario, values in sorted(latencies.items()) if scenario != "manual"
+            },
+            "holding_messages": sum(1 for send in stats["sends"] if send["text"] in self.holding_texts),
+            "graph_sends": len(stats["sends"]),
+            "stub_requests": stats["requests"],
+            "leads_written": stats["leads"],
+        }
+
+
+def _configure_environment(stub_url: str, app_url: str, args) -> None:
+    """Point the app at the stubs. Must run before anything under src/ is imported."""
+    os.environ.update({
+        "OPENAI_API_KEY": "load-test",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "INSTAGRAM_GRAPH_BASE_URL": stub_url,
+        "INSTAGRAM_ACCESS_TOKEN": "load-test",
+        "INSTAGRAM_VERIFY_TOKEN": "load-test",
+        "NOCODB_TABLE_URL": f"{stub_url}/nocodb/records",
+        "NOCODB_API_TOKEN": "load-test",
+        "PUBLIC_BASE_URL": app_url,
+        "ENABLE_INSTAGRAM_AUDIO_REPLY": "true",
+        "ENABLE_AGENT_STREAMING": "true" if args.streaming else "false",
+        "BUFFER_SILENCE_SECONDS": str(args.silence),
+        "TRACING_EXPORTER": "none",
+        "REDIS_URL": args.redis_url or "redis://fakeredis:6379/0",
+    })
+
+
+def _use_fakeredis() -> None:
+    """Route every redis.from_url / Redis.from_url call (app and Agno) to one in-process fakeredis server."""
+    import fakeredis
+    import redis
+
+    server = fakeredis.FakeServer()
+
+    def from_url(cls, url, **kwargs):
+        return fakeredis.FakeRedis(server=server, decode_responses=kwargs.get("decode_responses", False))
+
+    redis.Redis.from_url = classmethod(from_url)
+
+
+def _start_stubs(port: int, app_url: str, latency: str) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "tests.load.stubs",
+            "--port", str(port),
+            "--webhook-url", f"{app_url}/webhook",
+            "--account-id", ACCOUNT_ID,
+            "--latency", latency,
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_stats", timeout=1.0)
+            return process
+        except httpx.HTTPError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Stub server did not start")
+
+
+def _start_app(port: int, log_level: str):
+    import uvicorn
+
+    from src.app import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level=log_level, access_log=False))
+    thread = threading.Thread(target=server.run, name="app-server", daemon=True)
+    thread.start()
+    deadline = time.time() + 15
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("App server did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def run(args) -> dict:
+    app_port, stub_port = _free_port(), _free_port()
+    app_url, stub_url = f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{stub_port}"
+
+    _configure_environment(stub_url, app_url, args)
+    if not args.redis_url:
+        _use_fakeredis()
+
+    stubs = _start_stubs(stub_port, app_url, args.latency)
+    server = None
+    try:
+        import logging
+
+        server, thread = _start_app(app_port, "info" if args.verbose else "warning")
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        from src.api.webhook import AGENT_DEFERRED_TEXT
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        wall_started = time.perf_counter()
+        report = asyncio.run(
+            LoadRun(app_url, stub_url, random.Random(args.seed), holding_texts=(AGENT_DEFERRED_TEXT,)).run(
+                args.conversations, args.rate, _parse_mix(args.mix), args.timeout
+            )
+        )
+        wall = time.perf_counter() - wall_started
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        if server is not None:
+            server.should_exit = True
+        stubs.terminate()
+        stubs.wait(timeout=10)
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    report.update({
+        "mode": "streamed" if args.streaming else "buffered",
+        "buffer_silence_seconds": args.silence,
+        "redis": "external" if args.redis_url else "fakeredis",
+        "cpu_seconds": round(cpu, 2),
+        "cpu_percent": round(100 * cpu / wall, 1) if wall else 0.0,
+        "max_rss_mb": round(usage_after.ru_maxrss / 1024, 1),
+    })
+    return report
+
+
+def _print_report(report: dict) -> None:
+    latency = report["reply_latency_ms"]
+    ack = report["webhook_ack_ms"]
+    print(f"conversations     {report['conversations']}  {report['scenarios']}")
+    print(f"mode              {report['mode']}  (buffer silence {report['buffer_silence_seconds']}s, {report['redis']})")
+    print(
+        f"answered          {report['answered']}  unanswered={report['unanswered']}  "
+        f"manual_replied={report['manual_replied']}  holding={report['holding_messages']}"
+    )
+    print(f"throughput        {report['replies_per_second']} replies/s over {report['window_seconds']}s")
+    print(f"reply latency ms  p50={latency['p50']}  p95={latency['p95']}  p99={latency['p99']}  max={latency['max']}")
+    for scenario, values in report["reply_latency_ms_by_scenario"].items():
+        print(f"  {scenario:<15} p50={values['p50']}  p95={values['p95']}  p99={values['p99']}")
+    print(f"webhook ack ms    p50={ack['p50']}  p95={ack['p95']}  p99={ack['p99']}  errors={report['webhook_errors']}")
+    print(f"resources         cpu={report['cpu_seconds']}s ({report['cpu_percent']}%)  max_rss={report['max_rss_mb']}MB")
+    print(f"stub requests     {report['stub_requests']}  leads_written={report['leads_written']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for the Instagram agent")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10.0, help="New conversations per second (Poisson arrivals)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--silence", type=float, default=1.0, help="BUFFER_SILENCE_SECONDS for the app under test")
+    parser.add_argument("--latency", default="{}", help='Stub latency overrides as JSON, e.g. \'{"chat": 1.5}\'')
+    parser.add_argument("--streaming", action="store_true", help="Run with ENABLE_AGENT_STREAMING=true")
+    parser.add_argument("--redis-url", default="", help="Use a real Redis instead of fakeredis")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for replies after traffic ends")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep app INFO logs")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 0 if report["unanswered"] == 0 and report["manual_replied"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Logging cost on the calling thread, per incoming message.
+
+Emits the INFO lines a text message produces (receive, buffer, lock, batch, send, time to first
+message) through the previous setup (`logging.basicConfig`, formatted and written on the caller)
+and through `configure_logging()` (queue + listener thread, sampled), writing to /dev/null.
+
+    python -m tests.load.log_benchmark --messages 20000
+"""
+import argparse
+import logging
+import os
+import time
+
+from src import logging_config
+
+LINES = (
+    ("[RECV] from=%s text=%s", ("654321", "Oi, quanto custa a JET 50s? Meu telefone é (11) 98765-4321")),
+    ("[%s] Message buffered. Attempting to acquire processing lock...", ("654321",)),
+    ("[%s] Lock acquired. Starting buffer processor.", ("654321",)),
+    ("[%s] Processing batch of %d messages", ("654321", 1)),
+    ("[SEND] to=%s text=%s", ("654321", "A JET 50s sai por R$ 9.990,00. Quer que eu chame um consultor?")),
+    ("[%s] Message sent successfully (attempt %d/%d)", ("654321", 1, 3)),
+    ("[%s] Time to first message: %.2fs (streamed=%s)", ("654321", 2.31, True)),
+)
+
+
+def _reset_root() -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def _run(messages: int) -> float:
+    logger = logging.getLogger("src.api.webhook")
+    start = time.perf_counter()
+    for _ in range(messages):
+        for template, args in LINES:
+            logger.info(template, *args)
+    return (time.perf_counter() - start) / messages * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as sink:
+        _reset_root()
+        logging.basicConfig(level=logging.INFO, stream=sink, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        previous = _run(args.messages)
+
+        _reset_root()
+        logging_config.configure_logging(sample_rate=1.0, stream=sink)
+        unsampled = _run(args.messages)
+        logging_config.stop_logging()
+
+        _reset_root()
+        logging_config.configure_logging(sample_rate=args.sample_rate, stream=sink)
+        sampled = _run(args.messages)
+        logging_config.stop_logging()
+
+    print(f"basicConfig (caller formats and writes)   {previous:7.1f} us/message")
+    print(f"queue listener, unsampled                 {unsampled:7.1f} us/message")
+    print(f"queue listener, sample rate {args.sample_rate:<4}          {sampled:7.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Worker startup time and import-time profile.
+
+Each measurement runs in a fresh interpreter against fakeredis:
+
+    import      `import src.app`
+    ready       import + lifespan startup (the worker accepts requests)
+    first agent ready + building the first agent (waits for the background preload of Agno)
+
+followed by the slowest imports of `src.app` (`python -X importtime`, cumulative).
+
+    python -m tests.load.startup_benchmark --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _child() -> None:
+    started = time.perf_counter()
+    from src.app import app
+
+    imported = time.perf_counter()
+
+    from tests.load.harness import _use_fakeredis
+
+    _use_fakeredis()
+
+    import asyncio
+
+    from src.agent import get_agent
+
+    async def _startup() -> dict:
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+            await asyncio.to_thread(get_agent, "startup-benchmark")
+            first_agent = time.perf_counter()
+        return {"import": imported - started, "ready": ready - started, "first_agent": first_agent - started}
+
+    print(json.dumps(asyncio.run(_startup())))
+
+
+def _run_child() -> dict:
+    env = {**os.environ, "PYTHONPATH": PROJECT_ROOT, "LOG_LEVEL": "WARNING", "OPENAI_API_KEY": "startup-benchmark"}
+    output = subprocess.run(
+        [sys.executable, "-m", "tests.load.startup_benchmark", "--child"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(module: str = "src.app", top: int = 15) -> list:
+    """[(cumulative seconds, module)] of the slowest imports of `module`, in a fresh interpreter."""
+    env = {**os.environ, "PYTHONPATH": PROJECT_ROOT}
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child()
+        return
+
+    runs = [_run_child() for _ in range(args.runs)]
+    for name in ("import", "ready", "first_agent"):
+        values = [run[name] for run in runs]
+        print(f"{name:<12} median {statistics.median(values):6.3f}s   min {min(values):6.3f}s")
+    print("\nslowest imports of src.app (cumulative):")
+    for seconds, module in import_profile(top=args.top):
+        print(f"  {seconds:6.3f}s  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Local stand-ins for the Meta Graph API, OpenAI and NocoDB used by the load harness.
+
+Run as a separate process so their CPU time is not counted against the app:
+
+    python -m tests.load.stubs --port 9100 --webhook-url http://127.0.0.1:9000/webhook
+
+Endpoints:
+    POST /{version}/me/messages        Graph send; records the send and posts the agent echo back to the app
+    GET  /media/{name}                 Voice-note attachment (short silent WAV)
+    POST /v1/chat/completions          Scope classifier and agent replies (JSON or SSE), lead tool calls
+    POST /v1/audio/transcriptions      Transcription
+    POST /v1/audio/speech              TTS
+    POST /nocodb/records               NocoDB table
+    GET  /_stats                       Recorded sends and request counts, read by the harness
+"""
+import argparse
+import asyncio
+import io
+import json
+import re
+import time
+import uuid
+import wave
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ACCOUNT_ID = "17841400000000000"
+LEAD_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+
+AGENT_REPLY = (
+    "Olá! Temos a JET 50s, a SHI 175 e a Phoenix S à pronta entrega. "
+    "Trabalhamos com financiamento em até 48x e entrada facilitada.\n\n"
+    "Qual modelo chamou mais a sua atenção? Se quiser, já faço uma simulação pra você."
+)
+LEAD_REPLY = "Perfeito, seus dados foram registrados! Um consultor entra em contato pelo WhatsApp ainda hoje."
+TRANSCRIPT = "Oi, queria saber o preço da JET 50s e se vocês fazem financiamento"
+OFF_TOPIC_TRANSCRIPT = "Quem ganhou o jogo de futebol ontem à noite?"
+
+
+@dataclass
+class StubLatency:
+    """Simulated server-side latency, in seconds."""
+    chat: float = 0.8
+    classifier: float = 0.25
+    transcription: float = 0.6
+    tts: float = 0.5
+    graph: float = 0.12
+    nocodb: float = 0.08
+    off_topic_every: int = 4  # every Nth voice note is off-topic (exercises classifier + TTS reply)
+
+
+def _silent_wav(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buf.getvalue()
+
+
+def _completion(model: str, content: Optional[str] = None, tool_call: Optional[dict] = None) -> dict:
+    message = {"role": "assistant", "content": content}
+    finish_reason = "stop"
+    if tool_call:
+        message["tool_calls"] = [tool_call]
+        finish_reason = "tool_calls"
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": 1800,
+            "completion_tokens": 60,
+            "total_tokens": 1860,
+            "prompt_tokens_details": {"cached_tokens": 1536},
+        },
+    }
+
+
+def _sse_chunks(model: str, content: Optional[str] = None, tool_call: Optional[dict] = None):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    def chunk(delta: dict, finish_reason=None, usage=None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+        }
+        if usage:
+            body["usage"] = usage
+        return f"data: {json.dumps(body)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    if tool_call:
+        yield chunk({"tool_calls": [{"index": 0, **tool_call}]})
+        yield chunk({}, finish_reason="tool_calls")
+    else:
+        for word in re.findall(r"\S+\s*", content or ""):
+            yield chunk({"content": word})
+        yield chunk({}, finish_reason="stop")
+    yield chunk(None, usage={"prompt_tokens": 1800, "completion_tokens": 60, "total_tokens": 1860})
+    yield "data: [DONE]\n\n"
+
+
+def _lead_tool_call(messages: List[dict]) -> Optional[dict]:
+    """Ask for add_lead_to_nocodb when the last user turn carries lead data and the tool was not called yet."""
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    match = LEAD_PATTERN.search(str(messages[-1].get("content") or ""))
+    if not match:
+        return None
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": "add_lead_to_nocodb", "arguments": match.group(0)},
+    }
+
+
+def build_stub_app(webhook_url: str, latency: StubLatency, account_id: str = ACCOUNT_ID) -> FastAPI:
+    app = FastAPI(title="Load test stubs")
+    app.state.sends = []
+    app.state.requests = Counter()
+    app.state.leads = []
+    echo_client = httpx.AsyncClient(timeout=10.0)
+    background = set()
+
+    async def _post_echo(recipient_id: str, text: str) -> None:
+        payload = {
+            "object": "instagram",
+            "entry": [{
+                "id": account_id,
+                "time": int(time.time() * 1000),
+                "messaging": [{
+                    "sender": {"id": account_id},
+                    "recipient": {"id": recipient_id},
+                    "timestamp": int(time.time() * 1000),
+                    "message": {"mid": uuid.uuid4().hex, "text": text, "is_echo": True},
+                }],
+            }],
+        }
+        try:
+            await echo_client.post(webhook_url, json=payload, headers={"X-Hub-Signature-256": "sha256=stub"})
+        except httpx.HTTPError:
+            app.state.requests["echo_failed"] += 1
+
+    @app.post("/{version}/me/messages")
+    async def graph_send(version: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency.graph)
+        recipient_id = body["recipient"]["id"]
+        message = body.get("message", {})
+        kind = "audio" if "attachment" in message else "text"
+        app.state.requests[f"graph_{kind}"] += 1
+        app.state.sends.append({"recipient": recipient_id, "kind": kind, "text": message.get("text", ""), "at": time.time()})
+        if kind == "text":
+            # Meta delivers an echo of every message sent by the account.
+            task = asyncio.create_task(_post_echo(recipient_id, message["text"]))
+            background.add(task)
+            task.add_done_callback(background.discard)
+        return {"recipient_id": recipient_id, "message_id": f"m_{uuid.uuid4().hex}"}
+
+    voice_note = _silent_wav()
+    speech_audio = _silent_wav(1.0)
+
+    @app.get("/media/{name}")
+    async def media(name: str):
+        app.state.requests["media"] += 1
+        return Response(content=voice_note, media_type="audio/wav")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4o-mini")
+        messages = body.get("messages", [])
+        system = str(messages[0].get("content", "")) if messages else ""
+
+        if "IN_SCOPE ou OUT_OF_SCOPE" in system:
+            app.state.requests["classifier"] += 1
+            await asyncio.sleep(latency.classifier)
+            off_topic = "futebol" in str(messages[-1].get("content", ""))
+            return _completion(model, "OUT_OF_SCOPE" if off_topic else "IN_SCOPE")
+
+        app.state.requests["chat"] += 1
+        await asyncio.sleep(latency.chat)
+        tool_call = _lead_tool_call(messages)
+        content = None
+        if tool_call:
+            app.state.requests["chat_tool_call"] += 1
+        else:
+            content = LEAD_REPLY if messages and messages[-1].get("role") == "tool" else AGENT_REPLY
+        if body.get("stream"):
+            return StreamingResponse(_sse_chunks(model, content, tool_call), media_type="text/event-stream")
+        return _completion(model, content, tool_call)
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        await request.body()
+        app.state.requests["transcription"] += 1
+        await asyncio.sleep(latency.transcription)
+        off_topic = latency.off_topic_every and app.state.requests["transcription"] % latency.off_topic_every == 0
+        return {"text": OFF_TOPIC_TRANSCRIPT if off_topic else TRANSCRIPT}
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        await request.body()
+        app.state.requests["tts"] += 1
+        await asyncio.sleep(latency.tts)
+        # WAV payload: ffmpeg probes the content, so the app's mp3 -> wav conversion still works.
+        return Response(content=speech_audio, media_type="audio/mpeg")
+
+    @app.post("/nocodb/records")
+    async def nocodb_records(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency.nocodb)
+        records = body if isinstance(body, list) else [body]
+        app.state.requests["nocodb"] += 1
+        app.state.leads.extend(records)
+        return JSONResponse([{"Id": len(app.state.leads) - i} for i in range(len(records))])
+
+    @app.get("/_stats")
+    async def stats():
+        return {"sends": app.state.sends, "requests": dict(app.state.requests), "leads": len(app.state.leads)}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub Graph/OpenAI/NocoDB servers for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--webhook-url", required=True, help="App webhook URL that receives echo events")
+    parser.add_argument("--account-id", default=ACCOUNT_ID)
+    parser.add_argument("--latency", default="{}", help='JSON overrides for StubLatency, e.g. \'{"chat": 1.5}\'')
+    args = parser.parse_args()
+
+    latency = StubLatency(**json.loads(args.latency))
+    app = build_stub_app(args.webhook_url, latency, args.account_id)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
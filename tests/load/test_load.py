@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fakeredis")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_smoke_load_run_answers_every_conversation():
+    # Separate process: the harness configures the environment before src/ is imported.
+    proc = subprocess.run(
+        [
+            sys.executable, "-m", "tests.load.harness",
+            "--conversations", "12", "--rate", "20", "--silence", "0.3",
+            "--latency", '{"chat": 0.05, "classifier": 0.02, "transcription": 0.05, "graph": 0.01}',
+            "--mix", "single=2,burst=1,voice=1,lead=1,manual=1",
+            "--timeout", "30", "--json",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    report = json.loads(proc.stdout)
+
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert report["unanswered"] == 0
+    assert report["manual_replied"] == 0
+    assert report["webhook_errors"] == 0
+    assert report["reply_latency_ms"]["p99"] is not None
+    assert report["stub_requests"].get("nocodb", 0) == report["scenarios"].get("lead", 0)
@@ -0,0 +1,51 @@
+import json
+import os
+
+from src.catalog import Catalog, format_price, get_catalog
+from src.tools import buscar_modelos
+
+
+def _names(query):
+    return [model.name for model in get_catalog().search(query)]
+
+
+def test_fuzzy_name_lookup():
+    assert _names("jet50") == ["JET 50s"]
+    assert _names("shi efi") == ["SHI 175 EFI"]
+    assert _names("shi 175") == ["SHI 175 EFI", "SHI 175"]
+    assert _names("denv") == ["DENVER 250"]
+    assert _names("phenix") == ["PHOENIX 50"]
+    assert _names("triciclo") == ["SCOOTER SH3 Triciclo"]
+
+
+def test_numbers_must_match_exactly():
+    assert _names("jet 125") == ["JET 125 SS"]
+    assert _names("jet 300") == []
+    assert get_catalog().mentioned("quanto ta a jet 50 e a pt 1?") == ["JET 50s", "PT1"]
+    assert get_catalog().mentioned("jet 500") == []
+
+
+def test_tool_answers_with_exact_prices():
+    assert buscar_modelos("jet 50") == "* JET 50s – R$ 12.999,00"
+    assert buscar_modelos("elétricas").startswith("⚡️ Modelos Elétricos\n* PT1 – R$ 7.999,00")
+    assert buscar_modelos("").count("* ") == len(get_catalog().models)
+    assert buscar_modelos("jet 300").startswith("Nenhum modelo encontrado")
+    assert format_price(114999) == "R$ 114.999,00"
+
+
+def test_catalog_file_changes_are_reloaded(tmp_path):
+    path = tmp_path / "catalog.json"
+    data = {"categorias": [], "modelos": [{"nome": "JET 50s", "categoria": "combustao", "preco": 12999}]}
+    path.write_text(json.dumps(data))
+    catalog = Catalog(str(path), reload_seconds=0)
+    first_version = catalog.index.version
+
+    data["modelos"][0]["preco"] = 13499
+    path.write_text(json.dumps(data))
+    os.utime(path, (1, 1))
+    assert catalog.index.search("jet 50")[0].price == 13499
+    assert catalog.index.version != first_version
+
+    path.write_text("{broken")
+    os.utime(path, (2, 2))
+    assert catalog.index.search("jet 50")[0].price == 13499
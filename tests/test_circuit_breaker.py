@@ -0,0 +1,125 @@
+import httpx
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.circuit_breaker import CLOSED, GRAPH, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(redis_client, clock, **kwargs):
+    options = dict(failure_threshold=3, recovery_seconds=30)
+    options.update(kwargs)
+    return CircuitBreaker("test", redis_client=redis_client, clock=clock, **options)
+
+
+def _fail(breaker, exc=None):
+    with pytest.raises(type(exc) if exc else ConnectionError):
+        with breaker.guard():
+            raise exc or ConnectionError("down")
+
+
+def _status_error(status_code):
+    request = httpx.Request("POST", "https://graph.example/me/messages")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status_code}", request=request, response=response)
+
+
+def test_opens_after_consecutive_failures_and_rejects_without_calling():
+    breaker = _breaker(fakeredis.FakeRedis(decode_responses=True), _Clock())
+    for _ in range(3):
+        _fail(breaker)
+    assert breaker.state() == OPEN
+    assert breaker.is_open()
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            calls.append(1)
+    assert calls == []
+
+
+def test_success_resets_the_failure_count():
+    breaker = _breaker(fakeredis.FakeRedis(decode_responses=True), _Clock())
+    _fail(breaker)
+    _fail(breaker)
+    with breaker.guard():
+        pass
+    _fail(breaker)
+    _fail(breaker)
+    assert breaker.state() == CLOSED
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    breaker = _breaker(fakeredis.FakeRedis(decode_responses=True), _Clock())
+    for _ in range(5):
+        _fail(breaker, _status_error(400))
+    assert breaker.state() == CLOSED
+
+    for _ in range(3):
+        _fail(breaker, _status_error(503))
+    assert breaker.state() == OPEN
+
+
+def test_another_open_circuit_does_not_trip_the_breaker():
+    breaker = _breaker(fakeredis.FakeRedis(decode_responses=True), _Clock())
+    for _ in range(5):
+        _fail(breaker, CircuitOpenError(GRAPH))
+    assert breaker.state() == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit():
+    clock = _Clock()
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    breaker = _breaker(redis_client, clock)
+    for _ in range(3):
+        _fail(breaker)
+
+    # Recovery elapsed: the probe is let through, other callers are still rejected.
+    clock.now += 31
+    with breaker.guard():
+        assert breaker.state() == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            with _breaker(redis_client, clock).guard():
+                pass
+    assert breaker.state() == CLOSED
+
+    for _ in range(3):
+        _fail(breaker)
+    clock.now += 31
+    _fail(breaker)
+    assert breaker.state() == OPEN
+    assert breaker.is_open()
+
+
+def test_state_is_shared_between_instances():
+    clock = _Clock()
+    server = fakeredis.FakeServer()
+    first = _breaker(fakeredis.FakeRedis(server=server, decode_responses=True), clock)
+    second = _breaker(fakeredis.FakeRedis(server=server, decode_responses=True), clock)
+    for _ in range(3):
+        _fail(first)
+    with pytest.raises(CircuitOpenError):
+        with second.guard():
+            pass
+
+
+def test_redis_outage_lets_calls_through():
+    class _BrokenRedis:
+        def __getattr__(self, name):
+            def _raise(*args, **kwargs):
+                raise ConnectionError("redis down")
+            return _raise
+
+    breaker = _breaker(_BrokenRedis(), _Clock())
+    for _ in range(5):
+        _fail(breaker)
+    with breaker.guard():
+        pass
@@ -0,0 +1,75 @@
+import pytest
+
+from src.conversation_state import MAX_PENDING_ECHOES, ConversationState
+
+
+@pytest.fixture
+def redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_one_sender_is_one_hash_plus_its_buffer(redis):
+    state = ConversationState(redis)
+    state.push_message("user-1", "oi")
+    state.push_message("user-1", "tudo bem?")
+    assert state.acquire_processing_lock("user-1")
+    assert not state.acquire_processing_lock("user-1")
+    state.expect_echoes("user-1", ["Olá!"])
+    assert state.block("user-1")
+
+    assert sorted(redis.keys("*")) == ["conv:user-1", "conv:user-1:buffer"]
+    snapshot = state.snapshot("user-1")
+    assert snapshot["buffer"] == ["oi", "tudo bem?"] and snapshot["processing"]
+    assert snapshot["pending_echoes"] == 1 and 295 <= snapshot["blocked_seconds"] <= 300
+
+    assert state.drain_messages("user-1") == ["oi", "tudo bem?"]
+    state.release_processing_lock("user-1")
+    assert state.acquire_processing_lock("user-1")
+
+
+def test_block_is_not_extended_and_echoes_are_consumed_once(redis):
+    state = ConversationState(redis)
+    assert state.block("user-1")
+    assert not state.block("user-1")
+    state.unblock("user-1")
+    assert state.block_remaining("user-1") == 0
+
+    state.expect_echoes("user-1", ["Olá! "])
+    assert state.consume_echo("user-1", "Olá!")
+    assert not state.consume_echo("user-1", "Olá!")
+
+
+def test_chunk_echoes_match_in_any_order_and_repeated_texts_count(redis):
+    state = ConversationState(redis)
+    state.expect_echoes("user-1", ["Temos a JET 50s.", "Digite menu", "Temos a JET 50s."])
+    state.expect_echoes("user-1", ["Digite menu"])
+
+    for text in ("Digite menu", "Temos a JET 50s.", "Digite menu", "Temos a JET 50s."):
+        assert state.consume_echo("user-1", text)
+    assert not state.consume_echo("user-1", "Temos a JET 50s.")  # a third copy was typed by a human
+    assert not state.consume_echo("user-1", "Digite menu")
+    assert state.snapshot("user-1")["pending_echoes"] == 0
+
+
+def test_pending_echoes_are_bounded_oldest_first(redis):
+    state = ConversationState(redis)
+    state.expect_echoes("user-1", ["primeira"])
+    state.expect_echoes("user-1", [f"parte {index}" for index in range(MAX_PENDING_ECHOES)])
+
+    assert state.snapshot("user-1")["pending_echoes"] == MAX_PENDING_ECHOES
+    assert not state.consume_echo("user-1", "primeira")
+    assert state.consume_echo("user-1", f"parte {MAX_PENDING_ECHOES - 1}")
+
+
+def test_state_left_in_the_previous_layout_is_honoured(redis):
+    redis.set("user_interaction_lock:user-1", "locked", ex=200)
+    redis.set("chat:processing:user-1", "locked", ex=60)
+    redis.rpush("chat:buffer:user-1", "mensagem antiga")
+    state = ConversationState(redis)
+    state.push_message("user-1", "nova")
+
+    assert 190 <= state.block_remaining("user-1") <= 200
+    assert not state.acquire_processing_lock("user-1")
+    assert state.drain_messages("user-1") == ["mensagem antiga", "nova"]
+    assert ConversationState(redis, legacy_reads=False).acquire_processing_lock("user-1")
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.api import instagram
+from src.api.scope_classifier import is_out_of_scope
+from src.deadline import Deadline
+from src.metrics import DEADLINE_OVERRUNS_TOTAL
+
+
+def _overruns(stage: str) -> float:
+    return DEADLINE_OVERRUNS_TOTAL.labels(stage=stage)._value.get()
+
+
+def test_deadline_budget_and_timeouts():
+    deadline = Deadline(10.0)
+    assert deadline.has(9.0)
+    assert not deadline.has(11.0)
+    assert deadline.timeout(3.0) == 3.0
+
+    exhausted = Deadline(0.0)
+    assert exhausted.expired()
+    assert exhausted.timeout(15.0, floor=5.0) == 5.0
+
+
+def test_deadline_extend_excludes_waiting():
+    deadline = Deadline(0.0)
+    deadline.extend(5.0)
+    assert 4.0 < deadline.remaining() <= 5.0
+
+
+def test_deadline_started_by_another_worker_keeps_the_time_already_spent():
+    forwarded = Deadline(10.0, started_at=time.time() - 4.0)
+    assert 5.5 < forwarded.remaining() <= 6.0
+
+    skewed = Deadline(10.0, started_at=time.time() + 60.0)  # clock skew never adds budget
+    assert skewed.remaining() <= 10.0
+
+
+def test_classifier_skipped_without_budget():
+    before = _overruns("scope_classification")
+    assert asyncio.run(is_out_of_scope("oi", Deadline(0.0))) is False
+    assert _overruns("scope_classification") == before + 1
+
+
+def test_send_is_not_retried_past_deadline(monkeypatch):
+    calls = []
+
+    def _handler(request):
+        calls.append(request)
+        return httpx.Response(500, text="unavailable")
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        instagram.httpx, "AsyncClient", lambda **kwargs: real_client(transport=httpx.MockTransport(_handler), **kwargs)
+    )
+    before = _overruns("graph_send")
+
+    with pytest.raises(RuntimeError, match="after 1 attempts"):
+        asyncio.run(instagram.send_message("123456789", "Olá!", retry_count=3, deadline=Deadline(1.0)))
+
+    assert len(calls) == 1
+    assert _overruns("graph_send") == before + 1
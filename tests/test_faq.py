@@ -0,0 +1,45 @@
+from src.faq import INTENT_LOCATION, INTENT_PAYMENT, INTENT_WHATSAPP, PhraseAutomaton, match_intents
+from src.prompts import LEAD_DATA_REQUEST
+from src.router import ROUTE_FULL, ROUTE_TEMPLATE, normalize_text, route_message
+from src.usage import _build_report
+
+
+def test_automaton_finds_overlapping_phrases_on_word_boundaries():
+    automaton = PhraseAutomaton({"he": "a", "she": "b", "his": "c", "hers": "d"})
+    assert automaton.labels("ushers") == set()
+    assert automaton.labels("she hers") == {"b", "d"}
+    assert automaton.labels("he, she") == {"a", "b"}
+    assert automaton.labels("his") == {"c"}
+
+
+def test_intents_match_normalized_portuguese():
+    assert match_intents(normalize_text("Qual o ENDEREÇO de vocês?")) == [INTENT_LOCATION]
+    assert match_intents(normalize_text("dá pra pagar no cartão ou à vista?")) == [INTENT_PAYMENT]
+    assert match_intents(normalize_text("pixel, zapping")) == []
+
+
+def test_faq_reply_comes_from_the_prompt_script():
+    decision = route_message("onde fica a loja?", lambda: False)
+    assert (decision.route, decision.reason) == (ROUTE_TEMPLATE, "faq_location")
+    assert "BR-402" in decision.reply and "**" not in decision.reply
+
+
+def test_mixed_or_model_specific_questions_go_to_the_agent():
+    assert route_message("onde fica a loja e vocês financiam?", lambda: True).route == ROUTE_FULL
+    assert route_message("financiam a jet 50?", lambda: True).route == ROUTE_FULL
+
+
+def test_whatsapp_request_is_canned_only_before_lead_data_could_have_been_given():
+    decision = route_message("me passa o whatsapp", lambda: True)
+    assert decision.reason == f"faq_{INTENT_WHATSAPP}"
+    assert decision.reply == LEAD_DATA_REQUEST
+    assert route_message("me passa o whatsapp", lambda: False).route != ROUTE_TEMPLATE
+
+
+def test_usage_report_includes_hit_rate_and_latency_saved():
+    report = _build_report(
+        {"runs": 3, "duration_ms_cache_miss": 6000, "canned_replies": 1, "faq_replies": 1}
+    )
+    assert report["canned_reply_ratio"] == 0.25
+    assert report["faq_hit_ratio"] == 0.25
+    assert report["estimated_latency_saved_ms"] == 2000.0
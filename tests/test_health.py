@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from src.health import STATUS_DEGRADED, STATUS_NOT_READY, STATUS_READY, HealthMonitor
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis, "from_url", lambda *a, **k: fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr("src.health.shutil.which", lambda name: f"/usr/bin/{name}")
+    return server
+
+
+def test_not_ready_until_the_first_probe_then_ready(fake_redis):
+    monitor = HealthMonitor(interval=10)
+    assert monitor.readiness()["status"] == STATUS_NOT_READY
+
+    asyncio.run(monitor.refresh())
+    report = monitor.readiness()
+    assert report["status"] == STATUS_READY
+    assert report["checks"]["redis"]["ok"]
+
+
+def test_open_circuit_degrades_and_redis_down_fails(fake_redis, monkeypatch):
+    import redis
+
+    from src.circuit_breaker import OPEN, CircuitBreaker
+
+    client = redis.from_url("redis://fake")
+    monkeypatch.setattr("src.health.get_circuit_breaker", lambda name: CircuitBreaker(name, redis_client=client))
+    client.hset("circuit:openai", mapping={"state": OPEN, "opened_at": 0})
+    monitor = HealthMonitor(interval=10)
+    asyncio.run(monitor.refresh())
+    assert monitor.readiness()["status"] == STATUS_DEGRADED
+    assert monitor.readiness()["checks"]["circuit_openai"]["state"] == OPEN
+
+    fake_redis.connected = False
+    asyncio.run(monitor.refresh())
+    assert monitor.readiness()["status"] == STATUS_NOT_READY
+    assert not monitor.readiness()["checks"]["redis"]["ok"]
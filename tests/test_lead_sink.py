@@ -0,0 +1,138 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src import lead_sink
+from src.circuit_breaker import CircuitBreaker
+from src.config import LEAD_MAX_ATTEMPTS
+from src.lead_sink import (
+    LEAD_CLAIM_LEASE_SECONDS,
+    LEAD_DEAD_LETTER_KEY,
+    LEAD_DUPLICATE,
+    LEAD_QUEUE_ENTRIES_KEY,
+    LEAD_QUEUE_KEY,
+    LEAD_QUEUED,
+    LEAD_SAVED,
+    LeadRejectedError,
+    LeadSink,
+    build_idempotency_key,
+)
+
+RECORD = {"Nome": "Maria", "CPF": "123.456.789-09", "Telefone": "(11) 98765-4321"}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class _NocoDB:
+    """Answers POSTs with the queued status codes (then 201)."""
+
+    def __init__(self, *status_codes):
+        self.status_codes = list(status_codes)
+        self.bodies = []
+
+    def post(self, url, json=None, timeout=None):
+        self.bodies.append(json)
+        status = self.status_codes.pop(0) if self.status_codes else 201
+        return SimpleNamespace(status_code=status, text=f"HTTP {status}")
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    breaker = CircuitBreaker("nocodb", failure_threshold=100, redis_client=client)
+    monkeypatch.setattr(lead_sink, "get_redis", lambda: client)
+    monkeypatch.setattr(lead_sink, "get_circuit_breaker", lambda name: breaker)
+    return client
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(lead_sink, "time", clock)
+    return clock
+
+
+def _sink(nocodb: _NocoDB, **kwargs) -> LeadSink:
+    sink = LeadSink(table_url="https://nocodb.example/api/v2/tables/leads/records", api_token="t", **kwargs)
+    sink.session = nocodb
+    sink.start = lambda: None  # the tests drive flush_once themselves
+    return sink
+
+
+def _submit(sink: LeadSink) -> str:
+    return sink.submit(dict(RECORD), RECORD["CPF"], RECORD["Telefone"])
+
+
+def test_the_same_cpf_and_phone_are_registered_once(redis_client):
+    nocodb = _NocoDB()
+    sink = _sink(nocodb)
+
+    assert _submit(sink) == LEAD_SAVED
+    assert sink.submit(dict(RECORD), "12345678909", "11987654321") == LEAD_DUPLICATE
+    assert len(nocodb.bodies) == 1
+
+
+def test_a_5xx_leaves_the_lead_queued_with_backoff(redis_client, clock):
+    sink = _sink(_NocoDB(503))
+
+    assert _submit(sink) == LEAD_QUEUED
+    (entry_id, retry_at), = redis_client.zrange(LEAD_QUEUE_KEY, 0, -1, withscores=True)
+    assert retry_at > clock.now
+    assert json.loads(redis_client.hget(LEAD_QUEUE_ENTRIES_KEY, entry_id))["attempts"] == 1
+    assert sink.flush_once() == 0  # not ready yet
+
+    clock.now = retry_at
+    assert sink.flush_once() == 1
+    assert sink.backlog() == 0 and redis_client.hlen(LEAD_QUEUE_ENTRIES_KEY) == 0
+
+
+def test_a_4xx_is_rejected_and_the_lead_can_be_sent_again(redis_client):
+    sink = _sink(_NocoDB(422))
+
+    with pytest.raises(LeadRejectedError) as rejected:
+        _submit(sink)
+    assert rejected.value.status_code == 422
+    assert sink.backlog() == 0
+    assert not redis_client.exists(build_idempotency_key(RECORD["CPF"], RECORD["Telefone"]))
+
+
+def test_a_lead_is_dead_lettered_after_max_attempts(redis_client, clock):
+    nocodb = _NocoDB(*[500] * LEAD_MAX_ATTEMPTS)
+    sink = _sink(nocodb, write_behind=True)
+
+    assert _submit(sink) == LEAD_QUEUED
+    for _ in range(LEAD_MAX_ATTEMPTS):
+        assert sink.flush_once() == 1
+        clock.now += 3600
+
+    assert len(nocodb.bodies) == LEAD_MAX_ATTEMPTS
+    assert sink.backlog() == 0 and redis_client.hlen(LEAD_QUEUE_ENTRIES_KEY) == 0
+    dead = json.loads(redis_client.lindex(LEAD_DEAD_LETTER_KEY, 0))
+    assert dead["record"] == RECORD and dead["error"] == "max attempts exceeded"
+    assert not redis_client.exists(dead["key"])  # the lead may be registered again
+
+
+def test_an_expired_lease_lets_another_flusher_reclaim_the_entry(redis_client, clock):
+    crashed, nocodb = _sink(_NocoDB(), write_behind=True), _NocoDB()
+    other = _sink(nocodb, write_behind=True)
+    assert _submit(crashed) == LEAD_QUEUED
+
+    # the first flusher claims the entry and dies before writing it
+    claimed = crashed._claim(
+        keys=[LEAD_QUEUE_KEY], args=[clock.now, crashed.batch_size, clock.now + LEAD_CLAIM_LEASE_SECONDS]
+    )
+    assert len(claimed) == 1
+    assert other.flush_once() == 0
+
+    clock.now += LEAD_CLAIM_LEASE_SECONDS + 1
+    assert other.flush_once() == 1
+    assert nocodb.bodies == [RECORD] and other.backlog() == 0
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from src.lifecycle import Lifecycle
+
+
+def test_drain_waits_for_tasks_and_wakes_sleepers():
+    lifecycle = Lifecycle()
+    finished = []
+
+    async def _work():
+        await lifecycle.sleep(30)  # e.g. waiting for buffer silence
+        finished.append(True)
+
+    async def scenario():
+        lifecycle.spawn(_work())
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        cancelled = await lifecycle.drain(timeout=5)
+        return cancelled, time.monotonic() - started
+
+    cancelled, elapsed = asyncio.run(scenario())
+    assert cancelled == 0
+    assert finished == [True]
+    assert elapsed < 1
+    assert lifecycle.draining and lifecycle.in_flight() == 0
+
+
+def test_drain_cancels_tasks_past_the_timeout():
+    lifecycle = Lifecycle()
+
+    async def scenario():
+        lifecycle.spawn(asyncio.sleep(30))
+        return await lifecycle.drain(timeout=0.05)
+
+    assert asyncio.run(scenario()) == 1
+    assert lifecycle.in_flight() == 0
+
+
+def test_cancelled_buffer_processor_releases_its_lock(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis, "from_url", lambda *a, **k: fakeredis.FakeRedis(server=server, decode_responses=True))
+    from src.api import webhook
+    from src.api.message_buffer import MessageBuffer
+    from src.conversation_state import ConversationState
+    from src.deadline import Deadline
+
+    lifecycle = Lifecycle()
+    monkeypatch.setattr(webhook, "get_lifecycle", lambda: lifecycle)
+    buffer = MessageBuffer(ConversationState(redis.from_url("redis://")))
+
+    async def scenario():
+        buffer.add_message("user-1", "oi")
+        assert buffer.acquire_processing_lock("user-1")
+        task = asyncio.create_task(webhook._process_buffered_messages_logic("user-1", buffer, Deadline()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert buffer.acquire_processing_lock("user-1")
@@ -0,0 +1,32 @@
+import json
+import logging
+
+from src.logging_config import JsonFormatter, SamplingFilter, parse_levels
+from src.text import redact_pii
+
+
+def _record(msg, *args, level=logging.INFO):
+    return logging.LogRecord("src.api.webhook", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_drops_only_the_listed_info_lines():
+    drop_all = SamplingFilter(0.0)
+
+    assert not drop_all.filter(_record("[RECV] sender=%s text=%s", "123456", "oi"))
+    assert not drop_all.filter(_record("[%s] Message buffered (%d chars)", "123456", 2))
+    assert drop_all.filter(_record("[OUTGOING] Manual interface interaction detected for %s", "123456"))
+    assert drop_all.filter(_record("[RECV] sender=%s text=%s", "123456", "oi", level=logging.WARNING))
+    assert SamplingFilter(1.0).filter(_record("[RECV] sender=%s text=%s", "123456", "oi"))
+
+
+def test_json_lines_are_redacted():
+    line = JsonFormatter().format(_record("[RECV] text=%s", "meu cpf é 123.456.789-09, fone (11) 98765-4321"))
+    entry = json.loads(line)
+
+    assert entry["level"] == "INFO" and entry["logger"] == "src.api.webhook"
+    assert entry["message"] == "[RECV] text=meu cpf é [cpf], fone [telefone]"
+    assert redact_pii("pedido 17834512345678901") == "pedido 17834512345678901"  # long ids are kept
+
+
+def test_parse_levels_ignores_unknown_levels():
+    assert parse_levels("httpx=WARNING, agno=error,bad=LOUD,,=INFO") == {"httpx": 30, "agno": 40}
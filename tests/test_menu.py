@@ -0,0 +1,54 @@
+import pytest
+
+from src.menu import MenuStateMachine, menu_reply, option_reply, parse_selection
+from src.prompts import LEAD_DATA_REQUEST, WELCOME_MESSAGE
+from src.usage import _build_report
+
+
+@pytest.fixture
+def menu():
+    fakeredis = pytest.importorskip("fakeredis")
+    return MenuStateMachine(redis_client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_selection_parsing():
+    assert [parse_selection(text) for text in ("1", "2.", "3️⃣", "Opção 4", "MENU", "voltar")] == [
+        "1", "2", "3", "4", "menu", "menu"
+    ]
+    assert parse_selection("quero a 1") is None
+    assert parse_selection("6") is None
+    assert parse_selection("12") is None
+
+
+def test_digits_are_options_only_while_the_menu_is_shown(menu):
+    assert menu.handle("user-1", "2") is None  # may answer a question ("quantas parcelas?")
+
+    menu.observe_reply("user-1", WELCOME_MESSAGE)
+    decision = menu.handle("user-1", "1")
+    assert decision.reason == "menu_1"
+    assert "[lista" not in decision.reply and "JET 50s" in decision.reply
+    assert menu.handle("user-1", "4").reply == option_reply("4")  # still in the menu after an option
+
+    menu.observe_reply("user-1", "A JET 50s sai por R$ 9.990,00 à vista.")
+    assert menu.handle("user-1", "2") is None
+    decision = menu.handle("user-1", "menu")
+    assert decision.reply == menu_reply() and "Bem-vindo" not in decision.reply
+    assert menu.handle("user-1", "2").reason == "menu_2"
+
+
+def test_option_3_asks_for_lead_data_until_it_was_sent(menu):
+    menu.handle("user-1", "menu")
+    assert menu.handle("user-1", "3").reply == LEAD_DATA_REQUEST
+    assert menu.handle("user-1", "3") is None  # next message is the data, not a choice
+
+    assert menu.handle("user-1", "João Silva, cpf 657.789.987-23, (98) 98765-9878, 26/09/2000") is None
+    menu.handle("user-1", "menu")
+    assert menu.handle("user-1", "3") is None  # the agent sends the link, it never asks twice
+
+
+def test_usage_report_includes_menu_hits_and_tokens_saved():
+    report = _build_report(
+        {"runs": 2, "prompt_tokens": 3000, "completion_tokens": 200, "canned_replies": 2, "menu_replies": 1}
+    )
+    assert report["menu_hit_ratio"] == 0.25
+    assert report["estimated_tokens_saved"] == 3200
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram
+
+from src.metrics import timed
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _histogram():
+    registry = CollectorRegistry()
+    return registry, Histogram("test_seconds", "Test latency", ["mode"], registry=registry)
+
+
+def _in_flight(stage: str) -> float:
+    return REGISTRY.get_sample_value("igagent_in_flight", {"stage": stage})
+
+
+def test_timed_as_a_decorator_of_sync_and_async_functions():
+    registry, histogram = _histogram()
+
+    @timed(histogram, in_flight="test_decorator", mode="sync")
+    def work():
+        assert _in_flight("test_decorator") == 1
+        return "done"
+
+    @timed(histogram, in_flight="test_decorator", mode="async")
+    async def async_work():
+        await asyncio.sleep(0)
+        return "done"
+
+    assert work() == "done" and work() == "done"
+    assert asyncio.run(async_work()) == "done"
+
+    assert registry.get_sample_value("test_seconds_count", {"mode": "sync"}) == 2
+    assert registry.get_sample_value("test_seconds_count", {"mode": "async"}) == 1
+    assert _in_flight("test_decorator") == 0
+
+
+def test_timed_as_a_context_manager_releases_the_gauge_on_exceptions():
+    registry, histogram = _histogram()
+
+    with pytest.raises(ValueError):
+        with timed(histogram, in_flight="test_context", mode="ctx"):
+            assert _in_flight("test_context") == 1
+            raise ValueError("boom")
+
+    assert registry.get_sample_value("test_seconds_count", {"mode": "ctx"}) == 1
+    assert _in_flight("test_context") == 0
+
+
+_WORKER = """
+import sys
+from src.metrics import MESSAGES_TOTAL, render_metrics
+if sys.argv[1] == "count":
+    MESSAGES_TOTAL.labels(kind="text").inc()
+else:
+    body, content_type = render_metrics()
+    print(content_type)
+    print(body.decode())
+"""
+
+
+def test_render_metrics_aggregates_the_workers_in_multiprocess_mode(tmp_path):
+    env = {**os.environ, "PYTHONPATH": PROJECT_ROOT, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    def worker(command: str) -> str:
+        return subprocess.run(
+            [sys.executable, "-c", _WORKER, command], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+            check=True,
+        ).stdout
+
+    worker("count")
+    worker("count")
+    output = worker("render")
+
+    assert output.startswith("text/plain")
+    assert 'igagent_messages_total{kind="text"} 2.0' in output
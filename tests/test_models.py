@@ -0,0 +1,95 @@
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from src.models import LeadModel, WebhookMessage, is_valid_cpf, validate_webhook_fields
+
+CORPUS = json.loads((Path(__file__).parent / "fixtures" / "validation_corpus.json").read_text(encoding="utf-8"))
+LEAD_FIELDS = ("nome", "cpf", "telefone", "modelo_interesse", "nascimento", "cnh")
+
+
+def _lead_is_valid(record) -> bool:
+    try:
+        LeadModel(**{field: record[field] for field in LEAD_FIELDS})
+        return True
+    except ValidationError:
+        return False
+
+def _webhook_model_is_valid(record) -> bool:
+    try:
+        WebhookMessage(sender_id=record["sender_id"], text=record["text"])
+        return True
+    except ValidationError:
+        return False
+
+def test_cpf_check_digits():
+    assert is_valid_cpf("52998224725")
+    assert not is_valid_cpf("52998224724")
+    assert not is_valid_cpf("11111111111")
+    assert not is_valid_cpf("5299822472")
+
+def test_nascimento_accepts_what_strptime_accepts():
+    for value in ("5/3/1990", "1/12/1985", "05/03/1990", "29/02/2000", "29/02/1999", "31/4/1990", "1990-03-05", "5/3/90"):
+        try:
+            datetime.strptime(value, "%d/%m/%Y")
+            expected = True
+        except ValueError:
+            expected = False
+        try:
+            LeadModel.validate_nascimento(value)
+            accepted = True
+        except ValueError:
+            accepted = False
+        assert accepted == expected, value
+
+def test_lead_model_normalizes_formats():
+    lead = LeadModel(
+        nome=" João Silva ", cpf="52998224725", telefone="98987659878",
+        modelo_interesse="jet 50s", nascimento="26/09/2000", cnh="SIM",
+    )
+    assert lead.cpf == "529.982.247-25"
+    assert lead.telefone == "(98) 98765-9878"
+
+def test_lead_corpus_matches_labels():
+    for record in CORPUS["leads"]:
+        assert _lead_is_valid(record) == record["valid"], record
+
+def test_webhook_fast_path_matches_model():
+    for record in CORPUS["webhook_messages"]:
+        fast_valid = validate_webhook_fields(record["sender_id"], record["text"]) is None
+        assert fast_valid == _webhook_model_is_valid(record) == record["valid"], record
+
+def test_validation_throughput_benchmark(record_property):
+    """Microbenchmark: validation throughput and rejection rate on the fixture corpus (timings are recorded, not asserted)."""
+    rounds = 200
+    leads = CORPUS["leads"]
+    messages = CORPUS["webhook_messages"]
+
+    start = time.perf_counter()
+    rejected = sum(not _lead_is_valid(record) for _ in range(rounds) for record in leads)
+    lead_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in messages:
+            _webhook_model_is_valid(record)
+    model_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in messages:
+            validate_webhook_fields(record["sender_id"], record["text"])
+    fast_elapsed = time.perf_counter() - start
+
+    lead_rate = rounds * len(leads) / lead_elapsed
+    rejection_rate = rejected / (rounds * len(leads))
+    speedup = model_elapsed / fast_elapsed
+    record_property("lead_validations_per_second", round(lead_rate))
+    record_property("lead_rejection_rate", round(rejection_rate, 3))
+    record_property("webhook_fast_path_speedup", round(speedup, 1))
+
+    expected_rejections = sum(not record["valid"] for record in leads) / len(leads)
+    assert rejection_rate == expected_rejections
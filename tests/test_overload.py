@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.overload import OverloadController, OverloadMode
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(clock, **kwargs):
+    options = dict(max_concurrency=2, thresholds=(0.5, 1.0, 1.5, 2.0), queue_wait_target=5.0, min_dwell_seconds=10.0)
+    options.update(kwargs)
+    return OverloadController(clock=clock, **options)
+
+
+def test_modes_step_up_with_occupancy_and_queue_wait():
+    async def scenario():
+        clock = _Clock()
+        controller = _controller(clock)
+        assert controller.mode == OverloadMode.NORMAL
+
+        await controller._acquire()
+        assert controller.mode == OverloadMode.NO_AUDIO_REPLY
+        await controller._acquire()
+        assert controller.skip_classifier() and not controller.use_small_model()
+
+        waiter = asyncio.create_task(controller._acquire())
+        await asyncio.sleep(0)
+        assert controller.mode == OverloadMode.SMALL_MODEL
+
+        clock.now += 12  # oldest waiter has waited 12s: 12 / 5 > 2.0
+        assert controller.should_defer()
+
+        controller._release()
+        await waiter
+
+    asyncio.run(scenario())
+
+
+def test_recovery_is_gradual_and_waits_for_dwell_time():
+    async def scenario():
+        clock = _Clock()
+        controller = _controller(clock)
+        for _ in range(2):
+            await controller._acquire()
+        assert controller.mode == OverloadMode.NO_CLASSIFIER
+
+        controller._release()
+        controller._release()
+        assert controller.mode == OverloadMode.NO_CLASSIFIER  # still within dwell time
+
+        clock.now += 10
+        assert controller.mode == OverloadMode.NO_AUDIO_REPLY
+        clock.now += 10
+        assert controller.mode == OverloadMode.NORMAL
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_run_keeps_its_slot_until_the_thread_finishes():
+    release = threading.Event()
+
+    async def scenario():
+        controller = OverloadController(max_concurrency=1)
+        with pytest.raises(TimeoutError):
+            await controller.run_in_thread(release.wait, timeout=0.05)
+        assert controller._running == 1
+
+        release.set()
+        for _ in range(100):
+            if controller._running == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert controller._running == 0
+
+    asyncio.run(scenario())
+
+
+def test_threshold_count_is_validated():
+    with pytest.raises(ValueError):
+        OverloadController(thresholds=(1.0, 2.0))
@@ -0,0 +1,77 @@
+import pytest
+
+from src.response_cache import ResponseCache, cosine, embed, is_cacheable
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _local_cache(**kwargs):
+    kwargs.setdefault("redis_client", False)
+    return ResponseCache(threshold=0.85, **kwargs)
+
+
+def test_similar_messages_hit_and_different_numbers_never_do():
+    cache = _local_cache()
+    cache.store("Quanto custa a Jet 50?", "A JET 50 custa R$ 9.990")
+
+    assert cache.lookup("quanto custa a jet 50") == "A JET 50 custa R$ 9.990"
+    assert cache.lookup("jet 50 quanto custa?") == "A JET 50 custa R$ 9.990"
+    assert cosine(embed("quanto custa a jet 50?"), embed("quanto custa a jet 125?")) > 0.8
+    assert cache.lookup("quanto custa a jet 125?") is None
+    assert cache.lookup("vocês entregam em outra cidade?") is None
+
+
+def test_entries_expire_after_the_ttl():
+    clock = _Clock()
+    cache = _local_cache(ttl_seconds=60, clock=clock)
+    cache.store("tem moto elétrica?", "Temos sim!")
+    clock.now += 59
+    assert cache.lookup("tem moto elétrica?") == "Temos sim!"
+    clock.now += 2
+    assert cache.lookup("tem moto elétrica?") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _local_cache(max_entries=2)
+    cache.store("tem moto elétrica?", "elétrica")
+    cache.store("vocês entregam?", "entrega")
+    assert cache.lookup("tem moto elétrica?") == "elétrica"
+    cache.store("aceitam moto usada na troca?", "troca")
+
+    assert cache.lookup("vocês entregam?") is None
+    assert cache.lookup("tem moto elétrica?") == "elétrica"
+
+
+def test_entries_from_another_catalog_version_are_ignored():
+    version = ["v1"]
+    cache = _local_cache(version=lambda: version[0])
+    cache.store("quanto custa a jet 50?", "R$ 12.999,00")
+    version[0] = "v2"
+    assert cache.lookup("quanto custa a jet 50?") is None
+
+
+def test_lead_data_is_not_cacheable():
+    assert is_cacheable("quanto custa a jet 50?")
+    assert not is_cacheable("meu cpf é 657.789.987-23")
+    assert not is_cacheable("meu zap é 98 98765 9878")
+
+
+def test_entries_are_shared_between_replicas_through_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    first = ResponseCache(threshold=0.85, max_entries=2, redis_client=client)
+    second = ResponseCache(threshold=0.85, max_entries=2, redis_client=client)
+
+    first.store("tem moto elétrica?", "Temos sim!")
+    assert second.lookup("tem moto eletrica") == "Temos sim!"
+
+    first.store("vocês entregam?", "Entregamos")
+    first.store("aceitam moto usada na troca?", "Aceitamos")
+    assert client.zcard("response_cache:lru") == 2
+    assert client.hlen("response_cache:entries") == 2
@@ -0,0 +1,73 @@
+import pytest
+
+from src.prompts import THANKS_REPLY, WELCOME_MESSAGE
+from src.router import ROUTE_FULL, ROUTE_SMALL, ROUTE_TEMPLATE, extract_features, route_message
+
+
+def _route(text, first_turn=True):
+    return route_message(text, lambda: first_turn)
+
+
+def test_lead_data_goes_to_the_full_agent():
+    decision = _route("João Silva, cpf: 657.789.987-23, telefone: (98) 98765-9878, jet 50s, 26/09/2000, CNH: NÃO")
+    assert (decision.route, decision.reason) == (ROUTE_FULL, "lead_data")
+    assert _route("meu zap é 98 98765 9878").route == ROUTE_FULL
+
+
+def test_catalog_models_and_financing_go_to_the_full_agent():
+    assert extract_features("Quanto custa a Jet 50s?")["models"] == ["JET 50s"]
+    assert extract_features("tem a pt 1?")["models"] == ["PT1"]
+    assert extract_features("jet 500")["models"] == []
+    assert _route("quanto custa a jet 50?").reason == "catalog_model"
+    assert _route("e a garantia?").reason == "complex_keyword"
+
+
+def test_greeting_gets_the_welcome_menu_only_on_the_first_turn():
+    decision = _route("Olá, bom dia!")
+    assert decision.route == ROUTE_TEMPLATE
+    assert decision.reply == WELCOME_MESSAGE
+    assert _route("oi", first_turn=False).route == ROUTE_SMALL
+
+
+def test_thanks_gets_a_template_and_short_turns_the_small_model():
+    decision = _route("ok, muito obrigado!")
+    assert decision.route == ROUTE_TEMPLATE
+    assert decision.reply == THANKS_REPLY
+    assert _route("ok").route == ROUTE_SMALL
+    assert _route("sim, quero ver").route == ROUTE_SMALL
+    assert _route(
+        "queria saber se vocês entregam em outra cidade e quanto tempo demora pra chegar aqui em casa"
+    ).route == ROUTE_FULL
+
+
+def test_first_turn_check_only_runs_for_greetings():
+    def _fail():
+        raise AssertionError("session read for a non-greeting turn")
+
+    route_message("quanto custa a jet 50?", _fail)
+    route_message("obrigado", _fail)
+
+
+def test_canned_turn_is_stored_in_the_session_history(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", classmethod(lambda cls, *a, **k: fakeredis.FakeRedis(server=server)))
+    from src import agent, redis_client
+    from src.agent import get_agent, record_synthetic_turn, session_has_history
+
+    monkeypatch.setattr(redis_client, "_client", None)
+    monkeypatch.setattr(redis_client, "_bytes_client", None)
+    monkeypatch.setattr(agent, "_dbs", {})
+
+    assert not session_has_history("user-1")
+    record_synthetic_turn("user-1", "oi", WELCOME_MESSAGE)
+    record_synthetic_turn("user-1", "obrigado", THANKS_REPLY)
+
+    assert session_has_history("user-1")
+    session = get_agent("user-1").get_session("user-1")
+    messages = [(m.role, m.content) for m in session.get_messages(last_n_runs=10)]
+    assert messages == [
+        ("user", "oi"), ("assistant", WELCOME_MESSAGE), ("user", "obrigado"), ("assistant", THANKS_REPLY),
+    ]
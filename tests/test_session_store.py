@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from agno.models.message import Message
+from agno.run.agent import RunOutput
+from agno.run.base import RunStatus
+
+from src.prompts import SCRIPTED_REPLIES, SYSTEM_PROMPT, WELCOME_MESSAGE
+from src.session_store import CompactRedisDb, build_dictionary, decode_value, encode_value
+
+
+@pytest.fixture
+def db():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return CompactRedisDb(
+        SYSTEM_PROMPT + SCRIPTED_REPLIES,
+        redis_client=fakeredis.FakeRedis(server=server, decode_responses=True),
+        bytes_client=fakeredis.FakeRedis(server=server),
+        db_prefix="agno",
+        expire=300,
+    )
+
+
+def _run(index: int, reply: str) -> RunOutput:
+    return RunOutput(
+        run_id=f"run-{index}",
+        agent_id="agent",
+        session_id="user-1",
+        content=reply,
+        messages=[
+            Message(role="system", content=SYSTEM_PROMPT),
+            Message(role="user", content="oi"),
+            Message(role="assistant", content=reply),
+        ],
+        status=RunStatus.completed,
+    )
+
+
+def test_values_roundtrip_and_beat_plain_json():
+    row = {"run_id": "run-1", "run_data": {"content": WELCOME_MESSAGE, "messages": [{"role": "assistant"}]}}
+    value = encode_value(row, build_dictionary(SYSTEM_PROMPT + SCRIPTED_REPLIES))
+
+    assert decode_value(value) == row
+    assert len(value) < len(json.dumps(row, ensure_ascii=False).encode("utf-8")) / 3
+    assert decode_value(json.dumps(row)) == row  # values written by plain RedisDb still read
+
+
+def test_runs_are_stored_without_the_system_message(db):
+    for index, reply in enumerate((WELCOME_MESSAGE, "A JET 50s sai por R$ 9.990,00.")):
+        db.upsert_run(_run(index, reply), session_id="user-1", run_index=index)
+
+    runs = db._get_session_runs_data("user-1")
+    assert [run["content"] for run in runs] == [WELCOME_MESSAGE, "A JET 50s sai por R$ 9.990,00."]
+    assert all(message["role"] != "system" for run in runs for message in run["messages"])
+    assert db.has_runs("user-1") and not db.has_runs("user-2")
+    assert 0 < db.session_bytes("user-1") < len(SYSTEM_PROMPT)
+    assert not list(db.redis_client.scan_iter("agno:runs:index:*"))  # no never-expiring index sets
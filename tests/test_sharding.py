@@ -0,0 +1,112 @@
+import pytest
+
+from src.sharding import HashRing, ShardRouter
+
+
+@pytest.fixture
+def redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _routers(redis, clock, *worker_ids):
+    routers = [ShardRouter(redis, worker_id, member_ttl=15, clock=clock) for worker_id in worker_ids]
+    for router in routers * 2:  # the second round sees every member
+        router.heartbeat()
+    return routers
+
+
+def test_ring_spreads_keys_and_moves_few_on_scale_up():
+    keys = [f"user-{index}" for index in range(3000)]
+    ring = HashRing(["a", "b", "c"])
+    owners = {key: ring.owner(key) for key in keys}
+    counts = [list(owners.values()).count(member) for member in "abc"]
+    assert min(counts) > 600
+
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = [key for key in keys if grown.owner(key) != owners[key]]
+    assert all(grown.owner(key) == "d" for key in moved)  # only keys taken by the new worker move
+    assert len(moved) < len(keys) / 3
+
+
+def test_messages_are_forwarded_to_the_owner(redis):
+    a, b = _routers(redis, _Clock(), "a", "b")
+    key = next(f"user-{index}" for index in range(100) if a.owner(f"user-{index}") == "b")
+
+    assert b.route(key, {"text": "oi"}) is False  # b owns it: handled locally
+    assert a.route(key, {"text": "oi"}) is True
+    assert b.poll(timeout=0.1) == {"text": "oi", "key": key}
+    assert a.poll(timeout=0.1) is None
+
+
+def test_dead_worker_is_evicted_and_its_inbox_rerouted(redis):
+    clock = _Clock()
+    a, b = _routers(redis, clock, "a", "b")
+    key = next(f"user-{index}" for index in range(100) if a.owner(f"user-{index}") == "b")
+    a.route(key, {"text": "oi"})
+    b.remember_turn(key)
+    assert b.knows_history(key)
+
+    clock.now += 20  # b stops heartbeating
+    a.heartbeat()
+    assert a.ring.members == {"a"}
+    assert a.poll(timeout=0.1)["text"] == "oi"
+
+
+def test_leave_hands_the_inbox_over_and_returns_what_nobody_can_take(redis):
+    a, b = _routers(redis, _Clock(), "a", "b")
+    key = next(f"user-{index}" for index in range(100) if a.owner(f"user-{index}") == "b")
+    a.route(key, {"text": "oi"})
+
+    assert b.leave() == []
+    a.heartbeat()
+    assert a.poll(timeout=0.1)["text"] == "oi"
+
+    b.route(key, {"text": "de novo"})  # forwarded to a just before it leaves as well
+    assert a.leave() == [{"text": "de novo", "key": key}]
+
+
+def test_the_agent_is_kept_between_turns_unless_turns_overlap(redis):
+    router = ShardRouter(redis, "a", clock=_Clock())
+    first = object()
+
+    assert router.take_agent("user-1") is None
+    router.return_agent("user-1", first)
+    assert router.take_agent("user-1") is first
+
+    # another turn starts on a fresh agent while this one runs: neither session has both turns
+    assert router.take_agent("user-1") is None
+    router.return_agent("user-1", object())
+    router.return_agent("user-1", first)
+    assert router.take_agent("user-1") is None
+    router.return_agent("user-1", first)  # turns no longer overlap
+
+    assert router.take_agent("user-1") is first
+    router.return_agent("user-1", None)  # a failed turn is not kept
+    assert router.take_agent("user-1") is None
+
+
+def test_agents_are_bounded_and_dropped_when_the_conversation_moves(redis):
+    clock = _Clock()
+    router = ShardRouter(redis, "a", session_cache_size=2, clock=clock)
+    for key in ("user-1", "user-2", "user-3"):
+        router.take_agent(key)
+        router.return_agent(key, key)
+    assert router.take_agent("user-1") is None  # least recently used, evicted
+    router.return_agent("user-1", None)
+
+    a, b = _routers(redis, clock, "a", "b")
+    key = next(f"user-{index}" for index in range(100) if a.owner(f"user-{index}") == "b")
+    b.take_agent(key)
+    b.return_agent(key, "agent")
+    b._set_members(["a"])  # b's heartbeat saw the ring change
+    b._set_members(["a", "b"])
+    assert b.take_agent(key) is None
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+from tests.load.startup_benchmark import PROJECT_ROOT, import_profile
+
+HEAVY_MODULES = ("agno", "openai", "src.session_store")
+
+
+def test_importing_the_app_has_no_side_effects(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env.update(PYTHONPATH=PROJECT_ROOT, TMPDIR=str(tmp_path), AUDIO_REPLY_DIR=str(tmp_path / "audio"))
+    script = f"import sys, json, src.app; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr  # no env validation at import
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []  # Agno and the OpenAI SDK load later
+    assert list(tmp_path.iterdir()) == []  # no audio reply directory yet
+
+
+def test_import_profile_of_the_app():
+    modules = [module for _, module in import_profile(top=1000)]
+    assert modules[0] == "src.app"
+    assert not [module for module in modules if module.split(".")[0] in ("agno", "openai")]
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from src.catalog import get_catalog
+from src.faq import INTENT_LOCATION, faq_entry
+from src.prompts import SCRIPTED_REPLIES, SYSTEM_PROMPT
+from src.tenants import DEFAULT_TENANT, TenantRegistry, current_tenant, use_tenant
+from src.tools import buscar_roteiro
+
+
+def _registry(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_CENTRO", "token-centro")
+    prompt = (SYSTEM_PROMPT + SCRIPTED_REPLIES).replace("Shineray Rosário", "Shineray Centro")
+    (tmp_path / "centro.md").write_text(prompt.replace("BR-402, próximo ao Mix Mateus", "Rua Grande, 100"))
+    (tmp_path / "centro.json").write_text(
+        json.dumps({"categorias": [{"id": "eletricas", "titulo": "Elétricas"}],
+                    "modelos": [{"nome": "ZETA 1", "categoria": "eletricas", "preco": 8990}]})
+    )
+    (tmp_path / "tenants.json").write_text(
+        json.dumps({"tenants": [{"id": "111", "nome": "Centro", "access_token_env": "TOKEN_CENTRO",
+                                 "prompt_path": "centro.md", "catalog_path": "centro.json",
+                                 "nocodb_table_url": "https://nocodb.local/centro"}]})
+    )
+    return TenantRegistry(str(tmp_path / "tenants.json"))
+
+
+def test_registry_resolves_pages_and_falls_back_to_the_default(tmp_path, monkeypatch):
+    registry = _registry(tmp_path, monkeypatch)
+    tenant = registry.resolve("111")
+
+    assert tenant.name == "Centro" and tenant.access_token == "token-centro"
+    assert tenant.key("chat:buffer:user-1") == "t:111:chat:buffer:user-1"
+    assert registry.resolve("999") is DEFAULT_TENANT
+    assert DEFAULT_TENANT.key("chat:buffer:user-1") == "chat:buffer:user-1"  # single-account keys unchanged
+    assert tenant.static_system_message != DEFAULT_TENANT.static_system_message
+
+
+def test_prompt_and_catalog_follow_the_current_tenant(tmp_path, monkeypatch):
+    tenant = _registry(tmp_path, monkeypatch).resolve("111")
+    location = faq_entry(INTENT_LOCATION)
+
+    assert "BR-402" in location.reply
+    with use_tenant(tenant):
+        assert "Rua Grande, 100" in location.reply
+        assert [model.name for model in get_catalog().models] == ["ZETA 1"]
+    assert "ZETA 1" not in [model.name for model in get_catalog().models]
+
+
+def test_scripted_texts_stay_out_of_the_system_message(tmp_path, monkeypatch):
+    tenant = _registry(tmp_path, monkeypatch).resolve("111")
+
+    for current in (DEFAULT_TENANT, tenant):
+        assert "Bem-vindo(a)" not in current.static_system_message
+        assert "Mix Mateus" not in current.static_system_message and "Rua Grande" not in current.static_system_message
+    assert "BR-402" in buscar_roteiro("4") and buscar_roteiro("boas-vindas") == DEFAULT_TENANT.section("Menu Inicial")
+    with use_tenant(tenant):
+        assert "Rua Grande, 100" in buscar_roteiro("4")
+        assert "Shineray Centro" in buscar_roteiro("boas-vindas")
+        assert buscar_roteiro("menu").startswith("Escolha uma opção")
+        assert "bit.ly" in buscar_roteiro("whatsapp")
+
+
+def test_background_work_keeps_the_tenant(tmp_path, monkeypatch):
+    tenant = _registry(tmp_path, monkeypatch).resolve("111")
+
+    async def _handler():
+        await asyncio.sleep(0)
+        return current_tenant().id, await asyncio.to_thread(lambda: current_tenant().id)
+
+    async def scenario():
+        with use_tenant(tenant):
+            task = asyncio.create_task(_handler())
+        return await task
+
+    assert asyncio.run(scenario()) == ("111", "111")
+    assert current_tenant() is DEFAULT_TENANT
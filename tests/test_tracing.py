@@ -0,0 +1,45 @@
+import asyncio
+
+from src.tracing import capture_context, configure_tracing, get_recent_traces, sender_hash, start_span, traced
+
+SENDER = "1784140000012345"
+
+
+@traced("graph.send", sender_param="recipient_id")
+async def _send(recipient_id: str, text: str) -> None:
+    await asyncio.sleep(0)
+
+
+async def _conversation(sender_id: str) -> None:
+    # The webhook answers Meta right away; the reply is produced by a background task.
+    with start_span("webhook.receive", entries=1):
+        trace_context = capture_context()
+
+    async def _reply():
+        with start_span("message.handle", sender_id, parent=trace_context):
+            with start_span("agent.run", sender_id):
+                await asyncio.sleep(0)
+            await _send(sender_id, "Olá!")
+
+    await asyncio.create_task(_reply())
+
+
+def test_a_conversation_is_one_trace_from_ingest_to_graph_send():
+    configure_tracing("memory")
+
+    async def _main():
+        await _conversation(SENDER)
+        await _conversation("1784140000099999")
+
+    asyncio.run(_main())
+
+    other, ours = get_recent_traces(limit=2)  # most recent first
+    names = [span["name"] for span in ours["spans"]]
+    assert names == ["webhook.receive", "message.handle", "agent.run", "graph.send"]
+    assert other["trace_id"] != ours["trace_id"]
+
+    by_name = {span["name"]: span for span in ours["spans"]}
+    assert by_name["message.handle"]["parent_id"] == by_name["webhook.receive"]["span_id"]
+    assert by_name["graph.send"]["parent_id"] == by_name["message.handle"]["span_id"]
+    assert by_name["graph.send"]["attributes"]["sender.hash"] == sender_hash(SENDER)
+    assert SENDER not in str(ours)  # only the hash is recorded
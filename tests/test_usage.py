@@ -0,0 +1,39 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from agno.metrics import RunMetrics
+
+from src import usage
+from src.usage import UsageTracker
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    monkeypatch.setattr(usage, "get_redis", lambda: fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(usage, "AGENT_INPUT_PRICE_PER_MTOK", 1.0)
+    monkeypatch.setattr(usage, "AGENT_CACHED_INPUT_PRICE_PER_MTOK", 0.5)
+    monkeypatch.setattr(usage, "AGENT_OUTPUT_PRICE_PER_MTOK", 4.0)
+    return UsageTracker()
+
+
+def test_report_totals_and_cost_from_agno_run_metrics(tracker):
+    tracker.record_run(
+        "conv-a", RunMetrics(input_tokens=10_000, cache_read_tokens=6_000, output_tokens=500, duration=1.2)
+    )
+    tracker.record_run("conv-b", RunMetrics(input_tokens=4_000, output_tokens=300, duration=2.0))
+    tracker.record_canned_reply("conv-b", "faq_horario")
+
+    report = tracker.get_report()
+    assert (report["runs"], report["prompt_tokens"], report["cached_tokens"], report["completion_tokens"]) == (
+        2, 14_000, 6_000, 800,
+    )
+    assert report["cache_hit_runs"] == 1 and report["cache_hit_ratio"] == 0.4286
+    assert report["avg_duration_ms_cache_hit"] == 1200.0 and report["avg_duration_ms_cache_miss"] == 2000.0
+    # 8k uncached input at $1, 6k cached at $0.50 and 800 output at $4 per million tokens
+    assert report["estimated_cost_usd"] == 0.0142
+    assert report["estimated_savings_usd"] == 0.003
+    assert report["canned_replies"] == 1 and report["faq_hit_ratio"] == 0.3333
+
+    session = tracker.get_report("conv-a")
+    assert (session["runs"], session["cached_tokens"], session["estimated_cost_usd"]) == (1, 6_000, 0.009)